@@ -0,0 +1,68 @@
+# benchmark_embedding_store.py
+#
+# Vergleicht die Speicherformate des Embedding-Stores (float32 / float16 / int8):
+# Größe auf der Platte, Ladezeit (np.load vs. mmap) und Genauigkeit gegenüber float32.
+
+import os
+import time
+import tempfile
+import numpy as np
+from embedding_store import EmbeddingStore, EMBEDDING_STORE_DIR, STORE_DTYPES, cosine_rows
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+SBERT_MODEL_NAME = 'all-mpnet-base-v2'
+SYNTHETIC_ROWS = 20000 # falls noch kein echter Store existiert
+SYNTHETIC_DIM = 768
+QUERY_ROWS = 200
+TOP_K = 10
+
+def load_reference_vectors():
+    """Echte Embeddings aus dem Store, sonst zufällige normalisierte Vektoren."""
+    store = EmbeddingStore(SBERT_MODEL_NAME, EMBEDDING_STORE_DIR)
+    if len(store):
+        print(f"Verwende {len(store)} echte Embeddings aus '{store.path}'.")
+        return np.asarray(store.take(np.arange(len(store))), dtype=np.float32)
+    print(f"Kein Store gefunden, verwende {SYNTHETIC_ROWS} synthetische Vektoren.")
+    vectors = np.random.default_rng(0).standard_normal((SYNTHETIC_ROWS, SYNTHETIC_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def top_k(matrix, queries, k):
+    scores = queries @ matrix.T
+    return np.argsort(-scores, axis=1)[:, 1:k + 1] # Treffer 0 ist die Anfrage selbst
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+if __name__ == '__main__':
+    reference = load_reference_vectors()
+    keys = [str(i) for i in range(len(reference))]
+    queries = np.random.default_rng(1).choice(len(reference), size=min(QUERY_ROWS, len(reference)), replace=False)
+    normalized = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    reference_neighbors = top_k(normalized, normalized[queries], TOP_K)
+
+    print(f"\n{'Format':<8} {'MB':>8} {'np.load s':>10} {'mmap s':>8} {'mittl. Kos.-Fehler':>19} {'max. Kos.-Fehler':>17} {'Recall@10':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for dtype in STORE_DTYPES:
+            store = EmbeddingStore('benchmark', os.path.join(tmp_dir, dtype), dtype=dtype)
+            store.add(keys, reference)
+
+            start = time.perf_counter()
+            full = EmbeddingStore('benchmark', os.path.join(tmp_dir, dtype), dtype=dtype, mmap_mode=None)
+            restored_full = full.take(np.arange(len(full)))
+            t_load = time.perf_counter() - start
+            del full, restored_full
+
+            start = time.perf_counter()
+            mapped = EmbeddingStore('benchmark', os.path.join(tmp_dir, dtype), dtype=dtype, mmap_mode='r')
+            t_mmap = time.perf_counter() - start
+
+            restored = np.concatenate(list(mapped.iter_blocks(np.arange(len(mapped)))))
+            error = 1.0 - cosine_rows(reference, restored)
+            restored /= np.linalg.norm(restored, axis=1, keepdims=True)
+            neighbors = top_k(restored, restored[queries], TOP_K)
+            recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(neighbors, reference_neighbors)])
+            size_mb = directory_size(mapped.path) / 1e6
+            print(f"{dtype:<8} {size_mb:8.1f} {t_load:10.3f} {t_mmap:8.3f} {error.mean():19.2e} {error.max():17.2e} {recall:10.3f}")
+            del mapped
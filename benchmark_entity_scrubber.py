@@ -0,0 +1,47 @@
+# benchmark_entity_scrubber.py
+#
+# Vergleicht die alte Entitäten-Bereinigung (ein re.sub pro Entität und Review)
+# mit der vorkompilierten Alternation aus entity_scrubber.py.
+
+import time
+import os
+import tempfile
+import pandas as pd
+from entity_scrubber import (
+    load_entities, compile_entity_pattern, remove_specific_entities,
+    scrub_series, scrub_parallel, scrub_entities
+)
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+REVIEWS_FILENAME = 'goodreads_reviews_english_clean.csv'
+REPEAT_CORPUS = 20 # Vervielfacht das Korpus, um größere Datenmengen zu simulieren
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:8.3f} s")
+    return result, elapsed
+
+if __name__ == '__main__':
+    entities = load_entities()
+    base_texts = pd.read_csv(REVIEWS_FILENAME)['context']
+    texts = pd.concat([base_texts] * REPEAT_CORPUS, ignore_index=True)
+    print(f"--- Benchmark Entitäten-Bereinigung: {len(texts)} Reviews, {len(entities)} Entitäten ---\n")
+
+    naive, t_naive = timed("Alt: re.sub pro Entität (apply)", lambda: texts.apply(lambda x: remove_specific_entities(x, entities)))
+    pattern = compile_entity_pattern(entities)
+    vectorized, t_vec = timed("Neu: eine Alternation, vektorisiert", lambda: scrub_series(texts, pattern))
+    parallel, t_par = timed("Neu: Alternation, Chunks über Prozesse", lambda: scrub_parallel(texts, pattern, chunk_size=len(texts) // os.cpu_count() + 1))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_filename = os.path.join(tmp_dir, 'scrub_cache.pkl')
+        _, t_cold = timed("Neu: scrub_entities (kalter Cache)", lambda: scrub_entities(texts, entities, cache_filename))
+        cached, t_warm = timed("Neu: scrub_entities (warmer Cache)", lambda: scrub_entities(texts, entities, cache_filename))
+
+    mismatches = int((naive != vectorized).sum())
+    print(f"\nAbweichungen alt vs. neu: {mismatches} von {len(texts)}")
+    print(f"Abweichungen parallel / Cache: {int((vectorized != parallel).sum())} / {int((vectorized != cached).sum())}")
+    print(f"Speedup vektorisiert: {t_naive / t_vec:.1f}x | kalter Cache: {t_naive / t_cold:.1f}x | warmer Cache: {t_naive / t_warm:.1f}x")
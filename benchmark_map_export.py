@@ -0,0 +1,86 @@
+# benchmark_map_export.py
+#
+# Dateigröße und Ladezeit der semantischen Karten: bisherige px.scatter-Karte
+# (alle Hover-Texte inline, SVG) vs. map_export (WebGL, Hover-Sidecar, Ausdünnung).
+# Die Ladezeit wird, falls Chrome/Selenium verfügbar ist, im Headless-Browser gemessen.
+
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from map_export import export_semantic_map, sidecar_filename
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+REVIEWS_FILENAME = 'goodreads_reviews_english_clean.csv'
+CORPUS_SIZES = [3000, 30000, 300000]
+HOVER_COLUMNS = ['book_name', 'author', 'stars', 'period', 'context_short']
+COLOR_MAP = {'Franz Kafka': '#ff7f0e', 'Other': '#1f77b4'}
+
+def synthetic_corpus(n):
+    """Echte Review-Texte, vervielfacht, mit zufälligen 2D-Koordinaten."""
+    base = pd.read_csv(REVIEWS_FILENAME).dropna(subset=['context'])
+    df = base.sample(n=n, replace=True, random_state=0).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    df['umap_x'], df['umap_y'] = rng.standard_normal(n), rng.standard_normal(n)
+    df['author'] = np.where(rng.random(n) < 0.1, 'Franz Kafka', 'Some Author')
+    df['is_kafka_author'] = np.where(df['author'] == 'Franz Kafka', 'Franz Kafka', 'Other')
+    df['period'] = np.where(rng.random(n) < 0.5, 'Pre-2021', '2021+')
+    df['context_short'] = df['context'].str[:150] + '...'
+    return df
+
+def write_old_map(df, filename):
+    fig = px.scatter(df, x='umap_x', y='umap_y', color='is_kafka_author', hover_data=HOVER_COLUMNS,
+                     color_discrete_map=COLOR_MAP)
+    fig.update_traces(marker=dict(size=4, opacity=0.7))
+    fig.write_html(filename)
+
+def write_new_map(df, filename):
+    export_semantic_map(df, 'umap_x', 'umap_y', 'is_kafka_author', 'Benchmark', 'Autoren-Typ', COLOR_MAP,
+                        filename, HOVER_COLUMNS, mode='auto')
+
+def make_browser():
+    try:
+        from selenium import webdriver
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless")
+        options.add_argument("--window-size=1920,1200")
+        return webdriver.Chrome(options=options)
+    except Exception as e:
+        print(f"(Keine Ladezeit-Messung: {type(e).__name__})")
+        return None
+
+def load_time(driver, filename):
+    """Zeit bis plotly die Karte gezeichnet hat."""
+    if driver is None:
+        return float('nan')
+    start = time.perf_counter()
+    driver.get('file://' + os.path.abspath(filename))
+    driver.execute_async_script("""
+        var done = arguments[0];
+        (function check() { document.querySelector('.main-svg') ? done() : setTimeout(check, 20); })();
+    """)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    driver = make_browser()
+    print(f"{'Punkte':>8} {'Variante':<10} {'HTML MB':>8} {'Sidecar MB':>11} {'Schreiben s':>12} {'Laden s':>8}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for n in CORPUS_SIZES:
+                df = synthetic_corpus(n)
+                for label, writer in [('alt', write_old_map), ('neu', write_new_map)]:
+                    filename = os.path.join(tmp_dir, f"map_{label}_{n}.html")
+                    start = time.perf_counter()
+                    writer(df, filename)
+                    t_write = time.perf_counter() - start
+                    sidecar = sidecar_filename(filename)
+                    sidecar_mb = os.path.getsize(sidecar) / 1e6 if os.path.exists(sidecar) else 0.0
+                    print(f"{n:8d} {label:<10} {os.path.getsize(filename) / 1e6:8.2f} {sidecar_mb:11.2f} "
+                          f"{t_write:12.2f} {load_time(driver, filename):8.2f}")
+    finally:
+        if driver:
+            driver.quit()
@@ -0,0 +1,78 @@
+import sys
+import time
+import asyncio
+import argparse
+from review_search import make_backend, collect_reviews, MAX_CONCURRENT_BOOKS
+from review_search_standin import StandInServer, load_fixture
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+KEYWORD = 'kafkaesque'
+DEFAULT_BOOKS = 40
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+async def run_backend(backend_name, urls, max_concurrent, backend_kwargs):
+    """Pages through the keyword reviews of all books (no checkpoints). Returns reviews, books, errors, seconds."""
+    semaphore = asyncio.Semaphore(max_concurrent)
+    totals = {'reviews': 0, 'books': 0, 'errors': 0}
+    async with make_backend(backend_name, **backend_kwargs) as backend:
+        async def one(url):
+            async with semaphore:
+                try:
+                    reviews, status = await collect_reviews(backend, url, url, KEYWORD, checkpoint_path=None)
+                    totals['reviews'] += len(reviews)
+                    totals['books'] += 1
+                    totals['errors'] += status != 'complete'
+                except Exception as e:
+                    totals['errors'] += 1
+                    print(f"  {backend_name}: {type(e).__name__} for {url}: {e}")
+        start = time.perf_counter()
+        await asyncio.gather(*(one(url) for url in urls))
+        totals['seconds'] = time.perf_counter() - start
+    return totals
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reviews/min of the review search backends.")
+    parser.add_argument('--backends', nargs='+', default=['http', 'selenium'], choices=['http', 'selenium'])
+    parser.add_argument('--books', type=int, default=DEFAULT_BOOKS)
+    parser.add_argument('--live', metavar='URL_FILE', help="Benchmark against Goodreads with the URLs in this file instead of the local stand-in")
+    parser.add_argument('--latency', type=float, default=None, help="Simulated latency per stand-in request (seconds)")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    standin = None
+    if args.live:
+        with open(args.live, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()][:args.books]
+        http_kwargs = {}
+    else:
+        kwargs = {} if args.latency is None else {'latency': args.latency}
+        standin = StandInServer(load_fixture(max_books=args.books), **kwargs).__enter__()
+        urls = standin.book_urls
+        http_kwargs = {'endpoint': standin.endpoint}
+        print(f"Local stand-in with {len(urls)} books at {standin.base_url}")
+
+    results = {}
+    try:
+        for backend_name in args.backends:
+            # One Chrome drives one search at a time; the HTTP backend shares one connection pool
+            max_concurrent = MAX_CONCURRENT_BOOKS if backend_name == 'http' else 1
+            print(f"\n--- {backend_name} ({max_concurrent} concurrent) ---")
+            results[backend_name] = asyncio.run(run_backend(backend_name, urls, max_concurrent,
+                                                            http_kwargs if backend_name == 'http' else {}))
+    finally:
+        if standin:
+            standin.__exit__(None, None, None)
+
+    print(f"\n{'Backend':<10}{'Books':>7}{'Reviews':>9}{'Errors':>8}{'Seconds':>9}{'Reviews/min':>13}{'Books/min':>11}")
+    for backend_name, r in results.items():
+        minutes = r['seconds'] / 60
+        print(f"{backend_name:<10}{r['books']:>7}{r['reviews']:>9}{r['errors']:>8}{r['seconds']:>9.1f}"
+              f"{r['reviews'] / minutes:>13.0f}{r['books'] / minutes:>11.1f}")
+    if len(results) == 2 and results['selenium']['reviews']:
+        print(f"\nHTTP backend: {(results['http']['reviews'] / results['http']['seconds']) / (results['selenium']['reviews'] / results['selenium']['seconds']):.1f}x the reviews/min of Selenium.")
+    sys.exit(1 if any(r['errors'] for r in results.values()) else 0)
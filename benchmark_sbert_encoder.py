@@ -0,0 +1,53 @@
+# benchmark_sbert_encoder.py
+#
+# Durchsatz (Sätze/s) der SBERT-Kodierung: bisheriger Pfad (model.encode mit
+# Standard-Batchgröße) vs. längensortierte Batches, Prozess-Pool und ONNX/int8.
+# Die Genauigkeit wird als Kosinus-Ähnlichkeit zum bisherigen Pfad gemessen.
+
+import os
+import time
+import pandas as pd
+from multiprocessing import cpu_count
+from sentence_transformers import SentenceTransformer
+from entity_scrubber import load_entities, scrub_entities
+from embedding_store import cosine_rows
+from sbert_encoder import load_model, encode_sorted
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+REVIEWS_FILENAME = 'goodreads_reviews_english_clean.csv'
+SBERT_MODEL_NAME = 'all-mpnet-base-v2'
+SAMPLE_SIZE = 1000
+BATCH_SIZE = 64
+
+if __name__ == '__main__':
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    texts = pd.read_csv(REVIEWS_FILENAME)['context'].dropna()
+    texts = texts.sample(n=min(SAMPLE_SIZE, len(texts)), random_state=42)
+    sentences = scrub_entities(texts, load_entities(), cache_filename=None).tolist()
+    print(f"--- SBERT-Durchsatz auf {len(sentences)} Reviews ({cpu_count()} CPUs) ---\n")
+
+    start = time.perf_counter()
+    baseline = SentenceTransformer(SBERT_MODEL_NAME).encode(sentences)
+    t_baseline = time.perf_counter() - start
+    print(f"{'Variante':<40} {'Sätze/s':>9} {'Speedup':>8} {'mittl. Kos.':>12} {'min. Kos.':>10}")
+    print(f"{'bisher: model.encode()':<40} {len(sentences) / t_baseline:9.1f} {1.0:8.2f} {1.0:12.5f} {1.0:10.5f}")
+
+    variants = [
+        ('torch, längensortiert', 'torch', 1),
+        (f'torch, längensortiert, {max(2, cpu_count() // 2)} Prozesse', 'torch', max(2, cpu_count() // 2)),
+        ('onnx, längensortiert', 'onnx', 1),
+        ('onnx-int8, längensortiert', 'onnx-int8', 1),
+    ]
+    for label, backend, processes in variants:
+        try:
+            model = load_model(SBERT_MODEL_NAME, backend)
+        except Exception as e:
+            print(f"{label:<40} übersprungen ({type(e).__name__}: {e})")
+            continue
+        start = time.perf_counter()
+        embeddings = encode_sorted(model, sentences, batch_size=BATCH_SIZE, processes=processes, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        similarity = cosine_rows(baseline, embeddings)
+        print(f"{label:<40} {len(sentences) / elapsed:9.1f} {t_baseline / elapsed:8.2f} {similarity.mean():12.5f} {similarity.min():10.5f}")
@@ -0,0 +1,73 @@
+# benchmark_startup.py
+#
+# Startzeit des Analyzers: misst mit 'python -X importtime', was beim Import von
+# final_analyzer_sbert_umap_cpca.py geladen wird, und wie lange ein vollständig
+# gecachter Lauf braucht. Dient als Regressionsschutz: schwere Bibliotheken (torch,
+# umap/numba, plotly, sklearn, seaborn, matplotlib) dürfen erst in den Schritten
+# geladen werden, die sie brauchen. Exit-Code 1, wenn eine Grenze verletzt wird.
+
+import os
+import re
+import sys
+import time
+import subprocess
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+MODULE = 'final_analyzer_sbert_umap_cpca'
+FORBIDDEN_AT_IMPORT = ['torch', 'sentence_transformers', 'umap', 'numba', 'plotly',
+                       'sklearn', 'seaborn', 'matplotlib']
+IMPORT_BUDGET_S = 1.5   # kumulierte Importzeit des Moduls
+REPEATS = 3
+TOP_N = 15
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def import_profile(module=MODULE):
+    """Führt 'python -X importtime -c "import <module>"' aus; liefert {Modul: (self_us, kumuliert_us, Tiefe)}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Import von '{module}' fehlgeschlagen:\n{result.stderr[-2000:]}")
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            profile[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return profile
+
+def cached_run_time(repeats=REPEATS):
+    """Wall-Zeit eines Laufs, in dem alle Stages aus dem Cache kommen (nach einem ersten vollen Lauf)."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, f'{MODULE}.py', '--workers', '1', '--no-tracemalloc'],
+                       capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == '__main__':
+    runs = [import_profile() for _ in range(REPEATS)]
+    profile = min(runs, key=lambda p: p[MODULE][1])
+    total_s = profile[MODULE][1] / 1e6
+    print(f"Import von '{MODULE}': {total_s:.3f} s (bester von {REPEATS} Läufen)\n")
+    print(f"{'Modul':<50}{'kumuliert ms':>14}{'selbst ms':>11}")
+    top_level = [(name, values) for name, values in profile.items() if values[2] <= 1 and name != MODULE]
+    for name, (self_us, cumulative_us, _) in sorted(top_level, key=lambda item: -item[1][1])[:TOP_N]:
+        print(f"{name:<50}{cumulative_us / 1000:>14.1f}{self_us / 1000:>11.1f}")
+
+    loaded_heavy = sorted({name.split('.')[0] for name in profile} & set(FORBIDDEN_AT_IMPORT))
+    failures = []
+    if loaded_heavy:
+        failures.append(f"Schwere Module beim Import geladen: {', '.join(loaded_heavy)}")
+    if total_s > IMPORT_BUDGET_S:
+        failures.append(f"Importzeit {total_s:.2f} s über dem Budget von {IMPORT_BUDGET_S} s")
+
+    if '--cached-run' in sys.argv:
+        print(f"\nGecachter Lauf (alle Stages aktuell): {cached_run_time():.2f} s")
+
+    if failures:
+        print("\nREGRESSION:\n  - " + "\n  - ".join(failures))
+        sys.exit(1)
+    print("\nOK: keine schweren Module beim Import, Importzeit im Budget.")
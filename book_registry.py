@@ -0,0 +1,121 @@
+import re
+import json
+import pandas as pd
+from dataset_store import read_table, write_table, table_exists
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+REGISTRY_TABLE = 'book_registry'
+REGISTRY_FIELDS = ['title', 'authors', 'canonical_url', 'review_count', 'genres']
+# 'Book_ID_<id>' carries the Goodreads book ID; 'URL_ID_<n>' (old grscraper fallback) only a worker number
+BOOK_ID_NAME_PATTERN = re.compile(r'^Book_ID_(\d+)$')
+PLACEHOLDER_NAME_PATTERN = re.compile(r'^(?:Book_ID_|URL_ID_|Unknown_Book_From_)')
+# Review count in the data embedded in the page: JSON-LD (book page), work stats in __NEXT_DATA__ (book and reviews page)
+REVIEW_COUNT_PATTERNS = [re.compile(r'"reviewCount"\s*:\s*"?(\d+)'), re.compile(r'"textReviewsCount"\s*:\s*(\d+)')]
+
+# ==============================================================================
+# PARSING (called on pages that deduplicator/grscraper already downloaded)
+# ==============================================================================
+def parse_book_page(html):
+    """
+    Extracts book_id, title, authors, canonical URL, review count and genres from a
+    Goodreads book page. Uses the page's JSON-LD block first and the og:* meta tags as a fallback.
+    Returns None if the page has no canonical /book/show/ URL.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    meta_url = soup.find('meta', property='og:url')
+    canonical_url = meta_url.get('content') if meta_url and meta_url.get('content') else None
+    id_match = re.search(r'/book/show/(\d+)', canonical_url or '')
+    if not id_match:
+        return None
+
+    title, authors, review_count = None, [], None
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get('@type') == 'Book':
+            title = data.get('name')
+            author_data = data.get('author') or []
+            author_data = author_data if isinstance(author_data, list) else [author_data]
+            authors = [a.get('name') for a in author_data if isinstance(a, dict) and a.get('name')]
+            rating = data.get('aggregateRating') or {}
+            review_count = pd.to_numeric(rating.get('reviewCount'), errors='coerce') if isinstance(rating, dict) else None
+            break
+    if not title:
+        meta_title = soup.find('meta', property='og:title')
+        title = meta_title.get('content') if meta_title else None
+    # Same genre list grscraper reads with Selenium (scrape_book_metadata)
+    genres = [span.get_text(strip=True) for span in soup.select("div[data-testid='genresList'] a.Button--tag span.Button__labelItem")]
+    return {'book_id': int(id_match.group(1)), 'title': title, 'authors': ' | '.join(authors) or None,
+            'canonical_url': canonical_url,
+            'review_count': int(review_count) if review_count is not None and not pd.isna(review_count) else None,
+            'genres': ' | '.join(g for g in genres if g) or None}
+
+def review_count_from_html(html):
+    """Review count of a book or reviews page by regex, without parsing the DOM (None if absent)."""
+    for pattern in REVIEW_COUNT_PATTERNS:
+        match = pattern.search(html or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+# ==============================================================================
+# REGISTRY (dataset table, loaded into a dict for O(1) lookups)
+# ==============================================================================
+def load_registry():
+    """Returns {book_id: {field: value for REGISTRY_FIELDS}} (empty if no registry exists yet)."""
+    if not table_exists(REGISTRY_TABLE):
+        return {}
+    df = read_table(REGISTRY_TABLE)
+    df = df.reindex(columns=['book_id'] + REGISTRY_FIELDS).astype(object)
+    df = df.where(df.notna(), None)
+    return {int(row['book_id']): {field: row[field] for field in REGISTRY_FIELDS} for row in df.to_dict('records')}
+
+def update_registry(entries):
+    """Upserts parsed book pages (newer entries win). Returns the number of books in the registry."""
+    entries = [e for e in entries if e]
+    if not entries:
+        return len(load_registry())
+    registry = load_registry()
+    for entry in entries:
+        known = registry.get(entry['book_id'], {})
+        registry[entry['book_id']] = {key: entry.get(key) or known.get(key) for key in REGISTRY_FIELDS}
+    df = pd.DataFrame([{'book_id': book_id, **info} for book_id, info in registry.items()], columns=['book_id'] + REGISTRY_FIELDS)
+    df['review_count'] = pd.to_numeric(df['review_count'], errors='coerce').astype('Int64')
+    write_table(REGISTRY_TABLE, df, export_csv=False)
+    return len(registry)
+
+def placeholder_book_ids(names):
+    """Book IDs hidden in 'Book_ID_<id>' placeholder names (NA otherwise)."""
+    return pd.to_numeric(names.astype('string').str.extract(BOOK_ID_NAME_PATTERN, expand=False), errors='coerce').astype('Int64')
+
+def is_placeholder(names):
+    return names.astype('string').str.contains(PLACEHOLDER_NAME_PATTERN, na=False)
+
+def resolve_titles(book_ids, registry):
+    """Vectorized registry lookup: book_id -> title (NA if unknown)."""
+    titles = {book_id: info['title'] for book_id, info in registry.items() if info.get('title')}
+    return book_ids.astype('Int64').map(titles).astype('string')
+
+def resolve_placeholder_names(df, registry, column='book_name'):
+    """
+    Replaces placeholder names with the registry title: by the row's book_id if the frame
+    has one, otherwise by the ID inside 'Book_ID_<id>'. Returns (df, number of resolved rows).
+    """
+    if not registry or column not in df.columns:
+        return df, 0
+    names = df[column].astype('string')
+    placeholder = is_placeholder(names)
+    if not placeholder.any():
+        return df, 0
+    book_ids = placeholder_book_ids(names)
+    if 'book_id' in df.columns:
+        book_ids = df['book_id'].astype('Int64').fillna(book_ids)
+    titles = resolve_titles(book_ids, registry)
+    resolved = placeholder & titles.notna()
+    df[column] = names.mask(resolved, titles)
+    return df, int(resolved.sum())
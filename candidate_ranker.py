@@ -0,0 +1,114 @@
+import os
+import json
+import random
+import numpy as np
+import pandas as pd
+from dataset_store import book_id_from_url
+from book_registry import load_registry
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+LIST_COUNTS_FILENAME = 'book_list_counts.json' # written by discover_urls.py
+LIST_INFO_FILENAME = 'book_list_info.json'     # authors + rating counts from the same list pages
+RANKED_OUTPUT_FILENAME = 'urls_ranked.csv'
+
+# Every signal is scaled to [0, 1] before weighting, so the weights are directly comparable.
+# Only signals known *before* a book is verified: unverified candidates are not in the book
+# registry yet, so anything from their book page (e.g. genres) would always be 0 here.
+WEIGHTS = {
+    'list_count': 1.0,      # how many Kafka-themed lists the book appeared on
+    'ratings_count': 1.0,   # more readers -> more chances that a review says "kafkaesque"
+    'author_overlap': 1.5,  # an author of an already verified book
+}
+
+# ==============================================================================
+# SIGNALS (all cheap: the list pages discover_urls already walks + the book registry)
+# ==============================================================================
+def load_list_counts(filename=LIST_COUNTS_FILENAME):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return {int(book_id): count for book_id, count in json.load(f).items()}
+
+def load_list_info(filename=LIST_INFO_FILENAME):
+    """{book_id: {'authors': 'A|B', 'ratings_count': n}} as recorded from the list rows."""
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return {int(book_id): info for book_id, info in json.load(f).items()}
+
+def split_field(value):
+    return [part.strip() for part in str(value).split('|') if part.strip()] if value else []
+
+def verified_profile(verified_urls, registry):
+    """Authors of the books that were already verified as Kafkaesque."""
+    authors = set()
+    books = 0
+    for url in verified_urls:
+        info = registry.get(book_id_from_url(url))
+        if not info:
+            continue
+        books += 1
+        authors.update(split_field(info.get('authors')))
+    return {'authors': authors, 'books': books}
+
+def candidate_features(urls, registry, list_counts, list_info, profile):
+    """Signals per candidate; a registry entry (re-verification candidates) wins over the list row."""
+    rows = []
+    for url in urls:
+        book_id = book_id_from_url(url)
+        listed = list_info.get(book_id) or {}
+        known = registry.get(book_id) or {}
+        authors = split_field(known.get('authors') or listed.get('authors'))
+        rows.append({
+            'url': url,
+            'book_id': book_id,
+            'list_count': list_counts.get(book_id, 0),
+            'ratings_count': listed.get('ratings_count') or 0,
+            'author_overlap': float(any(a in profile['authors'] for a in authors)),
+        })
+    return pd.DataFrame(rows, columns=['url', 'book_id'] + list(WEIGHTS))
+
+def score_candidates(features, weights=WEIGHTS):
+    """Weighted sum of the signals, each scaled to [0, 1] (counts on a log scale)."""
+    scaled = pd.DataFrame(index=features.index)
+    for column in ['list_count', 'ratings_count']:
+        values = np.log1p(features[column].astype(float))
+        scaled[column] = values / values.max() if values.max() > 0 else 0.0
+    scaled['author_overlap'] = features['author_overlap'].astype(float)
+    return sum(weight * scaled[column] for column, weight in weights.items())
+
+def rank_candidates(urls, verified_urls, registry=None, list_counts=None, list_info=None, weights=WEIGHTS, seed=None):
+    """
+    Returns the candidates as a DataFrame sorted by score (best first). Ties, e.g. books
+    without any signal, keep a random order so that repeated runs don't starve them.
+    """
+    registry = load_registry() if registry is None else registry
+    list_counts = load_list_counts() if list_counts is None else list_counts
+    list_info = load_list_info() if list_info is None else list_info
+    urls = list(urls)
+    random.Random(seed).shuffle(urls)
+    profile = verified_profile(verified_urls, registry)
+    features = candidate_features(urls, registry, list_counts, list_info, profile)
+    features['score'] = score_candidates(features, weights)
+    return features.sort_values('score', ascending=False, kind='stable').reset_index(drop=True)
+
+# ==============================================================================
+# MAIN SCRIPT (inspect the ranking without verifying anything)
+# ==============================================================================
+if __name__ == '__main__':
+    def read_urls(filename):
+        if not os.path.exists(filename):
+            return set()
+        with open(filename, 'r', encoding='utf-8') as f:
+            return set(line.strip() for line in f if line.strip())
+
+    processed = set()
+    for filename in ['urls_verified_kafkaesque.txt', 'urls_failed_to_process.txt', 'urls_no_match_found.txt']:
+        processed |= read_urls(filename)
+    candidates = read_urls('urls_final_unique.txt') - processed
+    ranked = rank_candidates(candidates, read_urls('urls_verified_kafkaesque.txt'))
+    ranked.to_csv(RANKED_OUTPUT_FILENAME, index=False, encoding='utf-8')
+    print(f"Ranked {len(ranked)} unverified candidates -> '{RANKED_OUTPUT_FILENAME}'")
+    print(ranked.head(20).to_string(index=False))
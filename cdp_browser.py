@@ -0,0 +1,485 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import aiohttp
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+CHROME_BINARIES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+MAX_TABS = 24 # concurrent pages inside ONE Chrome process
+DEFAULT_TIMEOUT = 15
+POLL_INTERVAL = 0.25
+STARTUP_TIMEOUT = 20
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
+# Images and fonts are never needed for text scraping; blocking them saves bandwidth and renderer memory
+BLOCKED_URL_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.woff', '*.woff2', '*.ttf']
+
+class CdpError(Exception):
+    """A DevTools command failed (or the page raised a JavaScript exception)."""
+
+class CdpTimeout(CdpError):
+    """Raised by wait_for / navigate when the condition is not met in time."""
+
+# ==============================================================================
+# BROWSER (one Chrome process, one websocket, many page sessions)
+# ==============================================================================
+class CdpBrowser:
+    """
+    Drives a single Chrome over the DevTools protocol. All pages share one websocket
+    (flattened target sessions), so dozens of concurrent pages cost one browser process
+    instead of one Chrome + chromedriver per page.
+    """
+
+    def __init__(self, chrome_path=None, headless=True, user_agent=USER_AGENT, block_resources=True):
+        self.chrome_path = chrome_path or next((path for path in map(shutil.which, CHROME_BINARIES) if path), None)
+        self.headless = headless
+        self.user_agent = user_agent
+        self.block_resources = block_resources
+        self.process = None
+        self.user_data_dir = None
+        self.session = None
+        self.ws = None
+        self._reader = None
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if not self.chrome_path:
+            raise CdpError(f"No Chrome binary found (tried {', '.join(CHROME_BINARIES)}).")
+        self.user_data_dir = tempfile.mkdtemp(prefix='cdp_chrome_')
+        args = [self.chrome_path, '--remote-debugging-port=0', f'--user-data-dir={self.user_data_dir}',
+                '--no-first-run', '--no-default-browser-check', '--disable-extensions',
+                '--disable-blink-features=AutomationControlled', '--window-size=1920,1200', 'about:blank']
+        if self.headless:
+            args.insert(1, '--headless=new')
+        self.process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                            stderr=asyncio.subprocess.DEVNULL)
+        # Chrome writes the chosen port and the browser websocket path into DevToolsActivePort
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not os.path.exists(port_file) or os.path.getsize(port_file) == 0:
+            if time.monotonic() > deadline or self.process.returncode is not None:
+                await self.close()
+                raise CdpError("Chrome did not open a DevTools port.")
+            await asyncio.sleep(0.1)
+        with open(port_file, 'r') as f:
+            port, ws_path = f.read().split()[:2]
+        self.session = aiohttp.ClientSession()
+        self.ws = await self.session.ws_connect(f"ws://127.0.0.1:{port}{ws_path}", max_msg_size=0)
+        self._reader = asyncio.ensure_future(self._read_messages())
+
+    async def _read_messages(self):
+        async for message in self.ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            if 'id' in data:
+                future = self._pending.pop(data['id'], None)
+                if future and not future.done():
+                    if 'error' in data:
+                        future.set_exception(CdpError(f"{data['error'].get('message')} ({data['error'].get('code')})"))
+                    else:
+                        future.set_result(data.get('result', {}))
+            else:
+                listener = self._listeners.get(data.get('sessionId'))
+                if listener:
+                    listener(data['method'], data.get('params', {}))
+        # Connection closed: fail everything still waiting
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CdpError("DevTools connection closed."))
+        self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=DEFAULT_TIMEOUT):
+        self._next_id += 1
+        message = {'id': self._next_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        await self.ws.send_str(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(message['id'], None)
+            raise CdpTimeout(f"{method} timed out after {timeout} s")
+
+    async def new_page(self, isolated=False):
+        """Opens a tab. isolated=True gives it its own browser context (separate cookies/storage)."""
+        params = {'url': 'about:blank'}
+        context_id = None
+        if isolated:
+            context_id = (await self.send('Target.createBrowserContext', {'disposeOnDetach': True}))['browserContextId']
+            params['browserContextId'] = context_id
+        target_id = (await self.send('Target.createTarget', params))['targetId']
+        session_id = (await self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True}))['sessionId']
+        page = CdpPage(self, target_id, session_id, context_id)
+        self._listeners[session_id] = page._on_event
+        await page.setup()
+        return page
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+        if self.session is not None:
+            await self.session.close()
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+# ==============================================================================
+# PAGE (the operations the scrapers need: navigate, search, wait-for, extract JSON)
+# ==============================================================================
+class CdpPage:
+
+    def __init__(self, browser, target_id, session_id, context_id=None):
+        self.browser = browser
+        self.target_id = target_id
+        self.session_id = session_id
+        self.context_id = context_id
+        self._waiters = {}
+        self.crashed = False
+
+    def _on_event(self, method, params):
+        if method == 'Inspector.targetCrashed':
+            self.crashed = True
+        for future in self._waiters.pop(method, []):
+            if not future.done():
+                future.set_result(params)
+
+    def _expect(self, method):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(method, []).append(future)
+        return future
+
+    async def send(self, method, params=None, timeout=DEFAULT_TIMEOUT):
+        return await self.browser.send(method, params, self.session_id, timeout)
+
+    async def setup(self):
+        await self.send('Page.enable')
+        await self.send('Inspector.enable')
+        await self.send('Network.enable')
+        await self.send('Network.setUserAgentOverride', {'userAgent': self.browser.user_agent})
+        if self.browser.block_resources:
+            await self.send('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
+    async def navigate(self, url, timeout=DEFAULT_TIMEOUT):
+        loaded = self._expect('Page.loadEventFired')
+        result = await self.send('Page.navigate', {'url': url}, timeout)
+        if result.get('errorText'):
+            raise CdpError(f"Navigation to {url} failed: {result['errorText']}")
+        try:
+            await asyncio.wait_for(loaded, timeout)
+        except asyncio.TimeoutError:
+            raise CdpTimeout(f"{url} did not finish loading in {timeout} s")
+
+    async def evaluate(self, expression, timeout=DEFAULT_TIMEOUT):
+        result = await self.send('Runtime.evaluate', {'expression': expression, 'returnByValue': True,
+                                                      'awaitPromise': True}, timeout)
+        if result.get('exceptionDetails'):
+            raise CdpError(result['exceptionDetails'].get('exception', {}).get('description', 'JavaScript error'))
+        return result.get('result', {}).get('value')
+
+    async def extract_json(self, script, timeout=DEFAULT_TIMEOUT):
+        """Runs a JS function body in the page and returns its (JSON-serialisable) return value."""
+        payload = await self.evaluate(f"JSON.stringify((() => {{ {script} }})())", timeout)
+        return json.loads(payload) if payload is not None else None
+
+    async def exists(self, selector, xpath=False):
+        if xpath:
+            check = f"!!document.evaluate({json.dumps(selector)}, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue"
+        else:
+            check = f"!!document.querySelector({json.dumps(selector)})"
+        return await self.evaluate(check)
+
+    async def wait_for(self, selector, timeout=DEFAULT_TIMEOUT, xpath=False):
+        """Polls until the selector matches. Raises CdpTimeout otherwise."""
+        deadline = time.monotonic() + timeout
+        while not await self.exists(selector, xpath):
+            if time.monotonic() > deadline:
+                raise CdpTimeout(f"'{selector}' not found within {timeout} s")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def click(self, selector):
+        """Scrolls the element into view and clicks it via JavaScript. Returns False if it does not exist."""
+        return await self.evaluate(f"""(() => {{
+            const el = document.querySelector({json.dumps(selector)});
+            if (!el) return false;
+            el.scrollIntoView({{block: 'center'}});
+            el.click();
+            return true;
+        }})()""")
+
+    async def search(self, selector, text):
+        """Types text into an input (React-compatible value setter) and presses Enter."""
+        found = await self.evaluate(f"""(() => {{
+            const el = document.querySelector({json.dumps(selector)});
+            if (!el) return false;
+            el.scrollIntoView({{block: 'center'}});
+            el.focus();
+            const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+            setter.call(el, {json.dumps(text)});
+            el.dispatchEvent(new Event('input', {{bubbles: true}}));
+            return true;
+        }})()""")
+        if not found:
+            raise CdpError(f"Search box '{selector}' not found")
+        for event_type in ['keyDown', 'keyUp']:
+            await self.send('Input.dispatchKeyEvent', {'type': event_type, 'key': 'Enter', 'code': 'Enter',
+                                                       'windowsVirtualKeyCode': 13, 'text': '\r' if event_type == 'keyDown' else ''})
+
+    async def html(self):
+        return await self.evaluate("document.documentElement.outerHTML")
+
+    async def close(self):
+        self.browser._listeners.pop(self.session_id, None)
+        try:
+            await self.browser.send('Target.closeTarget', {'targetId': self.target_id})
+            if self.context_id:
+                await self.browser.send('Target.disposeBrowserContext', {'browserContextId': self.context_id})
+        except CdpError:
+            pass
+
+# ==============================================================================
+# TAB POOL
+# ==============================================================================
+async def run_on_pages(items, task, max_tabs=MAX_TABS, isolated=False, on_result=None, browser_kwargs=None):
+    """
+    Runs 'await task(page, item)' for every item on at most max_tabs concurrent pages
+    of one Chrome. A page whose task raised or whose renderer crashed is replaced.
+    on_result(item, result) is called as results arrive; returns all results in item order.
+    A failure (including a page that could not be opened) becomes that item's result as the
+    exception, so one bad tab never discards the results of the rest of the batch.
+    """
+    queue = asyncio.Queue()
+    for position, item in enumerate(items):
+        queue.put_nowait((position, item))
+    results = [None] * len(items)
+
+    async with CdpBrowser(**(browser_kwargs or {})) as browser:
+        async def tab_worker():
+            page = None
+            try:
+                while not queue.empty():
+                    position, item = queue.get_nowait()
+                    try:
+                        # Opened lazily: a replacement page that fails to open counts against this item
+                        if page is None:
+                            page = await browser.new_page(isolated)
+                        results[position] = await task(page, item)
+                    except Exception as e:
+                        results[position] = e
+                    if page is not None and (isinstance(results[position], Exception) or page.crashed):
+                        await page.close()
+                        page = None
+                    if on_result:
+                        on_result(item, results[position])
+            finally:
+                if page is not None:
+                    await page.close()
+
+        outcomes = await asyncio.gather(*(tab_worker() for _ in range(min(max_tabs, len(items)))),
+                                        return_exceptions=True)
+        # Items left behind by workers that died outright get the worker's exception as their result
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        while errors and not queue.empty():
+            position, item = queue.get_nowait()
+            results[position] = errors[0]
+            if on_result:
+                on_result(item, results[position])
+    return results
+
+# ==============================================================================
+# GOODREADS OPERATIONS (CDP counterparts of preprocessor.worker_function and
+# grscraper.scrape_goodreads_reviews / scrape_book_metadata)
+# ==============================================================================
+SEARCH_BOX = "input[placeholder='Search review text']"
+REVIEW_CARD = "article.ReviewCard"
+LOAD_MORE = "span[data-testid='loadMore']"
+
+EXPAND_AND_EXTRACT_REVIEWS_JS = """
+    document.querySelectorAll('article.ReviewCard button').forEach(b => {
+        if (b.innerText.trim() === 'Show more') b.click();
+    });
+    return Array.from(document.querySelectorAll('article.ReviewCard')).map(card => {
+        const link = card.querySelector("a[href*='/review/show/']");
+        const text = card.querySelector('span.Formatted');
+        const stars = card.querySelector('span.RatingStars');
+        return {
+            review_id: link ? link.href : null,
+            date: link ? link.innerText.trim() : null,
+            html: text ? text.innerHTML : null,
+            stars_label: stars ? stars.getAttribute('aria-label') : null,
+        };
+    });
+"""
+
+BOOK_METADATA_JS = """
+    const text = sel => { const el = document.querySelector(sel); return el ? el.innerText.trim() : null; };
+    const authors = Array.from(document.querySelectorAll('div.ContributorLinksList span.ContributorLink__name'))
+        .map(el => el.innerText.trim()).filter(Boolean);
+    const reviewsLink = document.querySelector("a[href*='#CommunityReviews']");
+    const genres = Array.from(document.querySelectorAll("div[data-testid='genresList'] a.Button--tag span.Button__labelItem"))
+        .map(el => el.innerText.trim()).filter(Boolean);
+    return {
+        authors: authors,
+        avg_rating: text('div.RatingStatistics__rating'),
+        reviews_text: reviewsLink ? reviewsLink.innerText : null,
+        publication: text("[data-testid='publicationInfo']"),
+        genres: genres,
+    };
+"""
+
+# Same patterns as book_registry.review_count_from_html, on the page's embedded JSON
+REVIEW_COUNT_JS = """
+    for (const script of document.querySelectorAll("script[type='application/ld+json'], script#__NEXT_DATA__")) {
+        const match = script.textContent.match(/"reviewCount"\\s*:\\s*"?(\\d+)/) || script.textContent.match(/"textReviewsCount"\\s*:\\s*(\\d+)/);
+        if (match) return Number(match[1]);
+    }
+    return null;
+"""
+
+async def dismiss_popups(page):
+    if await page.click("button[aria-label='Close']"):
+        await asyncio.sleep(1)
+
+async def search_reviews(page, reviews_url, keyword, results_timeout=6):
+    """Opens the reviews page and searches the review text. Returns True if any review matched."""
+    await page.navigate(reviews_url)
+    await dismiss_popups(page)
+    await page.wait_for(SEARCH_BOX)
+    await page.search(SEARCH_BOX, keyword)
+    await asyncio.sleep(1.5)
+    try:
+        await page.wait_for(REVIEW_CARD, timeout=results_timeout)
+        return True
+    except CdpTimeout:
+        return False
+
+async def load_more(page, settle_seconds=3):
+    """Clicks 'loadMore' once. Returns False at the end of the results."""
+    if not await page.exists(LOAD_MORE):
+        return False
+    await page.evaluate(f"document.querySelector({json.dumps(LOAD_MORE)}).parentElement.click()")
+    await asyncio.sleep(settle_seconds)
+    return True
+
+async def verify_keyword(page, url, keyword='kafkaesque'):
+    """Same contract as preprocessor.worker_function: (status, url, review_count) or ('FAILURE', url, error_type)."""
+    reviews_url = (url if '/reviews' in url else url.split('?')[0] + '/reviews')
+    try:
+        status = 'VALID_MATCH' if await search_reviews(page, reviews_url, keyword) else 'NO_MATCH'
+        return (status, url, await page.extract_json(REVIEW_COUNT_JS))
+    except CdpTimeout:
+        return ('NO_MATCH', url)
+    except Exception as e:
+        return ('FAILURE', url, type(e).__name__)
+
+async def scrape_reviews(page, reviews_url, book_name, keyword, checkpoint_path=None):
+    """
+    Same contract and checkpoint format as grscraper.scrape_goodreads_reviews:
+    returns (reviews, 'complete' | 'partial').
+    """
+    from grscraper import (process_and_truncate_context, load_checkpoint, save_checkpoint,
+                           CHECKPOINT_EVERY_PAGES, FAST_FORWARD_SETTLE_SECONDS)
+    checkpoint = load_checkpoint(checkpoint_path) or {}
+    if checkpoint.get('status') == 'complete':
+        return checkpoint.get('reviews', []), 'complete'
+    scraped_data = checkpoint.get('reviews', [])
+    scraped_review_ids = set(checkpoint.get('review_ids', []))
+    checkpoint.update({'url': reviews_url, 'book_name': book_name, 'status': 'in_progress'})
+    status = 'partial'
+    try:
+        if not await search_reviews(page, reviews_url, keyword, results_timeout=5):
+            checkpoint.update({'status': 'complete', 'page_count': 0, 'reviews': [], 'review_ids': []})
+            save_checkpoint(checkpoint_path, checkpoint)
+            return [], 'complete'
+        page_count = 0
+        # Fast-forward over the pages a previous attempt already harvested
+        while page_count + 1 < checkpoint.get('page_count', 0) and await load_more(page, FAST_FORWARD_SETTLE_SECONDS):
+            page_count += 1
+        while True:
+            page_count += 1
+            for card in await page.extract_json(EXPAND_AND_EXTRACT_REVIEWS_JS) or []:
+                review_id = card.get('review_id')
+                if not review_id or review_id in scraped_review_ids:
+                    continue
+                final_context = process_and_truncate_context(card.get('html'), keyword)
+                if final_context is None:
+                    continue
+                scraped_review_ids.add(review_id)
+                checkpoint['last_review_id'] = review_id
+                stars_match = re.search(r'\d+', card.get('stars_label') or '')
+                scraped_data.append({"book_name": book_name, "stars": stars_match.group(0) if stars_match else "Not rated",
+                                     "date": card.get('date'), "context": final_context, "review_id": review_id})
+            checkpoint.update({'page_count': page_count, 'review_ids': sorted(scraped_review_ids), 'reviews': scraped_data})
+            if page_count % CHECKPOINT_EVERY_PAGES == 0:
+                save_checkpoint(checkpoint_path, checkpoint)
+            if not await load_more(page):
+                status = 'complete'
+                break
+    except Exception as e:
+        print(f"An unexpected critical error during review scraping for {book_name}: {type(e).__name__}")
+    checkpoint['status'] = status
+    save_checkpoint(checkpoint_path, checkpoint)
+    return scraped_data, status
+
+async def scrape_metadata(page, main_book_url):
+    """Same fields as grscraper.scrape_book_metadata, plus the registry entry of the page."""
+    from book_registry import parse_book_page
+    await page.navigate(main_book_url)
+    await dismiss_popups(page)
+    await page.wait_for("div.BookPage__mainContent")
+    try:
+        await page.wait_for("div[data-testid='genresList']", timeout=10)
+    except CdpTimeout:
+        pass
+    raw = await page.extract_json(BOOK_METADATA_JS)
+    reviews_match = re.search(r'([\d,]+)\s+reviews', raw.get('reviews_text') or '')
+    metadata = {
+        'author': " | ".join(raw['authors']) if raw['authors'] else "Not Found",
+        'avg_rating': raw.get('avg_rating') or "Not Found",
+        'total_reviews': reviews_match.group(1).replace(',', '') if reviews_match else "Not Found",
+        'release_date': (raw.get('publication') or "Not Found").replace('First published ', ''),
+        'genres': " | ".join(raw['genres']) if raw['genres'] else "Not Found",
+    }
+    return metadata, parse_book_page(await page.html())
+
+async def process_book(page, url, keyword='kafkaesque'):
+    """CDP counterpart of grscraper.process_single_book (same result dict)."""
+    from grscraper import book_urls_and_name, book_result, get_checkpoint_path
+    reviews_url, main_book_url, book_id, book_name = book_urls_and_name(url, page.target_id[:8])
+    reviews, status = await scrape_reviews(page, reviews_url, book_name, keyword, get_checkpoint_path(main_book_url))
+    if reviews:
+        try:
+            metadata, registry_entry = await scrape_metadata(page, main_book_url)
+            return book_result(url, book_id, book_name, reviews, metadata, status, registry_entry)
+        except Exception as e:
+            print(f"    - CRITICAL ERROR scraping metadata for {main_book_url}: {type(e).__name__}")
+    if status == 'partial':
+        return {'reviews_data': [], 'summary_data': None, 'status': status, 'url': url}
+    return None
+
+def run_sync(items, task, max_tabs=MAX_TABS, on_result=None):
+    """Blocking entry point for the (synchronous) scripts."""
+    return asyncio.run(run_on_pages(items, task, max_tabs=max_tabs, on_result=on_result))
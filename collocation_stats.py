@@ -0,0 +1,294 @@
+# collocation_stats.py
+#
+# Inkrementelle Kollokations- und Trend-Statistik um das Schlüsselwort: welche Wörter
+# stehen neben "kafkaesque", und wie ändert sich das pro Jahr, Autoren-Typ und Sterne?
+# Pro Review werden die Wörter in einem Fenster um das Schlüsselwort (und alle Wörter
+# des Kontexts als Hintergrund) in einen festen Vektor gehasht. Gespeichert werden nur
+# die Summen pro Gruppe (dünn besetzte Matrizen Gruppen x Hash-Buckets); neue Reviews
+# werden dazuaddiert, ohne die alten erneut zu zählen.
+
+import os
+import re
+import sys
+import json
+import zlib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from entity_scrubber import text_hash
+from dataset_store import iter_table_batches, read_table
+from book_registry import load_registry
+from final_analyzer_sbert_umap_cpca import (
+    join_metadata, stage_prepare, REVIEWS_TABLE, SUMMARY_TABLE, REVIEWS_FILENAME, SUMMARY_FILENAME, SPLIT_DATE
+)
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+STATS_DIR = 'collocation_stats'
+KEYWORD_PREFIXES = ('kafkaesque', 'kafkaesk', 'kafka-esque') # auch Plural, 'kafkaesk' usw.
+WINDOW = 5              # Wörter links und rechts des Schlüsselworts
+N_FEATURES = 2 ** 20    # Hash-Buckets (Kollisionen bei dieser Größe vernachlässigbar)
+TOKEN_PATTERN = re.compile(r"[a-z][a-z'\-]*[a-z]|[a-z]")
+# Gruppierungen, für die Summen gehalten werden ('all' = gesamter Korpus)
+DIMENSIONS = ['all', 'year', 'is_kafka_author', 'period', 'stars']
+MIN_COUNT = 10          # Mindestanzahl im Fenster für PMI / Log-Odds / Trends
+PRIOR_STRENGTH = 1000.0 # Gewicht des Hintergrund-Priors der Log-Odds (Monroe et al. 2008)
+ROLLING_YEARS = 3       # gleitendes Fenster der Trends
+TOP_N = 30
+BATCH_SIZE = 50000
+CONTRASTS = {           # Name: (Dimension, Gruppe A, Gruppe B; None = alle anderen)
+    'author': ('is_kafka_author', 'Franz Kafka', 'Other'),
+    'period': ('period', 'Pre-2021', '2021+'),
+}
+
+# ==============================================================================
+# TOKENISIERUNG + HASHING
+# ==============================================================================
+def term_hash(term):
+    return zlib.crc32(term.encode('utf-8')) % N_FEATURES
+
+def is_keyword(token):
+    return token.startswith(KEYWORD_PREFIXES)
+
+def window_terms(text, window=WINDOW):
+    """(Wörter im Fenster um jedes Vorkommen des Schlüsselworts, alle übrigen Wörter des Kontexts)."""
+    tokens = TOKEN_PATTERN.findall(str(text).lower())
+    hits = [i for i, token in enumerate(tokens) if is_keyword(token)]
+    positions = {j for i in hits for j in range(max(0, i - window), min(len(tokens), i + window + 1))}
+    near = [tokens[j] for j in sorted(positions) if not is_keyword(tokens[j])]
+    return near, [token for token in tokens if not is_keyword(token)]
+
+def count_matrices(texts, vocab):
+    """Zwei dünne Zählmatrizen (Reviews x N_FEATURES): Fenster und Hintergrund. Ergänzt vocab {Hash: Wort}."""
+    rows = {'window': ([], []), 'background': ([], [])}
+    for i, text in enumerate(texts):
+        near, background = window_terms(text)
+        for kind, terms in [('window', near), ('background', background)]:
+            for term in terms:
+                h = term_hash(term)
+                vocab.setdefault(h, term)
+                rows[kind][0].append(i)
+                rows[kind][1].append(h)
+    return tuple(sp.csr_matrix((np.ones(len(r), dtype=np.int64), (r, c)), shape=(len(texts), N_FEATURES))
+                 for r, c in rows.values())
+
+def review_keys(df):
+    """Eindeutiger Schlüssel pro Review: review_id (Goodreads-URL), sonst Hash aus Buch und Text."""
+    fallback = (df['book_name'].astype(str) + '\x00' + df['context'].astype(str)).map(text_hash)
+    if 'review_id' not in df.columns:
+        return fallback
+    return df['review_id'].astype(object).where(df['review_id'].notna(), fallback).astype(str)
+
+def group_labels(df, dimension):
+    if dimension == 'all':
+        return pd.Series('all', index=df.index)
+    if dimension == 'year':
+        return df['date'].dt.year.astype(str)
+    if dimension == 'stars':
+        return df['stars'].astype('Int64').astype(str).replace('<NA>', 'Not rated')
+    return df[dimension].astype(str)
+
+# ==============================================================================
+# AGGREGATE (pro Dimension: Gruppen x Hash-Buckets, persistent)
+# ==============================================================================
+class CollocationStats:
+    """
+    Summen der Fenster- und Hintergrund-Zählungen pro Gruppe jeder Dimension. update()
+    zählt nur Reviews, deren Schlüssel noch unbekannt ist, und addiert sie über eine
+    dünne Indikatormatrix (Gruppen x Reviews) @ Zählmatrix (Reviews x Buckets) dazu.
+    """
+
+    def __init__(self, stats_dir=STATS_DIR):
+        self.stats_dir = stats_dir
+        self.groups = {dimension: [] for dimension in DIMENSIONS}
+        self.window = {dimension: sp.csr_matrix((0, N_FEATURES), dtype=np.int64) for dimension in DIMENSIONS}
+        self.background = {dimension: sp.csr_matrix((0, N_FEATURES), dtype=np.int64) for dimension in DIMENSIONS}
+        self.n_reviews = {dimension: np.zeros(0, dtype=np.int64) for dimension in DIMENSIONS}
+        self.vocab = {}
+        self.seen = set()
+        self.load()
+
+    @staticmethod
+    def params():
+        return {'keyword_prefixes': list(KEYWORD_PREFIXES), 'window': WINDOW, 'n_features': N_FEATURES,
+                'dimensions': DIMENSIONS, 'token_pattern': TOKEN_PATTERN.pattern}
+
+    def load(self):
+        state_filename = os.path.join(self.stats_dir, 'state.json')
+        if not os.path.exists(state_filename):
+            return
+        with open(state_filename, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('params') != self.params():
+            print("Parameter der Kollokations-Statistik haben sich geändert. Beginne von vorn.")
+            return
+        self.groups = state['groups']
+        self.n_reviews = {dimension: np.array(counts, dtype=np.int64) for dimension, counts in state['n_reviews'].items()}
+        self.vocab = {int(h): term for h, term in state['vocab'].items()}
+        self.seen = set(state['seen'])
+        for dimension in DIMENSIONS:
+            self.window[dimension] = sp.load_npz(os.path.join(self.stats_dir, f'window_{dimension}.npz')).tocsr()
+            self.background[dimension] = sp.load_npz(os.path.join(self.stats_dir, f'background_{dimension}.npz')).tocsr()
+
+    def save(self):
+        os.makedirs(self.stats_dir, exist_ok=True)
+        for dimension in DIMENSIONS:
+            for kind, matrices in [('window', self.window), ('background', self.background)]:
+                filename = os.path.join(self.stats_dir, f'{kind}_{dimension}.npz')
+                sp.save_npz(filename + '.tmp.npz', matrices[dimension])
+                os.replace(filename + '.tmp.npz', filename)
+        state_filename = os.path.join(self.stats_dir, 'state.json')
+        with open(state_filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'params': self.params(), 'groups': self.groups,
+                       'n_reviews': {dimension: counts.tolist() for dimension, counts in self.n_reviews.items()},
+                       'vocab': self.vocab, 'seen': sorted(self.seen)}, f)
+        os.replace(state_filename + '.tmp', state_filename)
+
+    def update(self, df):
+        """Addiert die noch nicht gezählten Reviews (df nach stage_prepare). Gibt deren Anzahl zurück."""
+        keys = review_keys(df)
+        new = ~keys.isin(self.seen) & ~keys.duplicated()
+        df = df[new.values]
+        if df.empty:
+            return 0
+        window, background = count_matrices(df['context'].tolist(), self.vocab)
+        for dimension in DIMENSIONS:
+            labels = group_labels(df, dimension)
+            groups = self.groups[dimension]
+            groups.extend(label for label in pd.unique(labels) if label not in groups)
+            index = {label: i for i, label in enumerate(groups)}
+            rows = labels.map(index).values
+            indicator = sp.csr_matrix((np.ones(len(df), dtype=np.int64), (rows, np.arange(len(df)))),
+                                      shape=(len(groups), len(df)))
+            for matrices, counts in [(self.window, window), (self.background, background)]:
+                matrices[dimension].resize((len(groups), N_FEATURES))
+                matrices[dimension] = (matrices[dimension] + indicator @ counts).tocsr()
+            self.n_reviews[dimension] = np.concatenate([self.n_reviews[dimension],
+                                                        np.zeros(len(groups) - len(self.n_reviews[dimension]), dtype=np.int64)])
+            self.n_reviews[dimension] += np.bincount(rows, minlength=len(groups))
+        self.seen.update(keys[new].tolist())
+        return len(df)
+
+    def row(self, dimension, group, kind='window'):
+        """Zählvektor (1 x N_FEATURES) einer Gruppe; group=None -> Summe aller Gruppen; ('not', g) -> alle außer g."""
+        matrix = (self.window if kind == 'window' else self.background)[dimension]
+        if group is None:
+            return sp.csr_matrix(matrix.sum(axis=0))
+        if isinstance(group, tuple) and group[0] == 'not':
+            mask = np.array([g != group[1] for g in self.groups[dimension]])
+            return sp.csr_matrix(matrix[mask].sum(axis=0))
+        if group not in self.groups[dimension]:
+            raise KeyError(f"Gruppe '{group}' gibt es in der Dimension '{dimension}' nicht.")
+        return matrix[self.groups[dimension].index(group)]
+
+    def terms(self, columns):
+        return [self.vocab.get(int(h), f'#{h}') for h in columns]
+
+# ==============================================================================
+# KONTRASTE (nur über die besetzten Buckets gerechnet)
+# ==============================================================================
+def pmi(stats, dimension='all', group='all', min_count=MIN_COUNT):
+    """
+    PMI jedes Worts mit dem Schlüsselwort-Fenster innerhalb einer Gruppe:
+    log( P(Wort | Fenster) / P(Wort | Kontext) ). Positiv = steht bevorzugt neben 'kafkaesque'.
+    """
+    window, background = stats.row(dimension, group), stats.row(dimension, group, 'background')
+    columns = window.indices[window.data >= min_count]
+    if not len(columns):
+        return pd.DataFrame(columns=['term', 'count', 'pmi'])
+    w = window[:, columns].toarray().ravel().astype(float)
+    b = background[:, columns].toarray().ravel().astype(float)
+    scores = np.log((w / window.sum()) / (b / background.sum()))
+    return pd.DataFrame({'term': stats.terms(columns), 'count': w.astype(int), 'pmi': scores}).sort_values('pmi', ascending=False)
+
+def log_odds(stats, dimension, group_a, group_b=None, min_count=MIN_COUNT, prior_strength=PRIOR_STRENGTH):
+    """
+    Log-Odds-Verhältnis mit informativem Dirichlet-Prior (Monroe, Colaresi & Quinn 2008)
+    zwischen den Fenster-Zählungen zweier Gruppen; group_b=None vergleicht mit allen anderen.
+    Liefert z-Werte: positiv = typisch für group_a, negativ = typisch für group_b.
+    """
+    y_a = stats.row(dimension, group_a)
+    y_b = stats.row(dimension, group_b if group_b is not None else ('not', group_a))
+    prior = stats.row('all', 'all')
+    columns = np.union1d(y_a.indices, y_b.indices)
+    a = y_a[:, columns].toarray().ravel().astype(float)
+    b = y_b[:, columns].toarray().ravel().astype(float)
+    keep = (a + b) >= min_count
+    columns, a, b = columns[keep], a[keep], b[keep]
+    alpha = prior[:, columns].toarray().ravel() * prior_strength / max(prior.sum(), 1)
+    alpha = np.maximum(alpha, 1e-3)
+    n_a, n_b, alpha_0 = y_a.sum(), y_b.sum(), alpha.sum()
+    delta = (np.log((a + alpha) / (n_a + alpha_0 - a - alpha)) - np.log((b + alpha) / (n_b + alpha_0 - b - alpha)))
+    z = delta / np.sqrt(1.0 / (a + alpha) + 1.0 / (b + alpha))
+    return pd.DataFrame({'term': stats.terms(columns), 'count_a': a.astype(int), 'count_b': b.astype(int),
+                         'log_odds': delta, 'z': z}).sort_values('z', ascending=False)
+
+def term_trends(stats, terms=None, rolling=ROLLING_YEARS, min_count=MIN_COUNT, top_n=TOP_N):
+    """
+    Anteil der Wörter an allen Fenster-Wörtern pro Jahr (gleitend über 'rolling' Jahre).
+    Ohne terms: die top_n häufigsten Fenster-Wörter. Zeilen = Jahre, Spalten = Wörter.
+    """
+    matrix = stats.window['year']
+    years = np.array([int(y) for y in stats.groups['year']])
+    order = np.argsort(years)
+    matrix, years = matrix[order], years[order]
+    if terms is None:
+        totals = np.asarray(matrix.sum(axis=0)).ravel()
+        columns = np.argsort(totals)[::-1][:top_n]
+        columns = columns[totals[columns] >= min_count]
+    else:
+        columns = np.array([term_hash(term) for term in terms], dtype=np.int64)
+    counts = pd.DataFrame(matrix[:, columns].toarray(), index=years, columns=stats.terms(columns))
+    counts = counts.reindex(range(years.min(), years.max() + 1), fill_value=0) if len(years) else counts
+    totals = pd.Series(np.asarray(matrix.sum(axis=1)).ravel(), index=years).reindex(counts.index, fill_value=0)
+    rolled_counts = counts.rolling(rolling, min_periods=1).sum()
+    rolled_totals = totals.rolling(rolling, min_periods=1).sum()
+    return rolled_counts.div(rolled_totals.replace(0, np.nan), axis=0)
+
+# ==============================================================================
+# AKTUALISIEREN + BERICHTE
+# ==============================================================================
+def update_stats(stats=None, batch_size=BATCH_SIZE):
+    """Streamt die englischen Reviews und zählt nur die neu hinzugekommenen."""
+    stats = stats or CollocationStats()
+    summary_df = read_table(SUMMARY_TABLE, columns=['book_id', 'book_name', 'author', 'genres'], csv_fallback=SUMMARY_FILENAME)
+    registry = load_registry()
+    added = total = 0
+    for batch in iter_table_batches(REVIEWS_TABLE, batch_size=batch_size, csv_fallback=REVIEWS_FILENAME):
+        df = stage_prepare(join_metadata(batch, summary_df, registry), SPLIT_DATE)
+        added += stats.update(df)
+        total += len(df)
+    if added:
+        stats.save()
+    print(f"Kollokations-Statistik: {added} neue von {total} Reviews gezählt "
+          f"({len(stats.seen)} insgesamt, {len(stats.vocab)} Wörter im Fenster-Vokabular).")
+    return stats
+
+def write_reports(stats, output_dir=STATS_DIR, top_n=TOP_N):
+    os.makedirs(output_dir, exist_ok=True)
+    pmi(stats).head(top_n * 10).to_csv(os.path.join(output_dir, 'collocations_pmi.csv'), index=False, encoding='utf-8')
+    for name, (dimension, group_a, group_b) in CONTRASTS.items():
+        if group_a in stats.groups[dimension] and (group_b is None or group_b in stats.groups[dimension]):
+            log_odds(stats, dimension, group_a, group_b).to_csv(os.path.join(output_dir, f'log_odds_{name}.csv'),
+                                                                index=False, encoding='utf-8')
+    if stats.groups['year']:
+        term_trends(stats).to_csv(os.path.join(output_dir, 'term_trends.csv'), index_label='year', encoding='utf-8')
+    print(f"Berichte gespeichert in '{output_dir}/'.")
+
+# ==============================================================================
+# HAUPTSKRIPT: python collocation_stats.py [rebuild]
+# ==============================================================================
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        import shutil
+        shutil.rmtree(STATS_DIR, ignore_errors=True)
+    stats = update_stats()
+    write_reports(stats)
+    print("\nTypische Nachbarn von 'kafkaesque' (PMI):")
+    print(pmi(stats).head(TOP_N).to_string(index=False))
+    for name, (dimension, group_a, group_b) in CONTRASTS.items():
+        if group_a in stats.groups[dimension] and group_b in stats.groups[dimension]:
+            table = log_odds(stats, dimension, group_a, group_b)
+            print(f"\n{group_a} vs. {group_b} (z-Werte der Log-Odds):")
+            print(pd.concat([table.head(TOP_N // 2), table.tail(TOP_N // 2)]).to_string(index=False))
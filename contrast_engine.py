@@ -0,0 +1,106 @@
+# contrast_engine.py
+
+import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from lda_significance import precompute, separation_batch
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+CONTRASTS_FILENAME = 'contrasts.json'
+MIN_GROUP_SIZE = 20 # kleinere Gruppen werden übersprungen
+CV_FOLDS = 5
+N_PERMUTATIONS = 200 # schneller p-Wert; ausführlich: lda_significance.py
+
+# ==============================================================================
+# KONTRAST-SPEZIFIKATION
+# ==============================================================================
+def load_contrast_spec(filename=CONTRASTS_FILENAME):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def plot_contrasts(spec):
+    """Die Kontraste, für die Karte und LDA-Plot erzeugt werden (Eintrag 'plot')."""
+    return [entry for entry in spec if entry.get('plot')]
+
+def expand_contrasts(spec, df):
+    """
+    Wandelt die deklarative Spezifikation in (Name, Beschreibung, Maske) um.
+    Unterstützt: Spalte == Wert ('column'/'positive'), Prädikat ('query', pandas.eval)
+    sowie Generatoren 'per_genre', 'per_star' und 'sliding_year'.
+    """
+    contrasts = []
+    for entry in spec:
+        kind = entry.get('type')
+        min_size = entry.get('min_group_size', MIN_GROUP_SIZE)
+        if kind == 'per_genre':
+            genres = df['genres'].explode().dropna()
+            for genre, count in genres.value_counts().items():
+                if count >= min_size:
+                    mask = df['genres'].map(lambda g, genre=genre: isinstance(g, (list, np.ndarray)) and genre in list(g))
+                    contrasts.append((f"genre:{genre}", f"Genre '{genre}' vs. Rest", mask.values))
+        elif kind == 'per_star':
+            for stars in sorted(df['stars'].dropna().unique()):
+                contrasts.append((f"stars:{int(stars)}", f"{int(stars)} Sterne vs. Rest",
+                                  (df['stars'] == stars).fillna(False).values))
+        elif kind == 'sliding_year':
+            for year in entry['years']:
+                contrasts.append((f"before:{year}", f"vor {year} vs. ab {year}",
+                                  (df['date'] < f"{year}-01-01").values))
+        elif 'query' in entry:
+            mask = pd.Series(df.eval(entry['query']), index=df.index).fillna(False).astype(bool)
+            contrasts.append((entry['name'], entry.get('description', entry['query']), mask.values))
+        else:
+            contrasts.append((entry['name'], entry.get('description', f"{entry['column']} == {entry['positive']}"),
+                              (df[entry['column']] == entry['positive']).values))
+    return contrasts
+
+# ==============================================================================
+# AUSWERTUNG
+# ==============================================================================
+def _cv_auc(args):
+    """Kreuzvalidierte AUC einer LDA (läuft pro Kontrast in einem Worker-Prozess)."""
+    reduced, labels = args
+    from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+    from sklearn.model_selection import cross_val_score, StratifiedKFold
+    folds = StratifiedKFold(n_splits=min(CV_FOLDS, int(labels.sum()), int((~labels).sum())), shuffle=True, random_state=42)
+    return float(cross_val_score(LinearDiscriminantAnalysis(), reduced, labels, cv=folds, scoring='roc_auc').mean())
+
+def evaluate_contrasts(df, embeddings, embeddings_2d, spec, n_workers=None, n_components=None, random_state=42):
+    """
+    Bewertet alle Kontraste gegen dieselben Embeddings und UMAP-Koordinaten:
+    - Fisher-Trennung aller Kontraste in EINER Batch-Operation (gemeinsame SVD)
+    - schneller Permutations-p-Wert (ebenfalls gebatcht)
+    - kreuzvalidierte LDA-AUC, parallel über einen Prozess-Pool
+    - Abstand der Gruppenschwerpunkte auf der UMAP-Karte
+    Liefert eine Tabelle, sortiert nach Trennung.
+    """
+    contrasts = [(name, description, mask) for name, description, mask in expand_contrasts(spec, df)
+                 if min(mask.sum(), (~mask).sum()) >= MIN_GROUP_SIZE]
+    if not contrasts:
+        return pd.DataFrame()
+    pre = precompute(embeddings, n_components)
+    masks = np.stack([mask for _, _, mask in contrasts])
+    separation = separation_batch(pre, masks)
+
+    rng = np.random.default_rng(random_state)
+    p_values = []
+    for mask, observed in zip(masks, separation):
+        null = separation_batch(pre, np.stack([rng.permutation(mask) for _ in range(N_PERMUTATIONS)]))
+        p_values.append((1 + np.sum(null >= observed)) / (1 + N_PERMUTATIONS))
+
+    # Die gemeinsame, reduzierte Basis (statt der vollen Embeddings) an die Worker geben
+    reduced = pre['Z'].astype(np.float32)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        aucs = list(executor.map(_cv_auc, [(reduced, mask) for mask in masks]))
+
+    spread = np.linalg.norm(embeddings_2d.std(axis=0))
+    rows = []
+    for (name, description, mask), sep, p_value, auc in zip(contrasts, separation, p_values, aucs):
+        centroid_distance = np.linalg.norm(embeddings_2d[mask].mean(axis=0) - embeddings_2d[~mask].mean(axis=0))
+        rows.append({'contrast': name, 'description': description, 'n_positive': int(mask.sum()),
+                     'n_negative': int((~mask).sum()), 'fisher_separation': float(sep), 'p_value': float(p_value),
+                     'cv_auc': auc, 'umap_centroid_distance': float(centroid_distance / spread)})
+    return pd.DataFrame(rows).sort_values('cv_auc', ascending=False).reset_index(drop=True)
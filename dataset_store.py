@@ -0,0 +1,214 @@
+# dataset_store.py
+
+import os
+import re
+import sys
+import glob
+import time
+import uuid
+import pandas as pd
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+DATASET_DIR = 'dataset'
+DATE_FORMAT = '%B %d, %Y' # e.g. "March 20, 2008" - parsed explicitly, no format inference
+
+# Table name -> CSV the table replaces (now only written as an export target).
+CSV_EXPORTS = {
+    'reviews': 'goodreads_reviews_output.csv',
+    'reviews_english': 'goodreads_reviews_english_filtered.csv', # not the manual selection (language_filter trains on it)
+    'summary': 'goodreads_book_summary.csv',
+    'summary_enriched': 'goodreads_book_summary_enriched.csv',
+    'reviews_corrected': 'goodreads_reviews_output_corrected.csv',
+    'summary_corrected': 'goodreads_book_summary_corrected.csv',
+}
+# Legacy CSVs that are imported under a different name than their export (and never overwritten)
+LEGACY_CSV_IMPORTS = {'reviews_english': 'goodreads_reviews_english_clean.csv'}
+URL_FILENAMES = ['urls_verified_kafkaesque.txt', 'urls_final_unique.txt']
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+def parse_dates(values):
+    values = values.astype('string').str.replace(r'^(First published|Published)\s+', '', regex=True).str.strip()
+    return pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+
+def split_genres(values):
+    """'Fiction | Classics' -> ['Fiction', 'Classics']; lists (e.g. read back from Parquet) stay lists."""
+    def to_list(v):
+        if isinstance(v, str):
+            return [g.strip() for g in v.split('|') if g.strip()] if v != 'Not Found' else []
+        return [str(g) for g in v] if hasattr(v, '__len__') else []
+    return values.map(to_list)
+
+def to_review_schema(df):
+    """Typed review table: Int64 book_id, categorical book_name, date, Int8 stars ('Not rated' -> NA)."""
+    df = df.copy()
+    if 'book_id' not in df.columns:
+        df['book_id'] = pd.NA
+    df['book_id'] = pd.to_numeric(df['book_id'], errors='coerce').astype('Int64')
+    df['book_name'] = df['book_name'].astype('string').astype('category')
+    df['stars'] = pd.to_numeric(df['stars'], errors='coerce').astype('Int8')
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = parse_dates(df['date'])
+    df['context'] = df['context'].astype('string')
+    if 'review_id' in df.columns:
+        df['review_id'] = df['review_id'].astype('string')
+    return df
+
+def to_summary_schema(df):
+    """Typed summary table: Int64 book_id, categorical book_name/author, numeric counts, date, genres as list."""
+    df = df.copy()
+    if 'book_id' not in df.columns:
+        df['book_id'] = pd.NA
+    df['book_id'] = pd.to_numeric(df['book_id'], errors='coerce').astype('Int64')
+    for column in ['book_name', 'author']:
+        df[column] = df[column].astype('string').astype('category')
+    df['avg_rating'] = pd.to_numeric(df['avg_rating'], errors='coerce').astype('float32')
+    for column in ['total_reviews', 'kafkaesque_review_count', 'english_review_count']:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int32' if column != 'total_reviews' else 'Int64')
+    if not pd.api.types.is_datetime64_any_dtype(df['release_date']):
+        df['release_date'] = parse_dates(df['release_date'])
+    df['genres'] = split_genres(df['genres'])
+    return df
+
+def apply_schema(name, df):
+    if name.startswith('summary'):
+        return to_summary_schema(df)
+    if name.startswith('reviews'):
+        return to_review_schema(df)
+    return df
+
+def to_csv_frame(df):
+    """Inverse of the schema for CSV export (same columns/formatting the old CSVs had)."""
+    df = df.copy()
+    for column in ['date', 'release_date']:
+        if column in df.columns:
+            df[column] = df[column].dt.strftime(DATE_FORMAT).str.replace(r' 0(\d),', r' \1,', regex=True)
+    if 'stars' in df.columns:
+        df['stars'] = df['stars'].astype('string').fillna('Not rated')
+    if 'genres' in df.columns:
+        df['genres'] = df['genres'].map(lambda g: ' | '.join(g) if g is not None and len(g) else 'Not Found')
+    return df
+
+# ==============================================================================
+# BOOK ID HELPERS
+# ==============================================================================
+def book_id_from_url(url):
+    match = re.search(r'/show/(\d+)', str(url))
+    return int(match.group(1)) if match else None
+
+def slug_name_from_url(url):
+    """Same name derivation grscraper uses for book_name."""
+    match = re.search(r'/show/\d+[\.\-]([^/?]+)', str(url))
+    return match.group(1).replace('_', ' ').replace('-', ' ') if match else None
+
+def book_ids_from_url_files(filenames=URL_FILENAMES):
+    """Maps slug-derived book names to their IDs, used to backfill book_id for legacy CSVs."""
+    mapping = {}
+    for filename in filenames:
+        if not os.path.exists(filename):
+            continue
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                name, book_id = slug_name_from_url(line.strip()), book_id_from_url(line.strip())
+                if name and book_id:
+                    mapping.setdefault(name, book_id)
+    return mapping
+
+# ==============================================================================
+# READ / WRITE
+# ==============================================================================
+def table_path(name, dataset_dir=DATASET_DIR):
+    return os.path.join(dataset_dir, name)
+
+def table_exists(name, dataset_dir=DATASET_DIR):
+    return bool(glob.glob(os.path.join(table_path(name, dataset_dir), '*.parquet')))
+
+def write_table(name, df, mode='overwrite', dataset_dir=DATASET_DIR, export_csv=True):
+    """
+    Writes a table as Parquet. mode='append' adds a new part file (no rewrite of
+    existing data), mode='overwrite' replaces all parts. Optionally refreshes the CSV export.
+    """
+    path = table_path(name, dataset_dir)
+    os.makedirs(path, exist_ok=True)
+    df = apply_schema(name, df)
+    # Parts that exist before this write; only these are removed by an overwrite
+    old_parts = set(glob.glob(os.path.join(path, '*.parquet'))) if mode == 'overwrite' else set()
+    # The random suffix keeps two writes in the same second (e.g. overwrite, then append) apart
+    part_filename = os.path.join(path, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex}.parquet")
+    df.to_parquet(part_filename + '.tmp', engine='pyarrow', index=False)
+    os.replace(part_filename + '.tmp', part_filename)
+    for old_part in old_parts - {part_filename}:
+        os.remove(old_part)
+    if export_csv and name in CSV_EXPORTS:
+        export_table(name, CSV_EXPORTS[name], dataset_dir)
+    return part_filename
+
+def read_table(name, columns=None, filters=None, dataset_dir=DATASET_DIR, csv_fallback=None):
+    """
+    Reads a table with column projection and predicate pushdown, e.g.
+    read_table('reviews', columns=['book_id', 'context'], filters=[('stars', '>=', 4)]).
+    If the table does not exist yet, it is imported once from 'csv_fallback'.
+    """
+    if not table_exists(name, dataset_dir):
+        if not csv_fallback:
+            raise FileNotFoundError(f"Dataset table '{table_path(name, dataset_dir)}' not found.")
+        import_csv(name, csv_fallback, dataset_dir)
+    return pd.read_parquet(table_path(name, dataset_dir), engine='pyarrow', columns=columns, filters=filters)
+
+def iter_table_batches(name, columns=None, filters=None, batch_size=50000, dataset_dir=DATASET_DIR, csv_fallback=None):
+    """Streams a table as DataFrames of at most batch_size rows (never the whole table in memory)."""
+    import pyarrow.dataset as ds
+    if not table_exists(name, dataset_dir):
+        if not csv_fallback:
+            raise FileNotFoundError(f"Dataset table '{table_path(name, dataset_dir)}' not found.")
+        import_csv(name, csv_fallback, dataset_dir)
+    dataset = ds.dataset(table_path(name, dataset_dir), format='parquet')
+    expression = pq_filters_to_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def pq_filters_to_expression(filters):
+    """Converts read_table-style filters [('stars', '>=', 4), ...] (ANDed) into a pyarrow.dataset expression."""
+    import pyarrow.dataset as ds
+    import operator
+    operators = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+                 '>': operator.gt, '>=': operator.ge}
+    expression = None
+    for column, op, value in filters:
+        field = ds.field(column)
+        term = field.isin(value) if op == 'in' else operators[op](field, value)
+        expression = term if expression is None else expression & term
+    return expression
+
+def export_table(name, csv_filename, dataset_dir=DATASET_DIR):
+    to_csv_frame(read_table(name, dataset_dir=dataset_dir)).to_csv(csv_filename, index=False, encoding='utf-8')
+
+def import_csv(name, csv_filename, dataset_dir=DATASET_DIR):
+    """One-time conversion of a legacy CSV into a typed table (book_id backfilled from the URL lists)."""
+    if not os.path.exists(csv_filename):
+        raise FileNotFoundError(f"Input file not found: {csv_filename}")
+    df = pd.read_csv(csv_filename)
+    if 'book_id' not in df.columns:
+        df['book_id'] = df['book_name'].map(book_ids_from_url_files())
+    print(f"Importing '{csv_filename}' into dataset table '{name}' ({len(df)} rows, "
+          f"{df['book_id'].notna().sum()} with book_id).")
+    return write_table(name, df, mode='overwrite', dataset_dir=dataset_dir, export_csv=False)
+
+# ==============================================================================
+# MAIN SCRIPT (one-time import of all legacy CSVs)
+# ==============================================================================
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        for table_name, filename in CSV_EXPORTS.items():
+            if table_exists(table_name):
+                export_table(table_name, filename)
+                print(f"Exported '{table_name}' to '{filename}'.")
+    else:
+        for table_name, filename in {**CSV_EXPORTS, **LEGACY_CSV_IMPORTS}.items():
+            if os.path.exists(filename):
+                import_csv(table_name, filename)
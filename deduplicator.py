@@ -1,9 +1,8 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-import re
 import os
 import time
+from book_registry import parse_book_page, update_registry
 
 
 try:
@@ -29,7 +28,10 @@ if os.name == 'nt':
 # ==============================================================================
 
 async def get_canonical_url_fast(session, initial_url):
-    """Asynchronously tries to fetch and parse a URL."""
+    """
+    Asynchronously tries to fetch and parse a URL. Returns the book registry entry
+    (book_id, title, authors, canonical_url) parsed from the same response, or None.
+    """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
     }
@@ -37,19 +39,17 @@ async def get_canonical_url_fast(session, initial_url):
         async with session.get(initial_url, headers=headers, timeout=10) as response:
             if response.status != 200: return None
             html = await response.text()
-            soup = BeautifulSoup(html, 'html.parser')
-            meta_tag = soup.find('meta', property='og:url')
-            return meta_tag.get('content') if meta_tag and meta_tag.get('content') else None
+            return parse_book_page(html)
     except (aiohttp.ClientError, asyncio.TimeoutError):
         return None
 
 def get_canonical_url_slow(driver, initial_url):
-    """Uses Selenium to reliably fetch the canonical URL."""
+    """Uses Selenium to reliably fetch the canonical URL (returns the same registry entry as the fast path)."""
     try:
         driver.get(initial_url)
         wait = WebDriverWait(driver, 15)
-        meta_tag = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'meta[property="og:url"]')))
-        return meta_tag.get_attribute('content')
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'meta[property="og:url"]')))
+        return parse_book_page(driver.page_source)
     except (TimeoutException, Exception) as e:
         print(f"  > SELENIUM FAILED for {initial_url}. Discarding. Reason: {type(e).__name__}")
         return None
@@ -77,6 +77,7 @@ async def main(input_filename='urls_verified_kafkaesque.txt', output_filename='x
         return
 
     unique_works = {}
+    registry_entries = {}
     
     # --- MULTIPLE ASYNC PASSES ---
     for attempt in range(1, MAX_ASYNC_ATTEMPTS + 1):
@@ -93,16 +94,14 @@ async def main(input_filename='urls_verified_kafkaesque.txt', output_filename='x
             results = await asyncio.gather(*tasks)
 
         success_count_this_pass = 0
-        for i, canonical_url in enumerate(results):
+        for i, entry in enumerate(results):
             original_url = urls_to_process[i]
-            if canonical_url:
-                match = re.search(r'/book/show/(\d+)', canonical_url)
-                if match:
-                    unique_id = match.group(1)
-                    if unique_id not in unique_works:
-                        unique_works[unique_id] = canonical_url
-                        success_count_this_pass += 1
-                else: current_failures.append(original_url)
+            if entry:
+                unique_id = str(entry['book_id'])
+                registry_entries[unique_id] = entry
+                if unique_id not in unique_works:
+                    unique_works[unique_id] = entry['canonical_url']
+                    success_count_this_pass += 1
             else: current_failures.append(original_url)
 
         print(f"> Pass #{attempt} complete. Successfully processed {success_count_this_pass} new URLs.")
@@ -140,15 +139,14 @@ async def main(input_filename='urls_verified_kafkaesque.txt', output_filename='x
             selenium_successes = []
             for i, book_url in enumerate(urls_to_process, 1):
                 print(f"Processing Selenium retry {i}/{len(urls_to_process)}: {book_url}")
-                canonical_url = get_canonical_url_slow(driver, book_url)
-                if canonical_url:
+                entry = get_canonical_url_slow(driver, book_url)
+                if entry:
                     selenium_successes.append(book_url)
-                    match = re.search(r'/book/show/(\d+)', canonical_url)
-                    if match:
-                        unique_id = match.group(1)
-                        if unique_id not in unique_works:
-                            unique_works[unique_id] = canonical_url
-                            print(f"  > Success on retry (ID: {unique_id}).")
+                    unique_id = str(entry['book_id'])
+                    registry_entries[unique_id] = entry
+                    if unique_id not in unique_works:
+                        unique_works[unique_id] = entry['canonical_url']
+                        print(f"  > Success on retry (ID: {unique_id}).")
                 time.sleep(0.5)
             
             urls_to_process = [url for url in urls_to_process if url not in selenium_successes]
@@ -173,6 +171,10 @@ async def main(input_filename='urls_verified_kafkaesque.txt', output_filename='x
             
     print(f"\nSuccessfully saved the final list to '{output_filename}'")
 
+    # Titles/authors came with the same responses, so the registry costs no extra requests.
+    registry_size = update_registry(registry_entries.values())
+    print(f"Book registry updated with {len(registry_entries)} entries ({registry_size} books total).")
+
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -1,5 +1,9 @@
+import re
 import time
+import json
 import pandas as pd
+from collections import Counter
+from dataset_store import book_id_from_url
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -7,6 +11,22 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
+# Author(s) and rating count of every book row on a list page, read in one round-trip
+LIST_ROWS_SCRIPT = """
+return Array.from(document.querySelectorAll('a.bookTitle')).map(a => {
+  const row = a.closest('tr');
+  const rating = row ? row.querySelector('span.minirating') : null;
+  return {href: a.href,
+          authors: row ? Array.from(row.querySelectorAll('a.authorName [itemprop=name]'), e => e.textContent.trim()) : [],
+          rating: rating ? rating.textContent : ''};
+});
+"""
+
+def parse_ratings_count(minirating):
+    """'4.05 avg rating — 123,456 ratings' -> 123456 (None if missing)."""
+    match = re.search(r'([\d,]+)\s+ratings?', minirating or '')
+    return int(match.group(1).replace(',', '')) if match else None
+
 def discover_books_from_lists(start_url):
     """
     Scrapes Goodreads for all books found on lists matching a search query.
@@ -25,6 +45,8 @@ def discover_books_from_lists(start_url):
     
     list_page_urls = []
     unique_book_urls = set()
+    list_counts = Counter() # book_id -> number of Kafka lists it appears on (ranking signal for preprocessor)
+    list_info = {} # book_id -> authors and rating count from the list rows (ranking signals, no extra requests)
 
     # --- Part 1: Collect URLs of all lists from the search results ---
     print(f"Starting discovery at: {start_url}")
@@ -72,16 +94,26 @@ def discover_books_from_lists(start_url):
         print(f"\nProcessing list {i}/{len(list_page_urls)}: {list_url}")
         driver.get(list_url)
         book_page_num = 1
+        books_on_this_list = set()
         
         while True:
             print(f"  - Scraping page {book_page_num} of this list...")
             try:
                 wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'a.bookTitle')))
                 book_elements = driver.find_elements(By.CSS_SELECTOR, 'a.bookTitle')
+                for row in driver.execute_script(LIST_ROWS_SCRIPT):
+                    book_id = book_id_from_url(row['href'])
+                    if book_id and book_id not in list_info:
+                        list_info[book_id] = {'authors': '|'.join(row['authors']),
+                                              'ratings_count': parse_ratings_count(row['rating'])}
                 
                 new_urls_found = 0
                 for book_elem in book_elements:
                     url = book_elem.get_attribute('href')
+                    book_id = book_id_from_url(url)
+                    if book_id and book_id not in books_on_this_list:
+                        books_on_this_list.add(book_id)
+                        list_counts[book_id] += 1
                     if url not in unique_book_urls:
                         unique_book_urls.add(url)
                         new_urls_found += 1
@@ -117,6 +149,16 @@ def discover_books_from_lists(start_url):
             
     print(f"Successfully saved all unique URLs to '{output_filename}'")
 
+    counts_filename = 'book_list_counts.json'
+    with open(counts_filename, 'w', encoding='utf-8') as f:
+        json.dump({str(book_id): count for book_id, count in list_counts.most_common()}, f, indent=1)
+    print(f"Saved list counts for {len(list_counts)} books to '{counts_filename}'")
+
+    info_filename = 'book_list_info.json'
+    with open(info_filename, 'w', encoding='utf-8') as f:
+        json.dump({str(book_id): info for book_id, info in list_info.items()}, f, indent=1)
+    print(f"Saved authors and rating counts for {len(list_info)} books to '{info_filename}'")
+
 if __name__ == '__main__':
     search_url = 'https://www.goodreads.com/search?q=kafka&search%5Bsource%5D=goodreads&search_type=lists&tab=lists'
     discover_books_from_lists(search_url)
\ No newline at end of file
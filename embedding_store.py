@@ -0,0 +1,353 @@
+# embedding_store.py
+
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from sbert_encoder import encoder_key
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+EMBEDDING_STORE_DIR = 'sbert_embedding_store'
+# Speicherformat: 'float32' (exakt), 'float16' (halber Platz) oder 'int8' (Viertel, Skala pro Zeile)
+STORE_DTYPES = ('float32', 'float16', 'int8')
+# Zeilen pro Block beim Kopieren/Dequantisieren, begrenzt den Speicherbedarf.
+BLOCK_ROWS = 8192
+# Anzahl zufälliger Zeilen, die beim Import einer Alt-Datei neu kodiert und verglichen werden.
+LEGACY_CHECK_ROWS = 8
+LEGACY_MIN_COSINE = 0.999
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def content_hash(text):
+    """Schlüssel einer Zeile: SHA1 des bereinigten Review-Textes."""
+    return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+def model_dirname(model_name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+
+def cosine_rows(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+def quantize(vectors, dtype):
+    """Wandelt float32-Zeilen in das Speicherformat. Liefert (Rohdaten, Skalen oder None)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'float32':
+        return vectors, None
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    raw = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return raw, scales.astype(np.float32)
+
+def dequantize(raw, scales):
+    """Gegenstück zu quantize(); liefert immer float32."""
+    if scales is not None:
+        return raw.astype(np.float32) * scales[:, None]
+    return np.asarray(raw, dtype=np.float32)
+
+def write_npy_blocks(filename, n_rows, n_cols, dtype, blocks):
+    """Schreibt eine .npy-Datei blockweise über eine Memory-Map (ohne die ganze Matrix im RAM)."""
+    tmp_filename = filename + '.tmp.npy'
+    out = np.lib.format.open_memmap(tmp_filename, mode='w+', dtype=dtype, shape=(n_rows, n_cols))
+    position = 0
+    for block in blocks:
+        out[position:position + len(block)] = block
+        position += len(block)
+    out.flush()
+    del out
+    os.replace(tmp_filename, filename)
+
+def append_npy_rows(filename, rows):
+    """
+    Hängt Zeilen direkt an eine .npy-Datei an und passt die Shape im Header an, ohne
+    die vorhandenen Daten zu kopieren. Liefert False (nichts geändert), wenn dtype oder
+    Spaltenzahl nicht passen oder der Header für die neue Shape keinen Platz hat.
+    """
+    rows = np.ascontiguousarray(rows)
+    with open(filename, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        header_start = f.tell()
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_start = f.tell()
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            return False
+        new_shape = (shape[0] + len(rows),) + tuple(shape[1:])
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(dtype), new_shape)
+        length_bytes = 2 if version == (1, 0) else 4
+        header_room = data_start - header_start - length_bytes
+        if len(header) + 1 > header_room:
+            return False
+        # Hinter den laut Header gültigen Zeilen schreiben und Reste eines abgebrochenen Anhängens
+        # abschneiden, sonst würden sie mit der neuen Shape als Vektoren der neuen Schlüssel gelesen
+        f.seek(data_start + shape[0] * int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize)
+        f.truncate()
+        f.write(rows.tobytes())
+        f.flush()
+        # Erst nach den Daten die Shape erhöhen: ein Abbruch dazwischen hinterlässt nur ungenutzte Bytes
+        f.seek(header_start + length_bytes)
+        f.write((header.ljust(header_room - 1) + '\n').encode('latin1'))
+    return True
+
+# ==============================================================================
+# EMBEDDING-STORE
+# ==============================================================================
+class EmbeddingStore:
+    """
+    Embedding-Cache mit Schlüssel (Modellname + Backend, Hash von context_cleaned).
+    Pro Modell und Backend (siehe encoder_key) ein Verzeichnis mit 'vectors.npy' (eine Zeile pro Text, im
+    Speicherformat dtype), bei int8 zusätzlich 'scales.npy' (Skala pro Zeile),
+    und 'index.json' (Modell, Dimension, dtype, Hash pro Zeile).
+    Die Vektoren werden per mmap_mode geöffnet und nur bei Bedarf gelesen.
+    """
+
+    def __init__(self, model_name, store_dir=EMBEDDING_STORE_DIR, dtype='float32', mmap_mode='r', backend='torch'):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unbekanntes Speicherformat '{dtype}', erlaubt: {STORE_DTYPES}")
+        self.model_name = model_name
+        self.backend = backend
+        self.encoder = encoder_key(model_name, backend)
+        self.path = os.path.join(store_dir, model_dirname(self.encoder))
+        self.dtype = dtype
+        self.mmap_mode = mmap_mode
+        self.keys = []
+        self.row_of = {}
+        self.vectors = None
+        self.scales = None
+        self.load()
+
+    @property
+    def index_filename(self):
+        return os.path.join(self.path, 'index.json')
+
+    @property
+    def vectors_filename(self):
+        return os.path.join(self.path, 'vectors.npy')
+
+    @property
+    def scales_filename(self):
+        return os.path.join(self.path, 'scales.npy')
+
+    @property
+    def dim(self):
+        return None if self.vectors is None else int(self.vectors.shape[1])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self):
+        """Öffnet den Store und verwirft ihn, wenn Index und Vektoren nicht zusammenpassen."""
+        if not (os.path.exists(self.index_filename) and os.path.exists(self.vectors_filename)):
+            return
+        with open(self.index_filename, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        stored_dtype = index.get('dtype', 'float32')
+        vectors = np.load(self.vectors_filename, mmap_mode=self.mmap_mode)
+        scales = np.load(self.scales_filename, mmap_mode=self.mmap_mode) if stored_dtype == 'int8' else None
+        if (index.get('model') != self.encoder or len(index['keys']) != len(vectors)
+                or (scales is not None and len(scales) != len(vectors))):
+            print(f"WARNUNG: Embedding-Store '{self.path}' ist inkonsistent "
+                  f"({len(index['keys'])} Schlüssel, {len(vectors)} Vektoren). Er wird neu aufgebaut.")
+            return
+        self.keys = index['keys']
+        self.row_of = {key: row for row, key in enumerate(self.keys)}
+        self.vectors, self.scales = vectors, scales
+        if stored_dtype != self.dtype:
+            print(f"Konvertiere Embedding-Store von {stored_dtype} nach {self.dtype}...")
+            self.dtype, target_dtype = stored_dtype, self.dtype
+            self._rewrite(self.iter_blocks(np.arange(len(self.keys))), len(self.keys), target_dtype)
+
+    def _rewrite(self, float_blocks, n_rows, dtype):
+        """Schreibt Vektoren (aus float32-Blöcken) + Skalen + Index neu und öffnet sie wieder."""
+        os.makedirs(self.path, exist_ok=True)
+        scales = []
+        def raw_blocks():
+            for block in float_blocks:
+                raw, block_scales = quantize(block, dtype)
+                if block_scales is not None:
+                    scales.append(block_scales)
+                yield raw
+        storage_dtype = np.float32 if dtype == 'float32' else (np.float16 if dtype == 'float16' else np.int8)
+        dim = self.dim
+        self.vectors = self.scales = None # Memory-Map schließen, bevor die Datei ersetzt wird
+        write_npy_blocks(self.vectors_filename, n_rows, dim, storage_dtype, raw_blocks())
+        if dtype == 'int8':
+            np.save(self.scales_filename + '.tmp.npy', np.concatenate(scales) if scales else np.zeros(0, np.float32))
+            os.replace(self.scales_filename + '.tmp.npy', self.scales_filename)
+        elif os.path.exists(self.scales_filename):
+            os.remove(self.scales_filename)
+        self.dtype = dtype
+        self._open()
+        self._write_index()
+
+    def add(self, keys, vectors):
+        """
+        Hängt neue Zeilen an. Normalfall: direkt an vectors.npy (und scales.npy) anhängen,
+        danach den Index schreiben - die vorhandenen Zeilen werden nicht angefasst. Nur für
+        einen neuen Store oder wenn der .npy-Header keinen Platz hat, wird blockweise umkopiert.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.vectors is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimension {vectors.shape[1]} passt nicht zum Store ({self.dim}).")
+        if self.vectors is not None and self._append_in_place(vectors):
+            for key in keys:
+                self.row_of[key] = len(self.keys)
+                self.keys.append(key)
+            self._open()
+            self._write_index()
+            return
+        old_blocks = self.iter_blocks(np.arange(len(self.keys)))
+        if self.vectors is None:
+            self.vectors = vectors # nur für self.dim in _rewrite
+        def all_blocks():
+            yield from old_blocks
+            for start in range(0, len(vectors), BLOCK_ROWS):
+                yield vectors[start:start + BLOCK_ROWS]
+        for key in keys:
+            self.row_of[key] = len(self.keys)
+            self.keys.append(key)
+        self._rewrite(all_blocks(), len(self.keys), self.dtype)
+
+    def _append_in_place(self, vectors):
+        """Hängt quantisierte Zeilen an die vorhandenen Dateien an. False -> Aufrufer kopiert um."""
+        raw, scales = quantize(vectors, self.dtype)
+        self.vectors = self.scales = None # Memory-Map schließen, bevor die Datei wächst
+        if not append_npy_rows(self.vectors_filename, raw):
+            self._open()
+            return False
+        if scales is not None and not append_npy_rows(self.scales_filename, scales):
+            # scales.npy ist 1-D und sein Header praktisch nie zu knapp; sonst einmal komplett schreiben
+            all_scales = np.concatenate([np.load(self.scales_filename)[:len(self.keys)], scales])
+            np.save(self.scales_filename + '.tmp.npy', all_scales)
+            os.replace(self.scales_filename + '.tmp.npy', self.scales_filename)
+        return True
+
+    def _write_index(self):
+        with open(self.index_filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'model': self.encoder, 'dim': self.dim, 'dtype': self.dtype, 'keys': self.keys}, f)
+        os.replace(self.index_filename + '.tmp', self.index_filename)
+
+    def _open(self):
+        self.vectors = np.load(self.vectors_filename, mmap_mode=self.mmap_mode)
+        self.scales = np.load(self.scales_filename, mmap_mode=self.mmap_mode) if self.dtype == 'int8' else None
+
+    def rows_for(self, keys):
+        """Zeilennummern im Store für die gegebenen Schlüssel (-1 = unbekannt)."""
+        return np.array([self.row_of.get(key, -1) for key in keys], dtype=np.int64)
+
+    def require_rows(self, keys):
+        """Wie rows_for, aber jeder Schlüssel muss im Store sein (sonst KeyError)."""
+        rows = self.rows_for(keys)
+        missing = int((rows < 0).sum())
+        if missing:
+            raise KeyError(f"{missing} von {len(rows)} Embeddings fehlen im Store '{self.path}' "
+                           f"(inzwischen bereinigt?). Embed-Schritt neu ausführen.")
+        return rows
+
+    def take(self, rows):
+        """
+        float32-Matrix für die gegebenen Zeilen. Ist 'rows' genau 0..n-1 und der Store
+        float32, wird die Memory-Map selbst zurückgegeben (keine Kopie).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.dtype == 'float32' and len(rows) == len(self.keys) and np.array_equal(rows, np.arange(len(rows))):
+            return self.vectors
+        if self.dtype == 'float32':
+            return np.asarray(self.vectors[rows])
+        return np.concatenate(list(self.iter_blocks(rows))) if len(rows) else np.zeros((0, self.dim), np.float32)
+
+    def iter_blocks(self, rows, block_rows=BLOCK_ROWS):
+        """Liefert die Zeilen blockweise als float32 (für Ähnlichkeitssuche & Co.)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        # Vektoren/Skalen jetzt binden: _rewrite() ersetzt sie, während die Blöcke noch gelesen werden.
+        vectors, all_scales = self.vectors, self.scales
+        def blocks():
+            for start in range(0, len(rows), block_rows):
+                block_rows_idx = rows[start:start + block_rows]
+                scales = None if all_scales is None else np.asarray(all_scales[block_rows_idx])
+                yield dequantize(np.asarray(vectors[block_rows_idx]), scales)
+        return blocks()
+
+    def stale_keys(self, current_keys):
+        """Schlüssel im Store, die im aktuellen Korpus nicht mehr vorkommen."""
+        current = set(current_keys)
+        return [key for key in self.keys if key not in current]
+
+    def prune(self, current_keys):
+        """Entfernt veraltete Zeilen (z.B. nach einer Änderung der Entitätenliste)."""
+        stale = set(self.stale_keys(current_keys))
+        if not stale:
+            return 0
+        keep_rows = np.array([row for row, key in enumerate(self.keys) if key not in stale], dtype=np.int64)
+        blocks = self.iter_blocks(keep_rows)
+        self.keys = [self.keys[row] for row in keep_rows]
+        self.row_of = {key: row for row, key in enumerate(self.keys)}
+        self._rewrite(blocks, len(self.keys), self.dtype)
+        return len(stale)
+
+    def import_legacy(self, legacy_filename, texts, encode_fn):
+        """
+        Übernimmt eine alte Embedding-Datei (eine Zeile pro Review, ohne Schlüssel),
+        aber nur wenn die Zeilenzahl stimmt UND eine Stichprobe neu kodierter Zeilen
+        mit den gespeicherten übereinstimmt. Sonst wäre die Zuordnung geraten.
+        """
+        legacy = np.load(legacy_filename, mmap_mode='r')
+        if len(legacy) != len(texts):
+            print(f"Alt-Datei '{legacy_filename}' hat {len(legacy)} Zeilen statt {len(texts)}. Wird ignoriert.")
+            return False
+        sample = np.random.default_rng(42).choice(len(texts), size=min(LEGACY_CHECK_ROWS, len(texts)), replace=False)
+        similarity = cosine_rows(np.asarray(legacy[sample]), np.asarray(encode_fn([texts[i] for i in sample])))
+        if similarity.min() < LEGACY_MIN_COSINE:
+            print(f"Alt-Datei '{legacy_filename}' passt nicht zu den aktuellen Texten "
+                  f"(min. Kosinus {similarity.min():.4f}). Wird ignoriert.")
+            return False
+        keys = [content_hash(t) for t in texts]
+        first_rows = {key: row for row, key in reversed(list(enumerate(keys)))}
+        new_keys = [key for key in first_rows if key not in self.row_of]
+        self.add(new_keys, legacy[[first_rows[key] for key in new_keys]])
+        print(f"{len(new_keys)} Embeddings aus der Alt-Datei '{legacy_filename}' übernommen.")
+        return True
+
+    def ensure(self, texts, encode_fn):
+        """
+        Kodiert alle Texte, deren Hash noch nicht im Store ist, und liefert die
+        Store-Zeilennummern in der Reihenfolge von 'texts'.
+        """
+        keys = [content_hash(t) for t in texts]
+        missing = list(dict.fromkeys(key for key in keys if key not in self.row_of))
+        if missing:
+            text_of = dict(zip(keys, texts))
+            print(f"Kodiere {len(missing)} neue Texte ({len(keys) - len(missing)} aus dem Store)...")
+            self.add(missing, encode_fn([text_of[key] for key in missing]))
+        else:
+            print(f"Alle {len(keys)} Embeddings aus dem Store geladen.")
+        stale = len(self.keys) - len(set(keys))
+        if stale > 0:
+            print(f"Hinweis: {stale} Zeilen im Store gehören zu keinem aktuellen Review (veraltet, siehe prune()).")
+        return self.rows_for(keys)
+
+    def get_embeddings(self, texts, encode_fn):
+        """Liefert die float32-Embedding-Matrix in der Reihenfolge von 'texts'."""
+        return self.take(self.ensure(texts, encode_fn))
+
+    def save_row_index(self, filename, review_ids, rows):
+        """
+        Speichert die Zuordnung Review-ID -> Store-Zeile, damit andere Werkzeuge
+        (z.B. Ähnlichkeitssuche) Zeilen ohne den DataFrame auflösen können.
+        """
+        with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'model': self.encoder, 'review_ids': [str(r) for r in review_ids],
+                       'rows': [int(r) for r in rows]}, f)
+        os.replace(filename + '.tmp', filename)
+
+    def load_row_index(self, filename):
+        """Gegenstück zu save_row_index(): {review_id: Store-Zeile}."""
+        with open(filename, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return dict(zip(index['review_ids'], index['rows']))
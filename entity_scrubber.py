@@ -0,0 +1,127 @@
+# entity_scrubber.py
+
+import re
+import os
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+ENTITIES_FILENAME = 'entities_to_remove.txt'
+SCRUB_CACHE_FILENAME = 'entity_scrub_cache.pkl'
+# Ab dieser Anzahl (eindeutiger) Texte wird auf mehrere Prozesse verteilt.
+PARALLEL_MIN_TEXTS = 50000
+CHUNK_SIZE = 20000
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def load_entities(filename=ENTITIES_FILENAME):
+    """
+    Liest die Liste der zu entfernenden Eigennamen (eine pro Zeile, '#' = Kommentar).
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        entities = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+    return list(dict.fromkeys(entities))
+
+def compile_entity_pattern(entities):
+    """
+    Baut EINE vorkompilierte Alternation aller Entitäten mit Wortgrenzen.
+    Längere Entitäten zuerst, damit z.B. 'the trial' vor 'the' gewinnt.
+    """
+    alternatives = sorted({re.escape(e) for e in entities}, key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b', flags=re.IGNORECASE)
+
+def entities_fingerprint(entities):
+    """Stabiler Hash der Entitätenliste (für die Cache-Invalidierung)."""
+    return hashlib.sha1('\n'.join(sorted(e.lower() for e in entities)).encode('utf-8')).hexdigest()
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def remove_specific_entities(text, entities):
+    """
+    Entfernt eine Liste von Wörtern (case-insensitive) aus einem Text.
+    Referenz-Implementierung (ein re.sub pro Entität); dient dem Benchmark als Vergleich.
+    """
+    if not isinstance(text, str):
+        return ""
+    for entity in entities:
+        # \b für Wortgrenzen, um Teilwörter zu schützen
+        pattern = r'\b' + re.escape(entity) + r'\b'
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    # Entfernt doppelte Leerzeichen und Leerzeichen am Anfang/Ende
+    return ' '.join(text.split())
+
+def scrub_series(texts, pattern):
+    """
+    Vektorisierte Bereinigung einer Series mit dem vorkompilierten Muster.
+    Nicht-Strings werden (wie bisher) zu "".
+    """
+    texts = texts.where(texts.map(lambda v: isinstance(v, str)), '')
+    cleaned = texts.str.replace(pattern, '', regex=True)
+    return cleaned.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def _scrub_chunk(args):
+    texts, pattern = args
+    return scrub_series(pd.Series(texts, dtype=object), pattern).tolist()
+
+def scrub_parallel(texts, pattern, n_jobs=None, chunk_size=CHUNK_SIZE):
+    """
+    Teilt die Series in Chunks auf und bereinigt sie in mehreren Prozessen.
+    Bei kleinen Korpora lohnt sich der Prozess-Overhead nicht -> direkt vektorisiert.
+    """
+    if len(texts) < PARALLEL_MIN_TEXTS:
+        return scrub_series(texts, pattern)
+    values = texts.tolist()
+    chunks = [(values[i:i + chunk_size], pattern) for i in range(0, len(values), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(_scrub_chunk, chunks))
+    return pd.Series([t for chunk in results for t in chunk], index=texts.index, dtype=object)
+
+def load_scrub_cache(cache_filename, fingerprint):
+    """Lädt den Cache {text_hash: bereinigter Text}; verwirft ihn bei geänderter Entitätenliste."""
+    if not cache_filename or not os.path.exists(cache_filename):
+        return {}
+    try:
+        with open(cache_filename, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+    if cache.get('fingerprint') != fingerprint:
+        print("Entitätenliste hat sich geändert. Verwerfe den Bereinigungs-Cache.")
+        return {}
+    return cache.get('entries', {})
+
+def save_scrub_cache(cache_filename, fingerprint, entries):
+    tmp_filename = cache_filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, cache_filename)
+
+def scrub_entities(texts, entities, cache_filename=SCRUB_CACHE_FILENAME, n_jobs=None):
+    """
+    Entfernt alle Entitäten aus einer Series von Review-Texten.
+    Nur Texte, deren Hash noch nicht im Cache ist, werden tatsächlich bereinigt
+    (dedupliziert, vektorisiert und bei großen Korpora parallel).
+    """
+    pattern = compile_entity_pattern(entities)
+    fingerprint = entities_fingerprint(entities)
+    cache = load_scrub_cache(cache_filename, fingerprint)
+    cache.setdefault(text_hash(''), '')
+
+    is_text = texts.map(lambda v: isinstance(v, str))
+    hashes = texts.where(is_text, '').map(text_hash)
+    missing = ~hashes.isin(cache.keys())
+    if missing.any():
+        todo = texts[missing & is_text].drop_duplicates()
+        todo_hashes = hashes.loc[todo.index]
+        cleaned = scrub_parallel(todo, pattern, n_jobs=n_jobs)
+        cache.update(zip(todo_hashes, cleaned))
+        if cache_filename:
+            save_scrub_cache(cache_filename, fingerprint, cache)
+    print(f"Entitäten-Bereinigung: {int(missing.sum())} neu bereinigt, {int((~missing).sum())} aus dem Cache.")
+    return hashes.map(cache)
@@ -1,182 +1,332 @@
 # final_complete_conceptual_analysis_v2.py
 
 import pandas as pd
-import re
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import umap
-import plotly.express as px
-from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+import json
+import argparse
 import warnings
+from entity_scrubber import load_entities, scrub_entities
+from embedding_store import EmbeddingStore, content_hash
+from sbert_encoder import make_encoder
+from umap_cache import fit_umap
+from pipeline_runner import Stage, run_pipeline
+from stage_profiler import write_run_report, print_stage_table, RUN_REPORT_DIR, PROFILE_DIR
+from dataset_store import read_table, table_path, split_genres
+from map_export import export_semantic_map, sidecar_filename
+from lda_significance import lda_significance, weighted_lda_axis, CONFIDENCE
+from contrast_engine import load_contrast_spec, plot_contrasts, evaluate_contrasts
+from language_filter import build_english_tables, LANGUAGE_MODEL_FILENAME
+from near_duplicates import mark_near_duplicates, cluster_report, NearDuplicateIndex, NEAR_DUPLICATE_DIR
+from book_registry import REGISTRY_TABLE, load_registry, placeholder_book_ids, resolve_placeholder_names
 
 # ==============================================================================
 # KONFIGURATION
 # ==============================================================================
-REVIEWS_FILENAME = 'goodreads_reviews_english_clean.csv'
+RAW_REVIEWS_TABLE = 'reviews' # grscraper-Ausgabe, wird von language_filter gefiltert
+RAW_SUMMARY_TABLE = 'summary'
+REVIEWS_TABLE = 'reviews_english' # dataset_store-Tabellen (Parquet)
+SUMMARY_TABLE = 'summary_enriched'
+REVIEWS_FILENAME = 'goodreads_reviews_english_clean.csv' # manuelle Auswahl, nur für den einmaligen Import
 SUMMARY_FILENAME = 'goodreads_book_summary_enriched.csv'
-EMBEDDINGS_FILENAME_CLEANED = 'sbert_embeddings_mpnet_cleaned_final.npy' 
+EMBEDDINGS_FILENAME_CLEANED = 'sbert_embeddings_mpnet_cleaned_final.npy' # Alt-Format, wird einmalig importiert
+EMBEDDING_STORE_DIR = 'sbert_embedding_store'
+EMBEDDING_STORE_DTYPE = 'float32' # 'float16' / 'int8' sparen 2x / 4x Speicher (siehe benchmark_embedding_store.py)
 SBERT_MODEL_NAME = 'all-mpnet-base-v2'
+SBERT_BACKEND = 'torch' # 'onnx' / 'onnx-int8' (siehe benchmark_sbert_encoder.py für Tempo und Genauigkeit)
+SBERT_PROCESSES = 1 # > 1: Prozess-Pool über mehrere CPU-Kerne
+SBERT_BATCH_SIZE = 64
+UMAP_CACHE_DIR = 'umap_cache' # kNN-Graph und gefittete Reducer
+ENTITIES_FILENAME = 'entities_to_remove.txt'
+ARTIFACT_DIR = 'pipeline_artifacts' # Zwischenergebnisse der Pipeline-Schritte
+SPLIT_DATE = '2021-01-01'
+CONTRASTS_FILENAME = 'contrasts.json' # deklarative Kontrast-Spezifikation (siehe contrast_engine.py)
+CONTRAST_SUMMARY_FILENAME = 'final_contrast_summary.csv'
+N_PERMUTATIONS = 1000 # Signifikanz der LDA-Kontraste (siehe lda_significance.py)
+N_BOOTSTRAP = 500
+SIGNIFICANCE_TIME_BUDGET = 120 # Sekunden pro Kontrast
+MAP_MODE = 'auto' # 'points' / 'decimated' / 'density' (siehe map_export.py)
+# 'drop': Beinahe-Duplikate entfernen, 'mark': behalten, aber nicht in LDA/Statistik,
+# 'weight': LDA auf allen Reviews mit dup_weight (1 / Clustergröße), None: aus
+NEAR_DUPLICATE_MODE = 'mark'
 
 # ==============================================================================
 # HELPER-FUNKTIONEN
 # ==============================================================================
-def remove_specific_entities(text, entities):
-    """
-    Entfernt eine Liste von Wörtern (case-insensitive) aus einem Text.
-    Ihre verbesserte Funktion.
-    """
-    if not isinstance(text, str):
-        return ""
-    for entity in entities:
-        # \b für Wortgrenzen, um Teilwörter zu schützen
-        pattern = r'\b' + re.escape(entity) + r'\b'
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    # Entfernt doppelte Leerzeichen und Leerzeichen am Anfang/Ende
-    return ' '.join(text.split())
-
 def standardize_join_key(text):
     if not isinstance(text, str): return ""
     return text.lower().strip()
 
+def load_embeddings(embedded):
+    """
+    Öffnet den Embedding-Store (Memory-Map) und liefert die Matrix für die Texte des Embed-Schritts.
+    Die Zeilen werden erst hier über die Inhalts-Schlüssel aufgelöst: der Store kann seit dem
+    (gecachten) Embed-Artefakt gewachsen oder neu geschrieben worden sein.
+    """
+    store = EmbeddingStore(embedded['model_name'], embedded['store_dir'], dtype=embedded['store_dtype'], mmap_mode='r',
+                           backend=embedded.get('backend', 'torch'))
+    return store.take(store.require_rows(embedded['keys']))
+
 # ==============================================================================
-# HAUPTANALYSE
+# PIPELINE-SCHRITTE
 # ==============================================================================
-if __name__ == '__main__':
-    warnings.simplefilter(action='ignore', category=FutureWarning)
-    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+def join_metadata(reviews_df, summary_df, registry=None):
+    """
+    Verbindet Reviews mit den Autoren aus der Zusammenfassung: primär über die book_id,
+    nur Zeilen ohne ID fallen auf den Namens-Schlüssel zurück. Platzhalter-Namen
+    ('Book_ID_<id>', 'URL_ID_<n>') sowie fehlende Autoren und Genres werden aus dem Buch-Register
+    ergänzt. 'genres' ist danach immer eine Liste (leer, wenn nichts bekannt ist).
+    """
+    registry = registry or {}
+    reviews_df['book_id'] = reviews_df['book_id'].astype('Int64').fillna(placeholder_book_ids(reviews_df['book_name']))
+    reviews_df, _ = resolve_placeholder_names(reviews_df, registry)
+    reviews_df['join_key'] = reviews_df['book_name'].astype('string').apply(standardize_join_key)
+    summary_df = summary_df.copy()
+    summary_df['join_key'] = summary_df['book_name'].astype('string').apply(standardize_join_key)
+    summary_df['author'] = summary_df['author'].astype('string')
+    metadata_columns = [c for c in ['author', 'genres'] if c in summary_df.columns]
+    by_id = summary_df.dropna(subset=['book_id']).drop_duplicates(subset=['book_id'])[['book_id'] + metadata_columns]
+    df = pd.merge(reviews_df, by_id, on='book_id', how='left')
+    missing = df['author'].isna()
+    by_name = summary_df.drop_duplicates(subset=['join_key']).set_index('join_key')
+    for column in metadata_columns:
+        df[column] = df[column].astype(object)
+        df.loc[missing, column] = df.loc[missing, 'join_key'].map(by_name[column])
+    registry_authors = {book_id: info['authors'] for book_id, info in registry.items() if info.get('authors')}
+    missing = df['author'].isna()
+    df.loc[missing, 'author'] = df.loc[missing, 'book_id'].map(registry_authors)
+    registry_genres = {book_id: info['genres'] for book_id, info in registry.items() if info.get('genres')}
+    genres = df['genres'] if 'genres' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    has_genres = genres.map(lambda g: isinstance(g, (list, np.ndarray)))
+    df['genres'] = genres.where(has_genres, split_genres(df['book_id'].map(registry_genres)))
+    # 'stars' = NA bedeutet "Not rated" und bleibt (wie bisher) erhalten
+    df.dropna(subset=['context', 'author', 'date', 'book_name'], inplace=True)
+    return df.drop(columns=['join_key'])
 
-    print("--- Finale konzeptuelle Analyse-Pipeline ---")
+def stage_language_filter(raw_reviews_table, raw_summary_table, reviews_table, summary_table):
+    """[Schritt 0] Englische Reviews aus der grscraper-Ausgabe filtern, english_review_count aktualisieren."""
+    return build_english_tables(raw_reviews_table, raw_summary_table, reviews_table, summary_table)
 
-    # --- 1. LADEN UND ZUSAMMENFÜHREN DER DATEN ---
-    try:
-        print(f"\n[Schritt 1/5] Lade und verbinde Daten...")
-        reviews_df = pd.read_csv(REVIEWS_FILENAME)
-        summary_df = pd.read_csv(SUMMARY_FILENAME)
-        reviews_df['join_key'] = reviews_df['book_name'].apply(standardize_join_key)
-        summary_df['join_key'] = summary_df['book_name'].apply(standardize_join_key)
-        metadata_df = summary_df[['join_key', 'author']].drop_duplicates(subset=['join_key'])
-        df = pd.merge(reviews_df, metadata_df, on='join_key', how='left')
-        df.dropna(subset=['context', 'author', 'date', 'book_name', 'stars'], inplace=True)
-        df = df.drop(columns=['join_key'])
-        print(f"{len(df)} Reviews erfolgreich geladen.")
-    except FileNotFoundError as e:
-        print(f"KRITISCHER FEHLER: Eine benötigte Eingabedatei wurde nicht gefunden: {e}")
-        exit()
+def stage_load_data(language_stats, reviews_table, summary_table, reviews_filename, summary_filename):
+    """[Schritt 1] Lade und verbinde Reviews und Buch-Metadaten (typisierte Parquet-Tabellen)."""
+    reviews_df = read_table(reviews_table, csv_fallback=reviews_filename)
+    summary_df = read_table(summary_table, columns=['book_id', 'book_name', 'author', 'genres'], csv_fallback=summary_filename)
+    df = join_metadata(reviews_df, summary_df, load_registry())
+    print(f"{len(df)} Reviews erfolgreich geladen.")
+    return df
 
-    # --- 2. DATENAUFBEREITUNG ---
-    print("\n[Schritt 2/5] Bereite Daten für die Analyse vor...")
+def stage_prepare(df, split_date):
+    """[Schritt 2] Autoren-Typ und Zeitperiode bestimmen."""
     df['is_kafka_author'] = df['author'].apply(lambda s: 'Franz Kafka' if 'kafka' in str(s).lower() else 'Other')
     df['date'] = pd.to_datetime(df['date'], errors='coerce')
     df.dropna(subset=['date'], inplace=True)
-    split_date = '2021-01-01'
     df['period'] = '2021+'
     df.loc[df['date'] < split_date, 'period'] = 'Pre-2021'
+    df = df.reset_index(drop=True)
     print("Datenaufbereitung abgeschlossen.")
+    return df
 
-    # --- 3. ENTFERNE SPEZIFISCHE EIGENNAMEN (Proper Nouns) ---
-    print("\n[Schritt 3/5] Entferne Buchtitel und Protagonisten-Namen aus den Reviews...")
-    entities_to_remove = [
-        'metamorphosis', 'gregor', 'samsa', 'the trial', 'josef k', 'joseph k',
-        'the castle', 'in the penal colony', 'a hunger artist', 'the judgement',
-        'amerika', 'catch-22', 'catch 22', 'murakami', 'saramago', 'blindness', 'camus', 
-        'meursault', 'the stranger'
-    ]
-    df['context_cleaned'] = df['context'].apply(lambda x: remove_specific_entities(x, entities_to_remove))
+def stage_near_duplicates(df, mode, index_dir):
+    """[Schritt 2b] Beinahe-Duplikate (Reposts, Editionen, Übersetzungen) per MinHash/LSH erkennen."""
+    if not mode:
+        return df
+    df = mark_near_duplicates(df, NearDuplicateIndex(index_dir))
+    cluster_report(df)
+    if mode == 'drop':
+        df = df[~df['is_near_duplicate']].reset_index(drop=True)
+    if mode != 'weight':
+        df = df.drop(columns=['dup_weight'])
+    return df
+
+def original_rows(df):
+    """
+    Maske der Reviews, die in LDA und Statistik eingehen (ohne markierte Beinahe-Duplikate).
+    Im Modus 'weight' nur noch für Signifikanz und Kontraste: ein Review pro Cluster.
+    """
+    return ~df['is_near_duplicate'].values if 'is_near_duplicate' in df.columns else np.ones(len(df), dtype=bool)
+
+def stage_scrub(df, entities_filename):
+    """[Schritt 3] Buchtitel und Protagonisten-Namen aus den Reviews entfernen."""
+    entities_to_remove = load_entities(entities_filename)
+    df['context_cleaned'] = scrub_entities(df['context'], entities_to_remove)
     print("Eigennamen für die semantische Analyse entfernt.")
-    
-    # --- 4. SBERT EMBEDDINGS ERSTELLEN (auf den bereinigten Daten) ---
-    print(f"\n[Schritt 4/5] Erstelle oder lade SBERT Embeddings für die bereinigten Daten...")
+    return df
+
+def stage_embed(df, model_name, backend, processes, batch_size, store_dir, store_dtype, legacy_filename):
+    """[Schritt 4] SBERT-Embeddings der bereinigten Texte (nur neue Texte werden kodiert)."""
     sentences = df['context_cleaned'].tolist()
-    if os.path.exists(EMBEDDINGS_FILENAME_CLEANED):
-        print(f"Lade existierende bereinigte Embeddings aus '{EMBEDDINGS_FILENAME_CLEANED}'...")
-        embeddings = np.load(EMBEDDINGS_FILENAME_CLEANED)
-    else:
-        print(f"Generiere neue Embeddings für die bereinigten Daten...")
-        model = SentenceTransformer(SBERT_MODEL_NAME)
-        embeddings = model.encode(sentences, show_progress_bar=True)
-        np.save(EMBEDDINGS_FILENAME_CLEANED, embeddings)
-        print(f"Speichere bereinigte Embeddings in '{EMBEDDINGS_FILENAME_CLEANED}'...")
-    print(f"Embeddings geladen. Shape: {embeddings.shape}")
-
-    # --- 5. FINALE VISUALISIERUNGEN (auf den bereinigten, konzeptuellen Daten) ---
-    print("\n[Schritt 5/5] Erstelle die finalen vier Visualisierungen...")
-
-    reducer_2d = umap.UMAP(n_neighbors=15, min_dist=0.1, n_components=2, random_state=42)
-    embeddings_2d = reducer_2d.fit_transform(embeddings)
+    store = EmbeddingStore(model_name, store_dir, dtype=store_dtype, mmap_mode='r', backend=backend)
+    encode = make_encoder(model_name, backend=backend, processes=processes, batch_size=batch_size)
+    if not store.keys and os.path.exists(legacy_filename):
+        print(f"Prüfe existierende bereinigte Embeddings aus '{legacy_filename}'...")
+        store.import_legacy(legacy_filename, sentences, encode)
+    rows = store.ensure(sentences, encode)
+    review_ids = df['review_id'] if 'review_id' in df.columns else df['context'].map(content_hash)
+    store.save_row_index(os.path.join(store.path, 'row_index.json'), review_ids, rows)
+    print(f"Embeddings bereit. Shape: ({len(rows)}, {store.dim})")
+    return {'keys': [store.keys[row] for row in rows], 'model_name': model_name,
+            'backend': backend, 'store_dir': store_dir, 'store_dtype': store_dtype}
+
+def stage_umap(embedded, n_neighbors, min_dist, n_components, random_state, cache_dir):
+    """[Schritt 5a] UMAP-Projektion (kNN-Graph und Reducer gecacht)."""
+    return fit_umap(load_embeddings(embedded), embedded['keys'], n_neighbors=n_neighbors, min_dist=min_dist,
+                    n_components=n_components, random_state=random_state, cache_dir=cache_dir)
+
+def stage_map(df, embeddings_2d, color_column, title, legend_title, color_map, output_filename, map_mode):
+    """[Schritt 5b] Interaktive semantische Karte (WebGL, Hover-Texte in einer Sidecar-Datei)."""
     df['umap_x'] = embeddings_2d[:, 0]
     df['umap_y'] = embeddings_2d[:, 1]
     df['context_short'] = df['context'].str[:150] + '...'
-
-    # --- VISUALISIERUNG 1 & 2: KAFKA vs. NON-KAFKA ---
-    fig_umap_author = px.scatter(
-        df, x='umap_x', y='umap_y', color='is_kafka_author',
-        hover_data=['book_name', 'author', 'stars', 'period', 'context_short'],
-        title='Semantische Karte (Konzepte): Kafka vs. Andere Autoren',
-        labels={'color': 'Autoren-Typ', 'umap_x': '', 'umap_y': ''},
-        color_discrete_map={'Franz Kafka': '#ff7f0e', 'Other': '#1f77b4'}
+    result = export_semantic_map(
+        df, x='umap_x', y='umap_y', color_column=color_column, title=title, legend_title=legend_title,
+        color_map=color_map, output_filename=output_filename,
+        hover_columns=['book_name', 'author', 'stars', 'period', 'context_short'], mode=map_mode
     )
-    # --- PRÄZISE STEUERUNG DES LAYOUTS ---
-    fig_umap_author.update_layout(
-        font_family="Arial", 
-        title_x=0.5,
-        plot_bgcolor='white',  # Setzt den Hintergrund auf weiß
-        xaxis=dict(showgrid=False, showline=True, linecolor='lightgrey'), # Entfernt Gitter, zeigt Achsenlinie
-        yaxis=dict(showgrid=False, showline=True, linecolor='lightgrey')  # Entfernt Gitter, zeigt Achsenlinie
-    )
-    fig_umap_author.update_traces(marker=dict(size=4, opacity=0.7))
-    fig_umap_author.write_html("final_map_concepts_kafka_vs_other.html")
-    print("-> Karte 1 gespeichert.")
-
-    mask_kafka = df['is_kafka_author'] == 'Franz Kafka'
-    clf_author = LinearDiscriminantAnalysis()
-    clf_author.fit(embeddings, mask_kafka)
-    df['LDA_score_author'] = clf_author.transform(embeddings)
-    plt.figure(figsize=(12, 7))
-    sns.kdeplot(data=df, x='LDA_score_author', hue='is_kafka_author', fill=True, common_norm=False)
-    plt.title('LDA (Konzepte): Semantischer Kontrast Kafka vs. Andere Autoren', fontsize=16)
-    plt.xlabel('Projektion auf die "maximale Trennungsachse"')
-    sns.despine()
-    plt.savefig("final_lda_concepts_kafka_vs_other.png", dpi=300)
-    print("-> LDA-Plot 1 gespeichert.")
-    plt.close()
+    print(f"-> Karte '{output_filename}' gespeichert ({result['points_shown']}/{result['points_total']} Punkte, Modus '{result['mode']}').")
+    return output_filename
 
-    # --- VISUALISIERUNG 3 & 4: PRE- vs. POST-2021 ---
-    fig_umap_period = px.scatter(
-        df, x='umap_x', y='umap_y', color='period',
-        hover_data=['book_name', 'author', 'stars', 'period', 'context_short'],
-        title='Semantische Karte (Konzepte): Reviews vor vs. nach 2021',
-        labels={'color': 'Zeitperiode', 'umap_x': '', 'umap_y': ''},
-        color_discrete_map={'Pre-2021': '#1f77b4', '2021+': '#ff7f0e'}
-    )
-    # --- PRÄZISE STEUERUNG DES LAYOUTS ---
-    fig_umap_period.update_layout(
-        font_family="Arial", 
-        title_x=0.5,
-        plot_bgcolor='white',  # Setzt den Hintergrund auf weiß
-        xaxis=dict(showgrid=False, showline=True, linecolor='lightgrey'), # Entfernt Gitter, zeigt Achsenlinie
-        yaxis=dict(showgrid=False, showline=True, linecolor='lightgrey')  # Entfernt Gitter, zeigt Achsenlinie
-    )
-    fig_umap_period.update_traces(marker=dict(size=4, opacity=0.7))
-    fig_umap_period.write_html("final_map_concepts_pre_vs_post_2021.html")
-    print("-> Karte 2 gespeichert.")
-
-    mask_pre_2021 = df['period'] == 'Pre-2021'
-    clf_period = LinearDiscriminantAnalysis()
-    clf_period.fit(embeddings, mask_pre_2021)
-    df['LDA_score_period'] = clf_period.transform(embeddings)
+def stage_lda(df, embedded, label_column, positive_label):
+    """[Schritt 5c] LDA-Projektion auf die maximale Trennungsachse."""
+    embeddings = load_embeddings(embedded)
+    mask = df[label_column] == positive_label
+    if 'dup_weight' in df.columns:
+        # NEAR_DUPLICATE_MODE 'weight': jeder Cluster zählt zusammen so viel wie ein Review
+        axis, center = weighted_lda_axis(embeddings, mask.values, df['dup_weight'].values)
+        return (embeddings - center) @ axis
+    from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+    fit_rows = original_rows(df)
+    clf = LinearDiscriminantAnalysis()
+    clf.fit(embeddings[fit_rows], mask.values[fit_rows])
+    return clf.transform(embeddings)[:, 0]
+
+def stage_significance(df, embedded, label_column, positive_label, n_permutations, n_bootstrap, time_budget, output_filename):
+    """[Schritt 5e] Permutations-p-Wert und Bootstrap-KI der LDA-Trennung."""
+    rows = original_rows(df)
+    result = lda_significance(load_embeddings(embedded)[rows], (df[label_column] == positive_label).values[rows],
+                              n_permutations=n_permutations, n_bootstrap=n_bootstrap, time_budget=time_budget)
+    result['contrast'] = f"{label_column} == {positive_label}"
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"-> Signifikanz {result['contrast']}: Trennung {result['observed']:.3f}, p = {result['p_value']:.4f} "
+          f"({result['n_permutations']} Permutationen), {int(CONFIDENCE * 100)}%-KI [{result['ci_low']:.3f}, {result['ci_high']:.3f}]")
+    return result
+
+def stage_contrasts(df, embedded, embeddings_2d, contrasts_filename, output_filename):
+    """[Schritt 6] Alle deklarierten Kontraste gegen dieselben Embeddings und UMAP-Koordinaten bewerten."""
+    rows = original_rows(df)
+    summary = evaluate_contrasts(df[rows].reset_index(drop=True), load_embeddings(embedded)[rows], embeddings_2d[rows],
+                                 load_contrast_spec(contrasts_filename))
+    summary.to_csv(output_filename, index=False, encoding='utf-8')
+    print(f"-> {len(summary)} Kontraste bewertet, Übersicht in '{output_filename}':")
+    print(summary[['contrast', 'n_positive', 'cv_auc', 'p_value', 'umap_centroid_distance']].head(15).to_string(index=False))
+    return summary
+
+def stage_lda_plot(df, lda_scores, hue_column, title, output_filename):
+    """[Schritt 5d] KDE der LDA-Scores pro Gruppe."""
+    import matplotlib
+    matplotlib.use('Agg') # nur Dateiausgabe; auch in Worker-Prozessen ohne Display
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    df['LDA_score'] = lda_scores
     plt.figure(figsize=(12, 7))
-    sns.kdeplot(data=df, x='LDA_score_period', hue='period', fill=True, common_norm=False)
-    plt.title('LDA (Konzepte): Semantischer Wandel vor vs. nach 2021', fontsize=16)
+    sns.kdeplot(data=df, x='LDA_score', hue=hue_column, fill=True, common_norm=False)
+    plt.title(title, fontsize=16)
     plt.xlabel('Projektion auf die "maximale Trennungsachse"')
     sns.despine()
-    plt.savefig("final_lda_concepts_pre_vs_post_2021.png", dpi=300)
-    print("-> LDA-Plot 2 gespeichert.")
+    plt.savefig(output_filename, dpi=300)
     plt.close()
+    print(f"-> LDA-Plot '{output_filename}' gespeichert.")
+    return output_filename
+
+# ==============================================================================
+# PIPELINE-DEFINITION
+# ==============================================================================
+def build_stages():
+    stages = [
+        Stage('language_filter', stage_language_filter,
+              files=[table_path(RAW_REVIEWS_TABLE), table_path(RAW_SUMMARY_TABLE), LANGUAGE_MODEL_FILENAME],
+              params={'raw_reviews_table': RAW_REVIEWS_TABLE, 'raw_summary_table': RAW_SUMMARY_TABLE,
+                      'reviews_table': REVIEWS_TABLE, 'summary_table': SUMMARY_TABLE}),
+        # REVIEWS_TABLE/SUMMARY_TABLE schreibt language_filter im selben Lauf neu (neue Teil-Dateien);
+        # sie sind über dessen Schlüssel abgedeckt und stehen deshalb nicht in 'files'
+        Stage('load_data', stage_load_data, inputs=['language_filter'], files=[table_path(REGISTRY_TABLE)],
+              params={'reviews_table': REVIEWS_TABLE, 'summary_table': SUMMARY_TABLE,
+                      'reviews_filename': REVIEWS_FILENAME, 'summary_filename': SUMMARY_FILENAME}),
+        Stage('prepare', stage_prepare, inputs=['load_data'], params={'split_date': SPLIT_DATE}),
+        Stage('near_duplicates', stage_near_duplicates, inputs=['prepare'],
+              params={'mode': NEAR_DUPLICATE_MODE, 'index_dir': NEAR_DUPLICATE_DIR}),
+        Stage('scrub', stage_scrub, inputs=['near_duplicates'], files=[ENTITIES_FILENAME],
+              params={'entities_filename': ENTITIES_FILENAME}),
+        Stage('embed', stage_embed, inputs=['scrub'],
+              params={'model_name': SBERT_MODEL_NAME, 'backend': SBERT_BACKEND, 'processes': SBERT_PROCESSES,
+                      'batch_size': SBERT_BATCH_SIZE, 'store_dir': EMBEDDING_STORE_DIR,
+                      'store_dtype': EMBEDDING_STORE_DTYPE, 'legacy_filename': EMBEDDINGS_FILENAME_CLEANED}),
+        Stage('umap', stage_umap, inputs=['embed'],
+              params={'n_neighbors': 15, 'min_dist': 0.1, 'n_components': 2, 'random_state': 42,
+                      'cache_dir': UMAP_CACHE_DIR}),
+    ]
+    # --- Ein unabhängiger Zweig (Karte, LDA, Signifikanz) pro Kontrast mit 'plot' in der Spezifikation ---
+    for contrast in plot_contrasts(load_contrast_spec(CONTRASTS_FILENAME)):
+        name, column, positive_label, plot = contrast['name'], contrast['column'], contrast['positive'], contrast['plot']
+        map_filename = f"final_map_concepts_{plot['suffix']}.html"
+        lda_filename = f"final_lda_concepts_{plot['suffix']}.png"
+        significance_filename = f"final_lda_significance_{plot['suffix']}.json"
+        stages += [
+            Stage(f'map_{name}', stage_map, inputs=['scrub', 'umap'], outputs=[map_filename, sidecar_filename(map_filename)],
+                  params={'color_column': column, 'title': plot['map_title'], 'legend_title': plot['legend_title'],
+                          'color_map': plot['color_map'], 'output_filename': map_filename, 'map_mode': MAP_MODE}),
+            Stage(f'lda_{name}', stage_lda, inputs=['scrub', 'embed'],
+                  params={'label_column': column, 'positive_label': positive_label}),
+            Stage(f'significance_{name}', stage_significance, inputs=['scrub', 'embed'], outputs=[significance_filename],
+                  params={'label_column': column, 'positive_label': positive_label, 'n_permutations': N_PERMUTATIONS,
+                          'n_bootstrap': N_BOOTSTRAP, 'time_budget': SIGNIFICANCE_TIME_BUDGET,
+                          'output_filename': significance_filename}),
+            Stage(f'lda_plot_{name}', stage_lda_plot, inputs=['scrub', f'lda_{name}'], outputs=[lda_filename],
+                  params={'hue_column': column, 'title': plot['lda_title'], 'output_filename': lda_filename}),
+        ]
+    # --- Übersicht über ALLE Kontraste (Genres, Sterne, gleitende Jahresgrenzen, ...) ---
+    stages.append(Stage('contrasts', stage_contrasts, inputs=['scrub', 'embed', 'umap'],
+                        files=[CONTRASTS_FILENAME], outputs=[CONTRAST_SUMMARY_FILENAME],
+                        params={'contrasts_filename': CONTRASTS_FILENAME, 'output_filename': CONTRAST_SUMMARY_FILENAME}))
+    return stages
+
+# ==============================================================================
+# HAUPTANALYSE
+# ==============================================================================
+def main():
+    warnings.simplefilter(action='ignore', category=FutureWarning)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-    print("\n\n--- Analyse vollständig abgeschlossen! Alle vier konzeptuellen Artefakte wurden generiert. ---")
+    stages = build_stages()
+    parser = argparse.ArgumentParser(description="Finale konzeptuelle Analyse-Pipeline")
+    parser.add_argument('--from-stage', choices=[stage.name for stage in stages],
+                        help="Diese Stage und alle nachgelagerten neu berechnen")
+    parser.add_argument('--stages', nargs='+', choices=[stage.name for stage in stages],
+                        help="Nur diese Stages (und ihre Abhängigkeiten) ausführen")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Parallele Prozesse für unabhängige Zweige (1 = alles im Hauptprozess)")
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help="Python-Allokationen nicht verfolgen (tracemalloc kostet bei allokationsintensiven Schritten Zeit)")
+    parser.add_argument('--cprofile', action='store_true',
+                        help=f"cProfile-Dump pro Stage nach '{PROFILE_DIR}/' schreiben (z.B. für snakeviz/flameprof)")
+    parser.add_argument('--report-dir', default=RUN_REPORT_DIR,
+                        help="Verzeichnis für den maschinenlesbaren Laufbericht (JSON, mit stage_profiler.py vergleichbar)")
+    args = parser.parse_args()
+
+    print("--- Finale konzeptuelle Analyse-Pipeline ---")
+    try:
+        report = run_pipeline(stages, targets=args.stages, from_stage=args.from_stage,
+                              artifact_dir=ARTIFACT_DIR, max_workers=args.workers,
+                              profiling={'trace_malloc': not args.no_tracemalloc,
+                                         'cprofile_dir': PROFILE_DIR if args.cprofile else None})
+    except FileNotFoundError as e:
+        print(f"KRITISCHER FEHLER: Eine benötigte Eingabedatei wurde nicht gefunden: {e}")
+        exit()
+    print_stage_table(report)
+    n_ran = sum(stage['status'] == 'ran' for stage in report['stages'].values())
+    print(f"\n{n_ran} Schritte ausgeführt, {len(report['stages']) - n_ran} aus dem Cache ({report['wall_s']:.1f} s).")
+    print(f"Laufbericht: '{write_run_report(report, args.report_dir)}'")
+    print("\n\n--- Analyse vollständig abgeschlossen! Karten, LDA-Plots und Kontrast-Übersicht wurden generiert. ---")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
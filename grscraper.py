@@ -2,6 +2,9 @@ import time
 import pandas as pd
 import re
 import os
+import json
+import hashlib
+import itertools
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -9,6 +12,17 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from multiprocessing import Pool, cpu_count
+from dataset_store import write_table, book_id_from_url
+from rightnamefinder import fix_names_frame
+from language_filter import build_english_tables
+from near_duplicates import mark_near_duplicates, cluster_report
+from book_registry import load_registry, update_registry, parse_book_page
+
+# --- Per-book checkpoints (see scrape_goodreads_reviews) ---
+CHECKPOINT_DIR = 'scrape_checkpoints'
+CHECKPOINT_EVERY_PAGES = 5
+FAST_FORWARD_SETTLE_SECONDS = 1.5
+COMPLETE_CHECKPOINT_TTL_HOURS = 24 # a 'complete' checkpoint older than this is ignored and the book is scraped afresh
 
 # ==============================================================================
 # HELPER FUNCTIONS (These are called by each worker)
@@ -91,10 +105,98 @@ def scrape_book_metadata(driver, main_book_url):
         print(f"    - CRITICAL ERROR scraping metadata for {main_book_url}: {e}")
         return None
 
-def scrape_goodreads_reviews(driver, reviews_url, book_name, keyword):
-    """(This helper function is mostly unchanged)"""
+def get_checkpoint_path(url):
+    """Returns the per-book checkpoint file, keyed by the Goodreads book ID."""
+    id_match = re.search(r'/show/(\d+)', url)
+    book_key = id_match.group(1) if id_match else hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CHECKPOINT_DIR, f"{book_key}.json")
+
+def load_checkpoint(checkpoint_path):
+    """
+    Loads a per-book checkpoint. Returns None if there is none (or it is unreadable), and
+    for a 'complete' checkpoint older than COMPLETE_CHECKPOINT_TTL_HOURS, so a later run
+    picks up the reviews posted since instead of replaying the old result.
+    """
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        age_hours = (time.time() - os.path.getmtime(checkpoint_path)) / 3600
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('status') == 'complete' and age_hours > COMPLETE_CHECKPOINT_TTL_HOURS:
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Writes the checkpoint atomically, so a crash mid-write never corrupts it."""
+    if not checkpoint_path:
+        return
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    checkpoint['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+
+def clear_complete_checkpoints(checkpoint_dir=CHECKPOINT_DIR):
+    """Deletes the 'complete' checkpoints once their reviews are saved. Partial ones stay for a retry."""
+    if not os.path.isdir(checkpoint_dir):
+        return 0
+    removed = 0
+    for filename in os.listdir(checkpoint_dir):
+        checkpoint_path = os.path.join(checkpoint_dir, filename)
+        if filename.endswith('.json') and (load_checkpoint(checkpoint_path) or {}).get('status') == 'complete':
+            os.remove(checkpoint_path)
+            removed += 1
+    return removed
+
+def click_load_more(driver, wait, settle_seconds=3):
+    """Clicks the 'loadMore' button once. Raises TimeoutException when there is none (end of results)."""
+    show_more_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//span[@data-testid='loadMore']/..")))
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", show_more_button)
+    time.sleep(settle_seconds / 3)
+    driver.execute_script("arguments[0].click();", show_more_button)
+    time.sleep(settle_seconds)
+
+def fast_forward(driver, wait, checkpoint):
+    """
+    Re-opens the result pages a previous attempt already harvested.
+    Only clicks 'loadMore' (no 'Show more' expansion, no parsing) until the last
+    review seen is in the DOM again or the checkpointed page count is reached.
+    Returns the number of pages skipped.
+    """
+    # review_id is the resolved (absolute) href, the DOM attribute is relative -> match on the path
+    id_match = re.search(r'/review/show/(\d+)', checkpoint.get('last_review_id') or '')
+    last_review_xpath = f"//a[contains(@href, '/review/show/{id_match.group(1)}')]" if id_match else None
+    target_pages = checkpoint.get('page_count', 0)
+    pages_skipped = 1
+    while pages_skipped < target_pages:
+        if last_review_xpath and driver.find_elements(By.XPATH, last_review_xpath):
+            break
+        try:
+            click_load_more(driver, wait, settle_seconds=FAST_FORWARD_SETTLE_SECONDS)
+        except TimeoutException:
+            break
+        pages_skipped += 1
+    return pages_skipped
+
+def scrape_goodreads_reviews(driver, reviews_url, book_name, keyword, checkpoint_path=None):
+    """
+    Scrapes all keyword reviews of a book. Returns (reviews, status) where status is
+    'complete' (reached the end of the results) or 'partial' (stopped by an error).
+    Progress is checkpointed every CHECKPOINT_EVERY_PAGES pages; a retried task
+    fast-forwards past the pages in its checkpoint instead of starting from page 1.
+    """
     wait = WebDriverWait(driver, 15)
-    scraped_data = []
+    checkpoint = load_checkpoint(checkpoint_path) or {}
+    if checkpoint.get('status') == 'complete':
+        return checkpoint.get('reviews', []), 'complete'
+    scraped_data = checkpoint.get('reviews', [])
+    scraped_review_ids = set(checkpoint.get('review_ids', []))
+    checkpoint.update({'url': reviews_url, 'book_name': book_name, 'status': 'in_progress'})
+    status = 'partial'
     try:
         driver.get(reviews_url)
         handle_popups(driver)
@@ -109,12 +211,15 @@ def scrape_goodreads_reviews(driver, reviews_url, book_name, keyword):
             short_wait = WebDriverWait(driver, 5)
             short_wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "article.ReviewCard")))
         except TimeoutException:
-            return [] # No reviews found, return empty list
+            checkpoint.update({'status': 'complete', 'page_count': 0, 'reviews': [], 'review_ids': []})
+            save_checkpoint(checkpoint_path, checkpoint)
+            return [], 'complete' # No reviews found, return empty list
         page_count = 0
-        scraped_review_ids = set()
+        if checkpoint.get('page_count', 0) > 1:
+            page_count = fast_forward(driver, wait, checkpoint) - 1
+            print(f"    - Resuming '{book_name}' from checkpoint: skipped {page_count} pages, {len(scraped_data)} reviews already harvested.")
         while True:
             page_count += 1
-            # ... (inner scraping loop is identical to previous version) ...
             try:
                 text_expand_buttons = driver.find_elements(By.XPATH, ".//button[span[text()='Show more']]")
                 for button in text_expand_buttons:
@@ -134,31 +239,57 @@ def scrape_goodreads_reviews(driver, reviews_url, book_name, keyword):
                     final_context = process_and_truncate_context(review_html_content, keyword)
                     if final_context is None: continue
                     scraped_review_ids.add(review_id)
+                    checkpoint['last_review_id'] = review_id
                     try:
                         stars_element = review_element.find_element(By.CSS_SELECTOR, "span.RatingStars")
                         aria_label = stars_element.get_attribute('aria-label')
                         stars = re.search(r'\d+', aria_label).group(0) if aria_label and re.search(r'\d+', aria_label) else "Not rated"
                     except NoSuchElementException: stars = "Not rated"
-                    scraped_data.append({"book_name": book_name, "stars": stars, "date": date, "context": final_context})
+                    scraped_data.append({"book_name": book_name, "stars": stars, "date": date, "context": final_context, "review_id": review_id})
                 except Exception: continue
+            checkpoint.update({'page_count': page_count, 'review_ids': sorted(scraped_review_ids), 'reviews': scraped_data})
+            if page_count % CHECKPOINT_EVERY_PAGES == 0:
+                save_checkpoint(checkpoint_path, checkpoint)
             try:
-                show_more_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//span[@data-testid='loadMore']/..")))
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", show_more_button)
-                time.sleep(1)
-                driver.execute_script("arguments[0].click();", show_more_button)
-                time.sleep(3)
+                click_load_more(driver, wait)
             except TimeoutException:
-                break # Reached the end
-            except Exception:
-                break # Error, exit
+                status = 'complete' # Reached the end
+                break
     except Exception as e:
         print(f"An unexpected critical error during review scraping for {book_name}: {type(e).__name__}")
-    return scraped_data
+    # An error anywhere above leaves status 'partial'; the checkpoint lets a retry resume.
+    checkpoint['status'] = status
+    save_checkpoint(checkpoint_path, checkpoint)
+    return scraped_data, status
 
 # ==============================================================================
 # WORKER FUNCTION (This is what each parallel process will run)
 # ==============================================================================
 
+def book_urls_and_name(url, fallback_id):
+    """Returns (reviews_url, main_book_url, book_id, book_name) for a book URL."""
+    reviews_url = (url if '/reviews' in url else url.split('?')[0] + '/reviews')
+    main_book_url = reviews_url.replace('/reviews', '')
+    book_id = book_id_from_url(main_book_url)
+    book_name_match = re.search(r'/show/\d+\.([^/?]+)', main_book_url)
+    if book_name_match:
+        book_name = book_name_match.group(1).replace('_', ' ').replace('-', ' ')
+    else:
+        # Slug-less URL: take the registry title, otherwise a placeholder that is stable across runs
+        registry_entry = load_registry().get(book_id) if book_id else None
+        book_name = (registry_entry or {}).get('title') or (f"Book_ID_{book_id}" if book_id else f"URL_ID_{fallback_id}")
+    return reviews_url, main_book_url, book_id, book_name
+
+def book_result(url, book_id, book_name, reviews, metadata, status, registry_entry):
+    """The result dict process_single_book returns (shared by the Selenium and the CDP backend)."""
+    for review in reviews:
+        review['book_id'] = book_id
+    metadata['book_id'] = book_id
+    metadata['book_name'] = book_name
+    metadata['kafkaesque_review_count'] = len(reviews)
+    return {'reviews_data': reviews, 'summary_data': metadata, 'status': status, 'url': url,
+            'registry_entry': registry_entry}
+
 def process_single_book(url):
     """
     Complete scraping process for a single book URL.
@@ -168,10 +299,7 @@ def process_single_book(url):
     process_id = os.getpid() # Get the unique process ID for logging
     
     # --- URL and Book Name Setup ---
-    reviews_url = (url if '/reviews' in url else url.split('?')[0] + '/reviews')
-    main_book_url = reviews_url.replace('/reviews', '')
-    book_name_match = re.search(r'/show/\d+\.([^/?]+)', main_book_url)
-    book_name = book_name_match.group(1).replace('_', ' ').replace('-', ' ') if book_name_match else f"URL_ID_{process_id}"
+    reviews_url, main_book_url, book_id, book_name = book_urls_and_name(url, process_id)
     
     print(f"[Worker {process_id}] Starting task for: {book_name}")
 
@@ -188,7 +316,10 @@ def process_single_book(url):
     try:
         # --- EFFICIENT WORKFLOW ---
         # 1. Scrape reviews first to check for relevance
-        reviews_for_this_book = scrape_goodreads_reviews(driver, reviews_url, book_name, keyword)
+        checkpoint_path = get_checkpoint_path(main_book_url)
+        reviews_for_this_book, status = scrape_goodreads_reviews(driver, reviews_url, book_name, keyword, checkpoint_path)
+        if status == 'partial':
+            print(f"[Worker {process_id}] PARTIAL result for '{book_name}' ({len(reviews_for_this_book)} reviews). Checkpoint kept for a retry.")
         
         # 2. If (and only if) relevant reviews were found, get the metadata
         if reviews_for_this_book:
@@ -196,11 +327,13 @@ def process_single_book(url):
             metadata = scrape_book_metadata(driver, main_book_url)
             
             if metadata:
-                metadata['book_name'] = book_name
-                metadata['kafkaesque_review_count'] = len(reviews_for_this_book)
+                # The book page is loaded anyway; keep its title/authors for the book registry
+                registry_entry = parse_book_page(driver.page_source)
                 # Return a dictionary containing both results
-                return {'reviews_data': reviews_for_this_book, 'summary_data': metadata}
+                return book_result(url, book_id, book_name, reviews_for_this_book, metadata, status, registry_entry)
         
+        if status == 'partial':
+            return {'reviews_data': [], 'summary_data': None, 'status': status, 'url': url}
         # If no reviews were found, we don't need to return anything
         print(f"[Worker {process_id}] No relevant reviews found for '{book_name}'. Task complete.")
         return None
@@ -218,11 +351,28 @@ if __name__ == '__main__':
     INPUT_FILENAME = 'urls_verified_kafkaesque.txt' # Assumes you are using the pre-verified list
     REVIEWS_OUTPUT_FILENAME = 'goodreads_reviews_output.csv'
     SUMMARY_OUTPUT_FILENAME = 'goodreads_book_summary.csv'
+    REVIEWS_TABLE = 'reviews' # dataset_store tables (Parquet); the CSVs above are exports of these
+    SUMMARY_TABLE = 'summary'
+    FIX_NAMES_INLINE = True # Post-write hook: apply rightnamefinder's correction before saving (no separate pass)
+    NEAR_DUPLICATE_MODE = 'report' # 'drop': remove reposts/edition copies before saving, 'report': only write the cluster report
+    FILTER_LANGUAGE_INLINE = True # Post-write hook: refresh the English-only review set and english_review_count
+    UPDATE_ROLLUP_INLINE = True # After the language filter: add the new English reviews to the rollup cube (rollup_cube.py)
     KEYWORD = "kafkaesque"
     # As requested, use 4 workers. cpu_count() is a good alternative for flexibility.
     NUM_WORKERS = 6
+    # 'http': search the review JSON API directly (review_search.py), books it cannot handle go to the browser
+    # 'browser': every book through BROWSER_BACKEND
+    REVIEW_SEARCH_BACKEND = 'http'
+    # 'selenium': one Chrome + chromedriver per worker process, 'cdp': one Chrome with MAX_TABS pages (cdp_browser.py)
+    BROWSER_BACKEND = 'selenium'
+    MAX_TABS = 24
 
-    print(f"--- Goodreads Parallel Scraper Initializing with {NUM_WORKERS} workers ---")
+    if REVIEW_SEARCH_BACKEND == 'http':
+        print(f"--- Goodreads Scraper Initializing with the HTTP review search ({BROWSER_BACKEND} as fallback) ---")
+    elif BROWSER_BACKEND == 'cdp':
+        print(f"--- Goodreads Scraper Initializing with one CDP browser and {MAX_TABS} tabs ---")
+    else:
+        print(f"--- Goodreads Parallel Scraper Initializing with {NUM_WORKERS} workers ---")
     
     try:
         with open(INPUT_FILENAME, 'r') as f:
@@ -239,36 +389,110 @@ if __name__ == '__main__':
     # --- Initialize lists to hold all results ---
     all_reviews_data = []
     all_books_summary_data = []
+    partial_urls = []
+    registry_entries = []
 
-    # --- Create the multiprocessing Pool ---
-    with Pool(processes=NUM_WORKERS) as pool:
-        # imap_unordered is great for long tasks, as it provides results as they complete
-        results_iterator = pool.imap_unordered(process_single_book, urls_to_process)
-        
-        for i, result in enumerate(results_iterator):
-            print(f"--- Progress: {i+1}/{len(urls_to_process)} books complete ---")
-            # Filter out None results (for books with no relevant reviews)
-            if result:
-                all_reviews_data.extend(result['reviews_data'])
+    def collect_result(i, result):
+        print(f"--- Progress: {i+1}/{len(urls_to_process)} books complete ---")
+        # Filter out None results (for books with no relevant reviews)
+        if isinstance(result, Exception):
+            print(f"    - Task failed: {type(result).__name__}: {result}")
+        elif result:
+            all_reviews_data.extend(result['reviews_data'])
+            if result['summary_data']:
                 all_books_summary_data.append(result['summary_data'])
+            if result['status'] == 'partial':
+                partial_urls.append(result['url'])
+            if result.get('registry_entry'):
+                registry_entries.append(result['registry_entry'])
+
+    progress = itertools.count()
+    browser_urls = urls_to_process
+    if REVIEW_SEARCH_BACKEND == 'http':
+        from review_search import run_sync as run_search, process_book as search_book
+        browser_urls = []
+
+        def collect_search_result(url, result):
+            if isinstance(result, Exception):
+                print(f"    - HTTP search failed for {url} ({type(result).__name__}: {result}). Falling back to the browser.")
+                browser_urls.append(url)
+            else:
+                collect_result(next(progress), result)
+
+        run_search(urls_to_process, lambda backend, url: search_book(backend, url, KEYWORD), on_result=collect_search_result)
+        if browser_urls:
+            print(f"\n{len(browser_urls)} books need the browser fallback ({BROWSER_BACKEND}).")
+
+    if browser_urls and BROWSER_BACKEND == 'cdp':
+        # Imported here: cdp_browser imports helpers from this module
+        from cdp_browser import run_sync, process_book
+        run_sync(browser_urls, lambda page, url: process_book(page, url, KEYWORD), max_tabs=MAX_TABS,
+                 on_result=lambda url, result: collect_result(next(progress), result))
+    elif browser_urls:
+        # --- Create the multiprocessing Pool ---
+        with Pool(processes=NUM_WORKERS) as pool:
+            # imap_unordered is great for long tasks, as it provides results as they complete
+            results_iterator = pool.imap_unordered(process_single_book, browser_urls)
+            for result in results_iterator:
+                collect_result(next(progress), result)
 
     print("\n" + "="*60)
     print("--- All Workers Finished. Aggregating and saving results. ---")
     print("="*60)
 
+    if partial_urls:
+        print(f"\nWARNING: {len(partial_urls)} books finished with status 'partial'. Their reviews are incomplete:")
+        for url in partial_urls:
+            print(f"  - {url}")
+        print(f"Run the scraper again to resume them from the checkpoints in '{CHECKPOINT_DIR}/'.")
+
+    # Written once here (not by the workers) so the registry table is never written concurrently
+    if registry_entries:
+        print(f"Book registry updated with {len(registry_entries)} entries ({update_registry(registry_entries)} books total).")
+    registry = load_registry()
+
     # --- Save the final CSV files ---
     if all_reviews_data:
         print(f"\n--- FINAL REVIEWS RESULT ---\nSUCCESS: Found {len(all_reviews_data)} total relevant reviews.")
         reviews_df = pd.DataFrame(all_reviews_data)
-        reviews_df.to_csv(REVIEWS_OUTPUT_FILENAME, index=False, encoding='utf-8')
-        print(f"Detailed reviews data saved to '{REVIEWS_OUTPUT_FILENAME}'")
+        if FIX_NAMES_INLINE:
+            reviews_df, _ = fix_names_frame(reviews_df, registry=registry)
+        if NEAR_DUPLICATE_MODE:
+            # MinHash signatures are persisted, so only reviews new to the index get signed
+            reviews_df = mark_near_duplicates(reviews_df)
+            cluster_report(reviews_df)
+            if NEAR_DUPLICATE_MODE == 'drop':
+                reviews_df = reviews_df[~reviews_df['is_near_duplicate']]
+                # The kafkaesque counts must not include the dropped copies either
+                kept_counts = reviews_df['book_id'].value_counts()
+                for metadata in all_books_summary_data:
+                    metadata['kafkaesque_review_count'] = int(kept_counts.get(metadata['book_id'], 0))
+            reviews_df = reviews_df.drop(columns=['near_dup_cluster', 'is_near_duplicate', 'dup_weight'])
+        # Typed Parquet table is the source of truth; the CSV is refreshed as an export
+        write_table(REVIEWS_TABLE, reviews_df)
+        print(f"Detailed reviews data saved to dataset table '{REVIEWS_TABLE}' (CSV export: '{REVIEWS_OUTPUT_FILENAME}')")
     else:
         print("\nFinished: No reviews with the specified context were found.")
         
     if all_books_summary_data:
         print(f"\n--- FINAL BOOK SUMMARY ---\nSUCCESS: Found {len(all_books_summary_data)} books with relevant reviews.")
         summary_df = pd.DataFrame(all_books_summary_data)
-        summary_df = summary_df[['book_name', 'author', 'avg_rating', 'total_reviews', 'kafkaesque_review_count', 'release_date', 'genres']]
+        if FIX_NAMES_INLINE:
+            summary_df, _ = fix_names_frame(summary_df, registry=registry)
+        summary_df = summary_df[['book_id', 'book_name', 'author', 'avg_rating', 'total_reviews', 'kafkaesque_review_count', 'release_date', 'genres']]
         print(summary_df)
-        summary_df.to_csv(SUMMARY_OUTPUT_FILENAME, index=False, encoding='utf-8')
-        print(f"Book summary data saved to '{SUMMARY_OUTPUT_FILENAME}'")
\ No newline at end of file
+        write_table(SUMMARY_TABLE, summary_df)
+        print(f"Book summary data saved to dataset table '{SUMMARY_TABLE}' (CSV export: '{SUMMARY_OUTPUT_FILENAME}')")
+
+    # Everything the complete checkpoints hold is in the dataset now; the next run starts those books fresh
+    removed_checkpoints = clear_complete_checkpoints()
+    if removed_checkpoints:
+        print(f"Removed {removed_checkpoints} complete checkpoints from '{CHECKPOINT_DIR}/'.")
+
+    if FILTER_LANGUAGE_INLINE and all_reviews_data and all_books_summary_data:
+        # Only reviews not seen in earlier runs are classified (per-text cache in language_filter.py)
+        build_english_tables(REVIEWS_TABLE, SUMMARY_TABLE)
+        if UPDATE_ROLLUP_INLINE:
+            # Adds only the reviews the rollup cube has not counted yet
+            from rollup_cube import update_cube
+            update_cube()
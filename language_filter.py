@@ -0,0 +1,239 @@
+# language_filter.py
+
+import os
+import sys
+import pickle
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from entity_scrubber import text_hash
+from dataset_store import read_table, write_table, iter_table_batches, export_table, CSV_EXPORTS
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+REVIEWS_TABLE = 'reviews'                  # Ausgabe von grscraper
+SUMMARY_TABLE = 'summary'
+ENGLISH_TABLE = 'reviews_english'          # Eingabe des Analyzers (+ Export goodreads_reviews_english_filtered.csv)
+ENRICHED_TABLE = 'summary_enriched'        # summary + english_review_count
+REVIEWS_FILENAME = 'goodreads_reviews_output.csv'
+SUMMARY_FILENAME = 'goodreads_book_summary.csv'
+# Eingefrorene manuelle Trennung (Trainingsdaten). Wird nie geschrieben - der Export des Filters geht
+# nach CSV_EXPORTS['reviews_english'], sonst würde jedes neue Modell auf seiner eigenen Ausgabe trainiert.
+ENGLISH_FILENAME = 'goodreads_reviews_english_clean.csv'
+# Die Gegenseite derselben Trennung: gescrapte Reviews, die damals nicht in die englische Auswahl kamen.
+# Eingefroren, weil grscraper goodreads_reviews_output.csv bei jedem Lauf neu exportiert - später
+# gescrapte englische Reviews würden sonst beim nächsten Training als 'andere' gelernt.
+OTHER_FILENAME = 'goodreads_reviews_manual_other.csv'
+# Echte nicht-englische Reviews-Sätze (Sprache<TAB>Text). Die manuell aussortierten Reviews sind
+# fast alle kurz und Englisch; ohne diese Beispiele lernt das Modell nur 'lateinische Schrift = Englisch'.
+LANGUAGE_SAMPLES_FILENAME = 'language_samples_other.tsv'
+
+LANGUAGE_MODEL_FILENAME = 'language_model.npz'
+LANGUAGE_CACHE_FILENAME = 'language_cache.pkl'
+
+# Zeichen-n-Gramme (1-3) werden in einen festen Vektor gehasht -> Modell = ein Gewichtsvektor
+N_FEATURES = 2 ** 18
+NGRAM_RANGE = (1, 3)
+# Additive Glättung relativ zur Klassengröße: Anteil einer Gleichverteilung, der jeder Klasse beigemischt wird.
+# Eine absolute Glättung (+1 pro Bucket) würde die kleine Klasse 'andere' fast ganz zur Gleichverteilung machen.
+SMOOTHING = 0.1
+# Erhöhen, wenn sich Trainingsdaten oder Gewichtung ändern: ältere Modelldateien werden dann neu trainiert
+MODEL_VERSION = 2
+SELF_TRAINING_ROUNDS = 2
+# Mittleres Log-Likelihood-Verhältnis pro n-Gramm, ab dem ein Text als Englisch gilt
+ENGLISH_THRESHOLD = 0.0
+
+PARALLEL_MIN_TEXTS = 50000
+CHUNK_SIZE = 20000
+BATCH_SIZE = 100000
+
+# ==============================================================================
+# MODELL (Naive Bayes über gehashte Zeichen-n-Gramme, komplett offline)
+# ==============================================================================
+def make_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(analyzer='char_wb', ngram_range=NGRAM_RANGE, n_features=N_FEATURES,
+                             alternate_sign=False, norm=None, lowercase=True)
+
+def fit_weights(english_counts, other_counts, smoothing=SMOOTHING):
+    """Log-Likelihood-Verhältnis log P(n-Gramm|Englisch) - log P(n-Gramm|andere) pro Hash-Bucket."""
+    def log_probs(counts):
+        total = max(counts.sum(), 1)
+        return np.log(counts + smoothing * total / N_FEATURES) - np.log(total * (1 + smoothing))
+    return (log_probs(english_counts) - log_probs(other_counts)).astype(np.float32)
+
+def score_texts(texts, weights):
+    """Vektorisiert: mittleres Log-Likelihood-Verhältnis pro n-Gramm (> 0 = eher Englisch)."""
+    X = make_vectorizer().transform(texts)
+    n_grams = np.asarray(X.sum(axis=1)).ravel()
+    return (X @ weights) / np.maximum(n_grams, 1)
+
+def train_language_model(english_texts, other_texts, sample_texts=(), rounds=SELF_TRAINING_ROUNDS):
+    """
+    Trainiert das Modell aus der bisherigen (manuellen) Trennung. Die Klasse 'andere'
+    enthält dort auch aussortierte englische Reviews; Texte dieser Klasse, die das Modell
+    klar als Englisch erkennt, werden deshalb in einigen Runden umgelabelt (Self-Training).
+    'sample_texts' sind sicher nicht-englisch und werden nie umgelabelt.
+    """
+    vectorizer = make_vectorizer()
+    X_english = vectorizer.transform(english_texts)
+    X_other = vectorizer.transform(other_texts)
+    english_counts = np.asarray(X_english.sum(axis=0)).ravel()
+    sample_counts = np.asarray(vectorizer.transform(list(sample_texts)).sum(axis=0)).ravel() if len(sample_texts) else 0
+    other_n_grams = np.maximum(np.asarray(X_other.sum(axis=1)).ravel(), 1)
+    keep_other = np.ones(X_other.shape[0], dtype=bool)
+    for _ in range(rounds + 1):
+        other_counts = np.asarray(X_other[keep_other].sum(axis=0)).ravel() + sample_counts
+        relabel_counts = np.asarray(X_other[~keep_other].sum(axis=0)).ravel()
+        weights = fit_weights(english_counts + relabel_counts, other_counts)
+        new_keep = (X_other @ weights) / other_n_grams <= ENGLISH_THRESHOLD
+        if (new_keep == keep_other).all():
+            break
+        keep_other = new_keep
+    print(f"Sprachmodell trainiert: {len(english_texts)} englische, {int(keep_other.sum())} andere Texte "
+          f"+ {len(sample_texts)} Sprachbeispiele ({int((~keep_other).sum())} umgelabelt).")
+    return weights
+
+def training_texts(english_filename=ENGLISH_FILENAME, other_filename=OTHER_FILENAME,
+                   samples_filename=LANGUAGE_SAMPLES_FILENAME):
+    """
+    Bisherige manuelle Trennung (englische Auswahl vs. aussortierte Reviews, beide eingefroren)
+    plus die mitgelieferten nicht-englischen Sprachbeispiele.
+    """
+    english = pd.read_csv(english_filename)['context'].dropna().astype(str)
+    other = pd.read_csv(other_filename)['context'].dropna().astype(str)
+    other = other[~other.isin(set(english))].drop_duplicates()
+    samples = pd.read_csv(samples_filename, sep='\t')['text'].dropna().astype(str)
+    if samples.empty:
+        raise ValueError(f"Keine nicht-englischen Beispiele in '{samples_filename}' gefunden.")
+    return english.drop_duplicates().tolist(), other.tolist(), samples.tolist()
+
+def save_language_model(weights, filename=LANGUAGE_MODEL_FILENAME):
+    tmp_filename = filename + '.tmp.npz'
+    np.savez_compressed(tmp_filename, weights=weights, n_features=N_FEATURES, ngram_min=NGRAM_RANGE[0], ngram_max=NGRAM_RANGE[1],
+                        version=MODEL_VERSION)
+    os.replace(tmp_filename, filename)
+
+def load_language_model(filename=LANGUAGE_MODEL_FILENAME):
+    """Lädt das Modell; fehlt es (oder ist es veraltet), wird es einmalig aus den Trainingsdaten trainiert."""
+    if os.path.exists(filename):
+        with np.load(filename) as model:
+            version = int(model['version']) if 'version' in model.files else 1
+        if version != MODEL_VERSION:
+            print(f"'{filename}' stammt von einer älteren Modellversion ({version}).")
+    if not os.path.exists(filename) or version != MODEL_VERSION:
+        print(f"Trainiere das Sprachmodell nach '{filename}'...")
+        save_language_model(train_language_model(*training_texts()), filename)
+    with np.load(filename) as model:
+        if int(model['n_features']) != N_FEATURES or (int(model['ngram_min']), int(model['ngram_max'])) != NGRAM_RANGE:
+            raise ValueError(f"'{filename}' passt nicht zur Konfiguration. Bitte mit 'train' neu erzeugen.")
+        return model['weights']
+
+def model_fingerprint(weights):
+    return hashlib.sha1(weights.tobytes()).hexdigest()
+
+# ==============================================================================
+# KLASSIFIKATION (dedupliziert, gecacht, bei großen Korpora parallel)
+# ==============================================================================
+def _score_chunk(args):
+    texts, weights = args
+    return score_texts(texts, weights)
+
+def score_parallel(texts, weights, n_jobs=None, chunk_size=CHUNK_SIZE):
+    if len(texts) < PARALLEL_MIN_TEXTS:
+        return score_texts(texts, weights)
+    chunks = [(texts[i:i + chunk_size], weights) for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return np.concatenate(list(executor.map(_score_chunk, chunks)))
+
+def load_language_cache(cache_filename, fingerprint):
+    """Lädt den Cache {text_hash: ist_englisch}; verwirft ihn bei einem neuen Modell."""
+    if not cache_filename or not os.path.exists(cache_filename):
+        return {}
+    try:
+        with open(cache_filename, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+    if cache.get('fingerprint') != fingerprint:
+        print("Sprachmodell hat sich geändert. Verwerfe den Sprach-Cache.")
+        return {}
+    return cache.get('entries', {})
+
+def save_language_cache(cache_filename, fingerprint, entries):
+    tmp_filename = cache_filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, cache_filename)
+
+def detect_english(texts, weights, cache=None, n_jobs=None):
+    """
+    Boolesche Series: ist der Review-Text Englisch? Nur Texte, deren Hash noch nicht im
+    Cache ist, werden klassifiziert. Gibt (Series, Anzahl neu klassifiziert) zurück.
+    """
+    cache = {} if cache is None else cache
+    is_text = texts.map(lambda v: isinstance(v, str) and bool(v.strip()))
+    hashes = texts.where(is_text, '').map(text_hash)
+    missing = is_text & ~hashes.isin(cache.keys())
+    todo = texts[missing].drop_duplicates()
+    if len(todo):
+        scores = score_parallel(todo.tolist(), weights, n_jobs=n_jobs)
+        cache.update(zip(hashes.loc[todo.index], (scores > ENGLISH_THRESHOLD).tolist()))
+    return hashes.map(cache).where(is_text, False).astype(bool), len(todo)
+
+# ==============================================================================
+# STAGE: grscraper-Ausgabe -> englische Reviews + english_review_count
+# ==============================================================================
+def build_english_tables(reviews_table=REVIEWS_TABLE, summary_table=SUMMARY_TABLE, english_table=ENGLISH_TABLE,
+                         enriched_table=ENRICHED_TABLE, model_filename=LANGUAGE_MODEL_FILENAME,
+                         cache_filename=LANGUAGE_CACHE_FILENAME, batch_size=BATCH_SIZE, n_jobs=None):
+    """
+    Streamt die Reviews in Batches, schreibt die englischen in 'english_table' und
+    aktualisiert english_review_count in 'enriched_table'. Durch den Cache werden bei
+    jedem Lauf nur neu hinzugekommene Texte klassifiziert.
+    """
+    weights = load_language_model(model_filename)
+    fingerprint = model_fingerprint(weights)
+    cache = load_language_cache(cache_filename, fingerprint)
+    counts_by_id, counts_by_name = Counter(), Counter()
+    total = english_total = new_total = 0
+
+    for i, batch in enumerate(iter_table_batches(reviews_table, batch_size=batch_size, csv_fallback=REVIEWS_FILENAME)):
+        is_english, n_new = detect_english(batch['context'], weights, cache, n_jobs=n_jobs)
+        english = batch[is_english.values]
+        write_table(english_table, english, mode='overwrite' if i == 0 else 'append', export_csv=False)
+        with_id = english['book_id'].notna() if 'book_id' in english.columns else pd.Series(False, index=english.index)
+        counts_by_id.update(english.loc[with_id, 'book_id'].astype(int).tolist() if with_id.any() else [])
+        counts_by_name.update(english.loc[~with_id, 'book_name'].astype(str).tolist())
+        total += len(batch)
+        english_total += len(english)
+        new_total += n_new
+    if cache_filename and new_total:
+        save_language_cache(cache_filename, fingerprint, cache)
+    if total and english_table in CSV_EXPORTS:
+        export_table(english_table, CSV_EXPORTS[english_table])
+
+    summary_df = read_table(summary_table, csv_fallback=SUMMARY_FILENAME)
+    by_id = summary_df['book_id'].map(counts_by_id) if 'book_id' in summary_df.columns else None
+    by_name = summary_df['book_name'].astype(str).map(counts_by_name)
+    english_counts = by_name.fillna(0) if by_id is None else by_id.fillna(0) + by_name.fillna(0)
+    summary_df['english_review_count'] = english_counts.astype(int)
+    write_table(enriched_table, summary_df)
+
+    print(f"Sprach-Filter: {english_total} von {total} Reviews sind Englisch "
+          f"({new_total} neu klassifiziert, Rest aus dem Cache) -> '{english_table}', '{enriched_table}'.")
+    return {'reviews': total, 'english': english_total, 'classified': new_total}
+
+# ==============================================================================
+# HAUPTSKRIPT
+# ==============================================================================
+if __name__ == '__main__':
+    # 'train': Modell (neu) aus der bisherigen manuellen Trennung erzeugen; sonst den Filter ausführen
+    if len(sys.argv) > 1 and sys.argv[1] == 'train':
+        save_language_model(train_language_model(*training_texts()))
+        print(f"Modell gespeichert: '{LANGUAGE_MODEL_FILENAME}'")
+    else:
+        build_english_tables()
@@ -0,0 +1,138 @@
+# lda_significance.py
+
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+N_PERMUTATIONS = 1000
+N_BOOTSTRAP = 1000
+BATCH_SIZE = 64 # Label-Permutationen pro Matrix-Operation
+TIME_BUDGET_SECONDS = 120 # bricht früher ab, wenn das Budget erschöpft ist
+SHRINKAGE = 1e-3 # Regularisierung der Within-Kovarianz (Anteil der mittleren Varianz)
+CONFIDENCE = 0.95
+
+# ==============================================================================
+# GEMEINSAM GENUTZTE VORBERECHNUNG
+# ==============================================================================
+def precompute(embeddings, n_components=None):
+    """
+    Zentriert die Daten einmal und reduziert sie per SVD auf ihren Zeilenraum.
+    Die Fisher-Trennung ist invariant unter dieser Drehung, also können alle
+    Permutationen in der kleinen Basis gerechnet werden. Die Gesamtstreuung
+    S_T = X'X wird dabei diagonal (Singulärwerte^2) und ist für alle
+    Permutationen identisch - nur der Klassenmittelwert ändert sich.
+    """
+    X = np.asarray(embeddings, dtype=np.float64)
+    X = X - X.mean(axis=0)
+    U, singular_values, _ = np.linalg.svd(X, full_matrices=False)
+    if n_components:
+        U, singular_values = U[:, :n_components], singular_values[:n_components]
+    Z = U * singular_values # n x r, Z'Z = diag(s^2)
+    total_scatter = singular_values ** 2
+    ridge = SHRINKAGE * total_scatter.mean()
+    return {'Z': Z, 'total_scatter': total_scatter, 'ridge': ridge, 'n': len(X)}
+
+def separation_batch(pre, label_matrix):
+    """
+    Fisher-Trennung J = n1*n0/n * d' S_W^-1 d für viele Label-Vektoren auf einmal.
+    Mit S_W = S_T - (n1*n0/n) * d d' (d = Differenz der Klassenmittel) folgt per
+    Sherman-Morrison aus dem (diagonalen) S_T:  J = c*q / (1 - c*q), q = d' S_T^-1 d.
+    label_matrix: (B x n) boolesch. Liefert B Trennungswerte.
+    """
+    Z, n = pre['Z'], pre['n']
+    labels = label_matrix.astype(np.float64)
+    n1 = labels.sum(axis=1)
+    n0 = n - n1
+    sum1 = labels @ Z # B x r; da Z zentriert ist, gilt sum0 = -sum1
+    d = sum1 / n1[:, None] + sum1 / n0[:, None]
+    c = n1 * n0 / n
+    q = np.sum(d * d / (pre['total_scatter'] + pre['ridge']), axis=1)
+    cq = np.minimum(c * q, 1 - 1e-12)
+    return cq / (1 - cq)
+
+def weighted_lda_axis(embeddings, labels, weights):
+    """
+    LDA-Achse mit einem Gewicht pro Review (z.B. dup_weight = 1 / Clustergröße):
+    gewichtete Klassenmittel und gewichtete Within-Kovarianz, Ridge wie in precompute.
+    Liefert (Achse, Mittelpunkt); Scores = (X - Mittelpunkt) @ Achse.
+    """
+    X = np.asarray(embeddings, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    weights = np.asarray(weights, dtype=np.float64)
+    means = {c: np.average(X[labels == c], axis=0, weights=weights[labels == c]) for c in (False, True)}
+    centered = X - np.where(labels[:, None], means[True], means[False])
+    within = (centered * weights[:, None]).T @ centered / weights.sum()
+    within[np.diag_indices_from(within)] += SHRINKAGE * np.trace(within) / len(within)
+    axis = np.linalg.solve(within, means[True] - means[False])
+    return axis / np.linalg.norm(axis), np.average(X, axis=0, weights=weights)
+
+# ==============================================================================
+# PERMUTATION UND BOOTSTRAP
+# ==============================================================================
+def _permutation_worker(args):
+    pre, labels, n_permutations, seed, deadline = args
+    rng = np.random.default_rng(seed)
+    results = []
+    while len(results) < n_permutations and time.time() < deadline:
+        batch = min(BATCH_SIZE, n_permutations - len(results))
+        permuted = np.stack([rng.permutation(labels) for _ in range(batch)])
+        results.extend(separation_batch(pre, permuted))
+    return np.array(results)
+
+def _bootstrap_worker(args):
+    embeddings, labels, n_bootstrap, seed, deadline, n_components = args
+    rng = np.random.default_rng(seed)
+    results = []
+    positives, negatives = np.flatnonzero(labels), np.flatnonzero(~labels)
+    while len(results) < n_bootstrap and time.time() < deadline:
+        # Stratifiziertes Resampling, damit beide Klassen immer vertreten sind
+        sample = np.concatenate([rng.choice(positives, len(positives)), rng.choice(negatives, len(negatives))])
+        pre = precompute(embeddings[sample], n_components)
+        results.append(separation_batch(pre, labels[sample][None, :])[0])
+    return np.array(results)
+
+def split_work(total, n_workers):
+    base = total // n_workers
+    return [base + (1 if i < total % n_workers else 0) for i in range(n_workers)]
+
+def lda_significance(embeddings, labels, n_permutations=N_PERMUTATIONS, n_bootstrap=N_BOOTSTRAP,
+                     time_budget=TIME_BUDGET_SECONDS, n_workers=None, n_components=None, random_state=42):
+    """
+    Permutationstest und Bootstrap-Konfidenzintervall für die LDA-Trennung zweier Gruppen.
+    Die Permutationen teilen sich eine einzige Vorberechnung (SVD) und werden in Batches
+    als Matrixprodukt ausgewertet; Permutationen und Bootstrap laufen in einem Prozess-Pool.
+    """
+    labels = np.asarray(labels, dtype=bool)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    start = time.time()
+    pre = precompute(embeddings, n_components)
+    observed = float(separation_batch(pre, labels[None, :])[0])
+
+    n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+    # Die Hälfte des Budgets für Permutationen, der Rest für den (teureren) Bootstrap
+    permutation_deadline = start + time_budget / 2
+    seeds = np.random.SeedSequence(random_state).spawn(2 * n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        permutation_jobs = [(pre, labels, n, seeds[i], permutation_deadline)
+                            for i, n in enumerate(split_work(n_permutations, n_workers)) if n]
+        null_distribution = np.concatenate(list(executor.map(_permutation_worker, permutation_jobs)))
+        bootstrap_deadline = start + time_budget
+        bootstrap_jobs = [(embeddings, labels, n, seeds[n_workers + i], bootstrap_deadline, n_components)
+                          for i, n in enumerate(split_work(n_bootstrap, n_workers)) if n]
+        bootstrap_distribution = np.concatenate(list(executor.map(_bootstrap_worker, bootstrap_jobs)))
+
+    alpha = 1 - CONFIDENCE
+    return {
+        'observed': observed,
+        'p_value': (1 + np.sum(null_distribution >= observed)) / (1 + len(null_distribution)),
+        'null_mean': float(null_distribution.mean()) if len(null_distribution) else float('nan'),
+        'ci_low': float(np.quantile(bootstrap_distribution, alpha / 2)) if len(bootstrap_distribution) else float('nan'),
+        'ci_high': float(np.quantile(bootstrap_distribution, 1 - alpha / 2)) if len(bootstrap_distribution) else float('nan'),
+        'n_permutations': int(len(null_distribution)),
+        'n_bootstrap': int(len(bootstrap_distribution)),
+        'seconds': time.time() - start,
+    }
@@ -0,0 +1,138 @@
+# map_export.py
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+# Ab dieser Punktzahl wird die Karte ausgedünnt (Punkte) bzw. als Dichte gezeigt.
+MAX_POINTS = 50000
+DENSITY_BINS = 200
+# So viele Punkte behält jede Kategorie beim Ausdünnen mindestens (sofern vorhanden)
+MIN_POINTS_PER_GROUP = 200
+# plotly.js einmal als Datei neben die HTML-Karten legen statt in jede Karte einzubetten
+PLOTLY_JS_MODE = 'directory'
+
+# JavaScript für den Hover: lädt die Sidecar-Datei beim ersten Hover per <script>
+# (funktioniert auch über file:// ohne Server) und zeigt den Text im Info-Feld.
+HOVER_SCRIPT = """
+var plot = document.getElementById('{plot_id}');
+var panel = document.createElement('div');
+panel.style.cssText = 'font-family:Arial;font-size:13px;max-width:900px;margin:8px auto;min-height:3em;color:#333';
+plot.parentNode.appendChild(panel);
+var hoverState = {loading: false, pending: null};
+function showHover(row) {
+    // Review-Texte nur als Textknoten einfügen, nie als HTML
+    var entry = window.SEMANTIC_MAP_HOVER[row];
+    panel.textContent = '';
+    (entry || []).forEach(function(v, i) {
+        if (i) panel.appendChild(document.createElement('br'));
+        var label = document.createElement('b');
+        label.textContent = window.SEMANTIC_MAP_HOVER_COLUMNS[i] + ': ';
+        panel.appendChild(label);
+        panel.appendChild(document.createTextNode(v));
+    });
+}
+plot.on('plotly_hover', function(event) {
+    var row = event.points[0].customdata;
+    if (window.SEMANTIC_MAP_HOVER) { showHover(row); return; }
+    hoverState.pending = row;
+    if (hoverState.loading) return;
+    hoverState.loading = true;
+    var script = document.createElement('script');
+    script.src = '{sidecar}';
+    script.onload = function() { showHover(hoverState.pending); };
+    document.head.appendChild(script);
+});
+"""
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def sidecar_filename(output_filename):
+    return os.path.splitext(output_filename)[0] + '_hover.js'
+
+def write_hover_sidecar(df, hover_columns, filename):
+    """Schreibt die Hover-Texte (nach Zeilennummer) in eine separate JS-Datei."""
+    rows = df[hover_columns].astype(str).values.tolist()
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('window.SEMANTIC_MAP_HOVER_COLUMNS = ' + json.dumps(hover_columns, ensure_ascii=False) + ';\n')
+        f.write('window.SEMANTIC_MAP_HOVER = ' + json.dumps(rows, ensure_ascii=False) + ';\n')
+
+def decimate(df, color_column, max_points, random_state=42):
+    """
+    Stratifizierte Stichprobe: jede Kategorie behält ihren Anteil, aber mindestens
+    einige Punkte, damit kleine Gruppen (z.B. Kafka) nicht verschwinden.
+    """
+    if len(df) <= max_points:
+        return df
+    fraction = max_points / len(df)
+    group_size = df.groupby(color_column, observed=True)[color_column].transform('size')
+    keep_all = group_size <= MIN_POINTS_PER_GROUP
+    at_minimum = ~keep_all & (group_size * fraction < MIN_POINTS_PER_GROUP)
+    proportional = ~keep_all & ~at_minimum
+    return pd.concat([
+        df[keep_all],
+        df[at_minimum].groupby(color_column, observed=True).sample(n=MIN_POINTS_PER_GROUP, random_state=random_state),
+        df[proportional].groupby(color_column, observed=True).sample(frac=fraction, random_state=random_state),
+    ]).sort_index()
+
+def density_traces(df, x, y, color_column, color_map, bins):
+    """Serverfreie Dichte-Ansicht: vorab aggregierte 2D-Histogramme (eines pro Kategorie) als Konturen."""
+    import plotly.graph_objects as go
+    x_edges = np.linspace(df[x].min(), df[x].max(), bins + 1)
+    y_edges = np.linspace(df[y].min(), df[y].max(), bins + 1)
+    traces = []
+    for category, group in df.groupby(color_column, observed=True):
+        counts, _, _ = np.histogram2d(group[x], group[y], bins=[x_edges, y_edges])
+        color = color_map.get(category, '#888888')
+        traces.append(go.Contour(
+            x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2, z=counts.T,
+            name=f"{category} ({len(group)})", showscale=False, contours_coloring='lines',
+            colorscale=[[0, color], [1, color]], line_width=1, ncontours=12, hoverinfo='skip'
+        ))
+    return traces
+
+def export_semantic_map(df, x, y, color_column, title, legend_title, color_map, output_filename,
+                        hover_columns, mode='auto', max_points=MAX_POINTS, density_bins=DENSITY_BINS):
+    """
+    Skalierbare Karte:
+    - WebGL-Rendering (Scattergl) statt SVG
+    - Hover-Texte in einer Sidecar-Datei, erst beim ersten Hover geladen (nur die Zeilennummer ist inline)
+    - mode='points' (alle Punkte), 'decimated' (Stichprobe), 'density' (Konturen + Stichprobe),
+      'auto' wählt ab max_points die ausgedünnte Ansicht.
+    """
+    import plotly.graph_objects as go
+    df = df.reset_index(drop=True)
+    if mode == 'auto':
+        mode = 'points' if len(df) <= max_points else 'density'
+    shown = df if mode == 'points' else decimate(df, color_column, max_points)
+
+    fig = go.Figure()
+    if mode == 'density':
+        for trace in density_traces(df, x, y, color_column, color_map, density_bins):
+            fig.add_trace(trace)
+    for category, group in shown.groupby(color_column, observed=True):
+        fig.add_trace(go.Scattergl(
+            x=group[x].astype('float32'), y=group[y].astype('float32'), mode='markers', name=str(category),
+            customdata=group.index.values, hovertemplate=f"{legend_title}: {category}<extra></extra>",
+            marker=dict(size=4, opacity=0.7, color=color_map.get(category))
+        ))
+    # --- PRÄZISE STEUERUNG DES LAYOUTS ---
+    fig.update_layout(
+        title=title, legend_title_text=legend_title,
+        font_family="Arial",
+        title_x=0.5,
+        plot_bgcolor='white',  # Setzt den Hintergrund auf weiß
+        xaxis=dict(showgrid=False, showline=True, linecolor='lightgrey', title=''), # Entfernt Gitter, zeigt Achsenlinie
+        yaxis=dict(showgrid=False, showline=True, linecolor='lightgrey', title='')  # Entfernt Gitter, zeigt Achsenlinie
+    )
+    sidecar = sidecar_filename(output_filename)
+    # plotly ersetzt '{plot_id}' im post_script durch die ID des Plot-Divs
+    write_hover_sidecar(df, hover_columns, sidecar)
+    post_script = HOVER_SCRIPT.replace('{sidecar}', os.path.basename(sidecar))
+    fig.write_html(output_filename, include_plotlyjs=PLOTLY_JS_MODE, post_script=post_script)
+    return {'mode': mode, 'points_shown': len(shown), 'points_total': len(df)}
@@ -0,0 +1,238 @@
+# near_duplicates.py
+
+import os
+import re
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from entity_scrubber import text_hash
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+NEAR_DUPLICATE_DIR = 'near_duplicate_index'
+CLUSTER_REPORT_FILENAME = 'near_duplicate_clusters.csv'
+
+SHINGLE_SIZE = 3        # Wort-3-Gramme
+MIN_WORDS = 8           # kürzere Texte ("so kafkaesque.") sind zu generisch und werden nie geclustert
+NUM_PERM = 128          # MinHash-Permutationen
+BANDS = 16              # LSH: 16 Bänder x 8 Zeilen -> Kandidaten ab ca. 0.7 Jaccard
+ROWS_PER_BAND = NUM_PERM // BANDS
+THRESHOLD = 0.8         # geschätzte Jaccard-Ähnlichkeit, ab der zwei Texte Duplikate sind
+SEED = 42
+PRIME = (1 << 31) - 1   # a * x + b bleibt so in uint64 (x < 2^31, a < 2^31)
+
+PARALLEL_MIN_TEXTS = 50000
+CHUNK_SIZE = 20000
+
+# ==============================================================================
+# SHINGLING + MINHASH
+# ==============================================================================
+def hash_coefficients(num_perm=NUM_PERM, seed=SEED):
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, PRIME, num_perm, dtype=np.uint64), rng.integers(0, PRIME, num_perm, dtype=np.uint64))
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Gehashte Wort-n-Gramme des normalisierten Textes (leer für zu kurze Texte)."""
+    words = re.sub(r'[^\w]+', ' ', str(text).lower()).split()
+    if len(words) < MIN_WORDS:
+        return np.empty(0, dtype=np.uint64)
+    grams = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams)) % np.uint64(PRIME)
+
+def minhash_signatures(texts, coefficients=None):
+    """MinHash-Signaturen (n x NUM_PERM, uint32). Zu kurze Texte bekommen eine Signatur aus 0xFFFFFFFF."""
+    a, b = coefficients or hash_coefficients()
+    signatures = np.full((len(texts), len(a)), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for i, text in enumerate(texts):
+        x = shingles(text)
+        if len(x):
+            signatures[i] = ((x[:, None] * a[None, :] + b[None, :]) % np.uint64(PRIME)).min(axis=0)
+    return signatures
+
+def _signature_chunk(texts):
+    return minhash_signatures(texts)
+
+def signatures_parallel(texts, n_jobs=None, chunk_size=CHUNK_SIZE):
+    if len(texts) < PARALLEL_MIN_TEXTS:
+        return minhash_signatures(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return np.concatenate(list(executor.map(_signature_chunk, chunks)))
+
+def is_empty_signature(signatures):
+    return (signatures == np.iinfo(np.uint32).max).all(axis=-1)
+
+def band_keys(signatures, band):
+    """Ein hashbarer Schlüssel (bytes) pro Zeile für das gegebene LSH-Band."""
+    block = np.ascontiguousarray(signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+    return block.view(np.dtype((np.void, block.dtype.itemsize * ROWS_PER_BAND))).ravel()
+
+# ==============================================================================
+# PERSISTENTER INDEX (Signaturen pro eindeutigem Text-Hash)
+# ==============================================================================
+class NearDuplicateIndex:
+    """
+    Persistente MinHash-Signaturen (wie der Embedding-Store über den Text-Hash adressiert).
+    Neue Reviews werden nur signiert, wenn ihr Text noch unbekannt ist; die LSH-Buckets
+    werden beim Laden in O(n * BANDS) aus den Signaturen aufgebaut.
+    """
+
+    def __init__(self, index_dir=NEAR_DUPLICATE_DIR):
+        self.index_dir = index_dir
+        self.hashes = []
+        self.signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._buckets = None
+        self.load()
+
+    @property
+    def row_of(self):
+        return {h: i for i, h in enumerate(self.hashes)}
+
+    def load(self):
+        index_filename = os.path.join(self.index_dir, 'index.json')
+        if not os.path.exists(index_filename):
+            return
+        with open(index_filename, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('params') != self.params():
+            print("MinHash-Parameter haben sich geändert. Verwerfe den Duplikat-Index.")
+            return
+        self.hashes = index['hashes']
+        self.signatures = np.load(os.path.join(self.index_dir, 'signatures.npy'))
+
+    @staticmethod
+    def params():
+        return {'shingle_size': SHINGLE_SIZE, 'min_words': MIN_WORDS, 'num_perm': NUM_PERM, 'seed': SEED}
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        signatures_filename = os.path.join(self.index_dir, 'signatures.npy')
+        with open(signatures_filename + '.tmp', 'wb') as f:
+            np.save(f, self.signatures)
+        os.replace(signatures_filename + '.tmp', signatures_filename)
+        index_filename = os.path.join(self.index_dir, 'index.json')
+        with open(index_filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'params': self.params(), 'hashes': self.hashes}, f)
+        os.replace(index_filename + '.tmp', index_filename)
+
+    def add(self, texts, n_jobs=None):
+        """Signiert alle noch unbekannten Texte und speichert den Index. Gibt die Text-Hashes zurück."""
+        texts = pd.Series(texts, dtype=object).fillna('').astype(str)
+        hashes = texts.map(text_hash)
+        known = self.row_of
+        new = ~hashes.isin(known.keys()) & ~hashes.duplicated()
+        if new.any():
+            self.signatures = np.concatenate([self.signatures, signatures_parallel(texts[new].tolist(), n_jobs=n_jobs)])
+            self.hashes.extend(hashes[new].tolist())
+            self._buckets = None
+            self.save()
+        print(f"Duplikat-Index: {int(new.sum())} neue Texte signiert, {len(self.hashes)} insgesamt.")
+        return hashes.tolist()
+
+    def buckets(self):
+        """LSH-Buckets: pro Band {Schlüssel: erste Zeile}; leere Signaturen kommen in keinen Bucket."""
+        if self._buckets is None:
+            valid = ~is_empty_signature(self.signatures)
+            self._buckets = []
+            for band in range(BANDS):
+                keys = band_keys(self.signatures, band)
+                bucket = {}
+                for row in np.flatnonzero(valid):
+                    bucket.setdefault(keys[row].tobytes(), row)
+                self._buckets.append(bucket)
+        return self._buckets
+
+    def clusters(self):
+        """
+        Union-Find über die LSH-Kandidaten. Jede Zeile wird nur mit dem ersten Eintrag ihres
+        Buckets verglichen (nicht paarweise), das hält den Aufwand linear in n * BANDS.
+        Liefert {text_hash: Repräsentant (Hash des zuerst indexierten Texts im Cluster)}.
+        """
+        n = len(self.hashes)
+        parent = np.arange(n)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        valid = ~is_empty_signature(self.signatures)
+        buckets = self.buckets()
+        for band in range(BANDS):
+            keys = band_keys(self.signatures, band)
+            for row in np.flatnonzero(valid):
+                first = buckets[band][keys[row].tobytes()]
+                if first != row and np.mean(self.signatures[row] == self.signatures[first]) >= THRESHOLD:
+                    root_row, root_first = find(row), find(first)
+                    if root_row != root_first:
+                        parent[max(root_row, root_first)] = min(root_row, root_first)
+        return {h: self.hashes[find(i)] for i, h in enumerate(self.hashes)}
+
+    def query(self, texts):
+        """Für jeden (neuen) Text: Hash eines Beinahe-Duplikats im Index oder None. Verändert den Index nicht."""
+        signatures = minhash_signatures(list(texts))
+        buckets = self.buckets()
+        matches = []
+        for signature in signatures:
+            match = None
+            if not is_empty_signature(signature):
+                for band in range(BANDS):
+                    first = buckets[band].get(band_keys(signature[None, :], band)[0].tobytes())
+                    if first is not None and np.mean(signature == self.signatures[first]) >= THRESHOLD:
+                        match = self.hashes[first]
+                        break
+            matches.append(match)
+        return matches
+
+# ==============================================================================
+# REVIEWS MARKIEREN / BERICHT
+# ==============================================================================
+def mark_near_duplicates(df, index=None, text_column='context', date_column='date'):
+    """
+    Fügt dem DataFrame hinzu:
+    - near_dup_cluster:  Hash des Repräsentanten (Cluster-ID)
+    - is_near_duplicate: True für alle Reviews eines Clusters außer dem ältesten
+    - dup_weight:        1 / Clustergröße (zum Herabgewichten statt Entfernen)
+    """
+    index = index or NearDuplicateIndex()
+    hashes = pd.Series(index.add(df[text_column]), index=df.index)
+    df['near_dup_cluster'] = hashes.map(index.clusters())
+    # Gleich lautende Kurz-Reviews stammen meist von verschiedenen Lesern -> eigener Cluster pro Zeile
+    n_words = df[text_column].fillna('').astype(str).str.lower().str.replace(r'[^\w]+', ' ', regex=True).str.split().str.len()
+    short = (n_words < MIN_WORDS).values
+    df.loc[short, 'near_dup_cluster'] = df.loc[short, 'near_dup_cluster'] + ':' + pd.Series(np.flatnonzero(short), index=df.index[short]).astype(str)
+    dates = df[date_column] if pd.api.types.is_datetime64_any_dtype(df[date_column]) else pd.to_datetime(df[date_column], errors='coerce')
+    order = pd.DataFrame({'cluster': df['near_dup_cluster'], 'date': dates, 'pos': np.arange(len(df))}, index=df.index)
+    order = order.sort_values(['cluster', 'date', 'pos'], na_position='last')
+    df['is_near_duplicate'] = order['cluster'].duplicated().reindex(df.index)
+    df['dup_weight'] = 1.0 / df.groupby('near_dup_cluster')['near_dup_cluster'].transform('size')
+    n_duplicates = int(df['is_near_duplicate'].sum())
+    print(f"Beinahe-Duplikate: {n_duplicates} von {len(df)} Reviews "
+          f"in {int(df.loc[df['is_near_duplicate'], 'near_dup_cluster'].nunique())} Clustern.")
+    return df
+
+def cluster_report(df, output_filename=CLUSTER_REPORT_FILENAME, text_column='context'):
+    """Eine Zeile pro Cluster mit mehr als einem Review (Größe, betroffene Bücher, Beispieltext)."""
+    clustered = df[df.groupby('near_dup_cluster')['near_dup_cluster'].transform('size') > 1]
+    report = clustered.groupby('near_dup_cluster').agg(
+        size=(text_column, 'size'),
+        n_books=('book_name', 'nunique'),
+        books=('book_name', lambda names: ' | '.join(sorted(set(map(str, names))))),
+        sample=(text_column, lambda texts: str(texts.iloc[0])[:200]),
+    ).sort_values('size', ascending=False).reset_index()
+    if output_filename:
+        report.to_csv(output_filename, index=False, encoding='utf-8')
+        print(f"Cluster-Bericht ({len(report)} Cluster) gespeichert: '{output_filename}'")
+    return report
+
+# ==============================================================================
+# HAUPTSKRIPT (Index für alle gescrapten Reviews aktualisieren + Bericht)
+# ==============================================================================
+if __name__ == '__main__':
+    from dataset_store import read_table
+    reviews_df = read_table('reviews', columns=['book_name', 'date', 'context'], csv_fallback='goodreads_reviews_output.csv')
+    cluster_report(mark_near_duplicates(reviews_df))
@@ -0,0 +1,211 @@
+# pipeline_runner.py
+
+import os
+import time
+import pickle
+import inspect
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from stage_profiler import profile_call, count_rows, new_run_report
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+ARTIFACT_DIR = 'pipeline_artifacts'
+
+# ==============================================================================
+# STAGE-DEFINITION
+# ==============================================================================
+class Stage:
+    """
+    Ein Schritt der Pipeline.
+    - func:    Modul-Funktion, aufgerufen als func(*Artefakte der inputs, **params)
+    - inputs:  Namen der Stages, deren Artefakte übergeben werden (in dieser Reihenfolge)
+    - params:  Parameter (gehen in den Artefakt-Schlüssel ein)
+    - files:   Eingabedateien, deren Inhalt in den Schlüssel eingeht
+    - outputs: Dateien, die der Schritt schreibt (fehlen sie, wird er neu ausgeführt)
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, files=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.files = list(files)
+        self.outputs = list(outputs)
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def file_hash(filename):
+    """Inhalts-Hash einer Datei oder eines Verzeichnisses (z.B. einer Parquet-Tabelle)."""
+    if not os.path.exists(filename):
+        return 'missing'
+    if os.path.isdir(filename):
+        names = sorted(os.listdir(filename))
+        return hashlib.sha1('|'.join(f"{n}:{file_hash(os.path.join(filename, n))}" for n in names).encode('utf-8')).hexdigest()
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_hash(func):
+    """Hash des Quelltexts: eine geänderte Stage-Funktion (z.B. Plot-Titel) invalidiert nur sich selbst."""
+    try:
+        return hashlib.sha1(inspect.getsource(func).encode('utf-8')).hexdigest()
+    except (OSError, TypeError):
+        return func.__qualname__
+
+def topological_order(stages):
+    by_name = {stage.name: stage for stage in stages}
+    order, visiting, done = [], set(), set()
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Zyklus in der Pipeline bei Stage '{name}'.")
+        if name not in by_name:
+            raise ValueError(f"Unbekannte Stage '{name}'.")
+        visiting.add(name)
+        for dependency in by_name[name].inputs:
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        order.append(by_name[name])
+    for stage in stages:
+        visit(stage.name)
+    return order
+
+def compute_keys(ordered_stages):
+    """Artefakt-Schlüssel pro Stage: Hash aus Name, Code, Parametern, Eingabedateien und Upstream-Schlüsseln."""
+    keys = {}
+    for stage in ordered_stages:
+        parts = [stage.name, source_hash(stage.func), repr(sorted(stage.params.items()))]
+        parts += [f"{f}:{file_hash(f)}" for f in stage.files]
+        parts += [keys[dependency] for dependency in stage.inputs]
+        keys[stage.name] = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+    return keys
+
+def artifact_path(artifact_dir, stage_name, key):
+    return os.path.join(artifact_dir, stage_name, f"{key}.pkl")
+
+def downstream_of(ordered_stages, stage_name):
+    """Die Stage selbst und alle Stages, die (indirekt) von ihr abhängen."""
+    affected = {stage_name}
+    for stage in ordered_stages:
+        if any(dependency in affected for dependency in stage.inputs):
+            affected.add(stage.name)
+    return affected
+
+def run_stage(stage, input_paths, output_path, profiling=None):
+    """
+    Führt eine Stage aus (auch in einem Worker-Prozess) und speichert ihr Artefakt.
+    Gibt die Messwerte der Stage zurück (siehe stage_profiler.profile_call); Laden und
+    Speichern der Artefakte werden getrennt von der eigentlichen Rechenzeit gemessen.
+    """
+    profiling = profiling or {}
+    start = time.perf_counter()
+    inputs = []
+    for path in input_paths:
+        with open(path, 'rb') as f:
+            inputs.append(pickle.load(f))
+    load_s = time.perf_counter() - start
+    result, metrics = profile_call(stage.name, stage.func, inputs, stage.params,
+                                   trace_malloc=profiling.get('trace_malloc', True),
+                                   cprofile_dir=profiling.get('cprofile_dir'))
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path + '.tmp', 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(output_path + '.tmp', output_path)
+    metrics.update({'status': 'ran', 'load_s': round(load_s, 3), 'save_s': round(time.perf_counter() - start, 3),
+                    'rows_in': [count_rows(value) for value in inputs], 'rows_out': count_rows(result)})
+    return metrics
+
+def load_artifact(stage_name, stages, artifact_dir=ARTIFACT_DIR):
+    """Lädt das aktuelle Artefakt einer Stage (z.B. für Notebooks oder andere Skripte)."""
+    keys = compute_keys(topological_order(stages))
+    with open(artifact_path(artifact_dir, stage_name, keys[stage_name]), 'rb') as f:
+        return pickle.load(f)
+
+# ==============================================================================
+# RUNNER
+# ==============================================================================
+def run_pipeline(stages, targets=None, from_stage=None, artifact_dir=ARTIFACT_DIR, max_workers=None, profiling=None):
+    """
+    Führt die Stages in Abhängigkeitsreihenfolge aus.
+    - Stages mit vorhandenem Artefakt (gleicher Schlüssel) und vorhandenen Ausgabedateien werden übersprungen.
+    - Unabhängige Zweige laufen parallel in einem Prozess-Pool (max_workers=1: alles im Hauptprozess).
+    - from_stage erzwingt die Neuberechnung dieser Stage und aller nachgelagerten.
+    - profiling: {'trace_malloc': bool, 'cprofile_dir': Verzeichnis oder None}
+    Gibt den Laufbericht zurück (Messwerte pro Stage, siehe stage_profiler).
+    """
+    report = new_run_report()
+    run_start = time.perf_counter()
+    ordered = topological_order(stages)
+    if targets:
+        needed = set()
+        by_name = {stage.name: stage for stage in ordered}
+        def collect(name):
+            if name not in needed:
+                needed.add(name)
+                for dependency in by_name[name].inputs:
+                    collect(dependency)
+        for target in targets:
+            if target not in by_name:
+                raise ValueError(f"Unbekannte Stage '{target}'.")
+            collect(target)
+        ordered = [stage for stage in ordered if stage.name in needed]
+    if from_stage and from_stage not in {stage.name for stage in stages}:
+        raise ValueError(f"Unbekannte Stage '{from_stage}'.")
+
+    keys = compute_keys(topological_order(stages))
+    forced = downstream_of(ordered, from_stage) if from_stage else set()
+    paths = {stage.name: artifact_path(artifact_dir, stage.name, keys[stage.name]) for stage in ordered}
+
+    pending = []
+    done = set()
+    for stage in ordered:
+        up_to_date = (os.path.exists(paths[stage.name]) and stage.name not in forced
+                      and all(os.path.exists(output) for output in stage.outputs))
+        if up_to_date:
+            print(f"[Pipeline] '{stage.name}' ist aktuell (Artefakt {keys[stage.name]}), übersprungen.")
+            done.add(stage.name)
+            report['stages'][stage.name] = {'status': 'cached', 'key': keys[stage.name]}
+        else:
+            pending.append(stage)
+
+    def finish(stage, metrics):
+        metrics['key'] = keys[stage.name]
+        report['stages'][stage.name] = metrics
+        pending.remove(stage)
+        done.add(stage.name)
+
+    def ready_stages():
+        return [stage for stage in pending if all(dependency in done for dependency in stage.inputs)]
+
+    if max_workers == 1:
+        while pending:
+            stage = ready_stages()[0]
+            print(f"[Pipeline] Starte '{stage.name}'...")
+            finish(stage, run_stage(stage, [paths[d] for d in stage.inputs], paths[stage.name], profiling))
+        report['wall_s'] = round(time.perf_counter() - run_start, 3)
+        return report
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for stage in ready_stages():
+                if stage.name in {s.name for s in running.values()}:
+                    continue
+                print(f"[Pipeline] Starte '{stage.name}'...")
+                future = executor.submit(run_stage, stage, [paths[d] for d in stage.inputs], paths[stage.name], profiling)
+                running[future] = stage
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                finish(stage, future.result()) # Fehler einer Stage brechen den Lauf ab
+                print(f"[Pipeline] '{stage.name}' fertig ({report['stages'][stage.name]['wall_s']:.1f} s).")
+    report['wall_s'] = round(time.perf_counter() - run_start, 3)
+    return report
@@ -2,6 +2,7 @@ import time
 import re
 import random
 import os
+from contextlib import nullcontext
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -9,6 +10,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from multiprocessing import Pool, cpu_count
+from candidate_ranker import rank_candidates
+from book_registry import load_registry, review_count_from_html
+from reverification import load_ledger, save_ledger, record_result, due_for_reverification, write_outcome_files
 
 # ==============================================================================
 # Global variable and Initializer for persistent worker IDs
@@ -27,7 +31,8 @@ def initialize_worker():
 
 def worker_function(url):
     """
-    Checks a single URL. Returns a tuple: (status, url, [optional_error])
+    Checks a single URL. Returns a tuple: (status, url, review_count) or ('FAILURE', url, error_type).
+    The review count comes from the reviews page that is loaded anyway (for the re-check TTL).
     """
     # Staggered start to prevent "thundering herd"
     time.sleep(random.uniform(0, 3))
@@ -47,11 +52,13 @@ def worker_function(url):
     driver = webdriver.Chrome(options=options)
     
     reviews_url = (url if '/reviews' in url else url.split('?')[0] + '/reviews')
+    review_count = None
     
     try:
         driver.get(reviews_url)
         wait = WebDriverWait(driver, 15)
         search_box = wait.until(EC.presence_of_element_located((By.XPATH, "//input[@placeholder='Search review text']")))
+        review_count = review_count_from_html(driver.page_source)
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", search_box)
         time.sleep(0.75)
         search_box.clear()
@@ -61,10 +68,10 @@ def worker_function(url):
         WebDriverWait(driver, 6).until(EC.presence_of_element_located((By.CSS_SELECTOR, "article.ReviewCard")))
         
         driver.quit()
-        return ('VALID_MATCH', url)
+        return ('VALID_MATCH', url, review_count)
     except TimeoutException:
         driver.quit()
-        return ('NO_MATCH', url)
+        return ('NO_MATCH', url, review_count)
     except Exception as e:
         error_type = type(e).__name__
         driver.quit()
@@ -86,25 +93,44 @@ if __name__ == '__main__':
     TASKS_PER_WORKER = 25 
     NUM_SUB_BATCHES = 3
     SUB_BATCH_SIZE = 50
+    MIN_SCORE = None # Optional cut-off: candidates ranked below this score are not verified at all
+    MIN_BATCH_HIT_RATE = None # Optional: stop the run once a sub-batch yields fewer hits than this (e.g. 0.02)
+    # 'http': query the review JSON API directly (review_search.py); URLs it fails on are re-checked in the browser
+    # 'browser': every URL through BROWSER_BACKEND
+    REVIEW_SEARCH_BACKEND = 'http'
+    # 'selenium': one Chrome + chromedriver per worker process, 'cdp': one Chrome with MAX_TABS pages (cdp_browser.py)
+    BROWSER_BACKEND = 'selenium'
+    MAX_TABS = 24
+    KEYWORD = 'kafkaesque'
 
     print("--- Goodreads Interactive Batch Scraper (V34) Initializing ---")
     
-    # --- CORRECTED & FOOLPROOF PROGRESS TRACKING ---
-    # The set of processed URLs is the UNION of all three output files.
-    processed_urls = set()
-    for filename in [VERIFIED_OUTPUT_FILENAME, FAILURE_OUTPUT_FILENAME, NO_MATCH_OUTPUT_FILENAME]:
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                processed_urls.update(line.strip() for line in f if line.strip())
+    # --- PROGRESS TRACKING ---
+    # The verification ledger remembers every checked URL with its outcome and check time
+    # (bootstrapped once from the three output files). NO_MATCH and FAILURE URLs are not
+    # final: they come back once their TTL / retry backoff has expired (see reverification.py).
+    ledger = load_ledger()
+    registry = load_registry()
+    due_urls = due_for_reverification(ledger, registry)
+    processed_urls = set(ledger) - set(due_urls)
     
-    print(f"Loaded {len(processed_urls)} URLs from all previous output files (verified, failed, and no_match).")
+    print(f"Loaded {len(ledger)} URLs from the verification ledger; {len(due_urls)} NO_MATCH/FAILURE URLs are due for re-verification.")
+
+    verified_urls = set()
+    if os.path.exists(VERIFIED_OUTPUT_FILENAME):
+        with open(VERIFIED_OUTPUT_FILENAME, 'r') as f:
+            verified_urls = set(line.strip() for line in f if line.strip())
     
     try:
         with open(INPUT_FILENAME, 'r') as f:
             all_urls_from_file = set([line.strip() for line in f if line.strip()])
-        # Correctly calculate the remaining work
-        urls_to_process_full_list = list(all_urls_from_file - processed_urls)
-        random.shuffle(urls_to_process_full_list)
+        # Correctly calculate the remaining work, most promising candidates first
+        ranked = rank_candidates((all_urls_from_file | set(due_urls)) - processed_urls, verified_urls, registry)
+        if MIN_SCORE is not None:
+            print(f"Cut-off {MIN_SCORE}: skipping {int((ranked['score'] < MIN_SCORE).sum())} low-scoring candidates.")
+            ranked = ranked[ranked['score'] >= MIN_SCORE]
+        urls_to_process_full_list = ranked['url'].tolist()
+        scores = dict(zip(ranked['url'], ranked['score']))
         
         if not urls_to_process_full_list:
             print("\nAll URLs from the input file have already been processed. Nothing to do.")
@@ -120,9 +146,31 @@ if __name__ == '__main__':
     print(f"Total unique URLs remaining to be processed: {total_remaining}")
     print(f"This run will process up to {len(urls_for_this_run)} URLs.")
     
-    with Pool(processes=NUM_WORKERS, initializer=initialize_worker, maxtasksperchild=TASKS_PER_WORKER) as pool:
-        results_iterator = pool.imap_unordered(worker_function, urls_for_this_run)
-        
+    urls_processed = 0
+    batch_report = []
+    if BROWSER_BACKEND == 'cdp':
+        from cdp_browser import run_sync, verify_keyword
+        pool = nullcontext()
+        # verify_keyword returns worker_function's tuples; a tab that could not even be opened counts as a failure
+        verify_in_browser = lambda batch_urls: [
+            result if not isinstance(result, Exception) else ('FAILURE', url, type(result).__name__)
+            for url, result in zip(batch_urls, run_sync(batch_urls, lambda page, url: verify_keyword(page, url, KEYWORD), max_tabs=MAX_TABS))]
+    else:
+        pool = Pool(processes=NUM_WORKERS, initializer=initialize_worker, maxtasksperchild=TASKS_PER_WORKER)
+        verify_in_browser = lambda batch_urls: pool.imap_unordered(worker_function, batch_urls)
+    if REVIEW_SEARCH_BACKEND == 'http':
+        from review_search import run_sync as run_search, verify_url
+
+        def verify_batch(batch_urls):
+            results = run_search(batch_urls, lambda backend, url: verify_url(backend, url, KEYWORD))
+            yield from (result for result in results if result[0] != 'FAILURE')
+            retry_urls = [result[1] for result in results if result[0] == 'FAILURE']
+            if retry_urls:
+                print(f"HTTP search failed for {len(retry_urls)} URLs in this batch. Re-checking them in the browser.")
+                yield from verify_in_browser(retry_urls)
+    else:
+        verify_batch = verify_in_browser
+    with pool:
         run_successes = 0
         run_failures = 0
         run_no_matches = 0
@@ -131,34 +179,59 @@ if __name__ == '__main__':
         print("--- Starting URL Processing (Results will appear as they complete) ---")
         print("="*60)
 
-        for i, result in enumerate(results_iterator):
-            status, url = result[0], result[1]
+        # Sub-batches in score order, so the hit rate per batch shows where the yield drops off
+        for batch_start in range(0, len(urls_for_this_run), SUB_BATCH_SIZE):
+            batch_urls = urls_for_this_run[batch_start:batch_start + SUB_BATCH_SIZE]
+            hits_before = run_successes
+            for result in verify_batch(batch_urls):
+                i = urls_processed
+                urls_processed += 1
+                status, url = result[0], result[1]
+                review_count = result[2] if status != 'FAILURE' and len(result) > 2 else None
+                record_result(ledger, url, status, registry, review_count=review_count)
             
-            if status == 'VALID_MATCH':
-                print(f"Result {i+1}/{len(urls_for_this_run)}: [SUCCESS] Keyword found for {url}")
-                with open(VERIFIED_OUTPUT_FILENAME, 'a') as f:
-                    f.write(url + '\n')
-                run_successes += 1
-            elif status == 'NO_MATCH':
-                print(f"Result {i+1}/{len(urls_for_this_run)}: [NO MATCH] Page checked for {url}")
-                with open(NO_MATCH_OUTPUT_FILENAME, 'a') as f:
-                    f.write(url + '\n')
-                run_no_matches += 1
-            elif status == 'FAILURE':
-                error_type = result[2]
-                print(f"Result {i+1}/{len(urls_for_this_run)}: [FAILURE] Error '{error_type}' for {url}")
-                with open(FAILURE_OUTPUT_FILENAME, 'a') as f:
-                    f.write(url + '\n')
-                run_failures += 1
+                if status == 'VALID_MATCH':
+                    print(f"Result {i+1}/{len(urls_for_this_run)}: [SUCCESS] Keyword found for {url}")
+                    with open(VERIFIED_OUTPUT_FILENAME, 'a') as f:
+                        f.write(url + '\n')
+                    run_successes += 1
+                elif status == 'NO_MATCH':
+                    print(f"Result {i+1}/{len(urls_for_this_run)}: [NO MATCH] Page checked for {url}")
+                    with open(NO_MATCH_OUTPUT_FILENAME, 'a') as f:
+                        f.write(url + '\n')
+                    run_no_matches += 1
+                elif status == 'FAILURE':
+                    error_type = result[2]
+                    print(f"Result {i+1}/{len(urls_for_this_run)}: [FAILURE] Error '{error_type}' for {url}")
+                    with open(FAILURE_OUTPUT_FILENAME, 'a') as f:
+                        f.write(url + '\n')
+                    run_failures += 1
+
+            save_ledger(ledger)
+            batch_hits = run_successes - hits_before
+            batch_scores = [scores[url] for url in batch_urls]
+            batch_report.append((len(batch_report) + 1, len(batch_urls), batch_hits, max(batch_scores), min(batch_scores)))
+            hit_rate = batch_hits / len(batch_urls)
+            print(f"--- Batch {len(batch_report)}: {batch_hits}/{len(batch_urls)} hits ({hit_rate:.0%}), "
+                  f"scores {max(batch_scores):.2f}..{min(batch_scores):.2f} ---")
+            if MIN_BATCH_HIT_RATE is not None and hit_rate < MIN_BATCH_HIT_RATE:
+                print(f"Hit rate below {MIN_BATCH_HIT_RATE:.0%}: skipping the low-yield tail of this run.")
+                break
+
+    # Re-verified URLs move between the output files, so they are rewritten from the ledger
+    write_outcome_files(ledger)
 
     print("\n" + "="*60)
     print("--- BATCH RUN COMPLETE ---")
-    print(f"Processed {len(urls_for_this_run)} URLs in this run.")
+    print(f"Processed {urls_processed} URLs in this run.")
     print(f"  - Relevant URLs found (SUCCESS): {run_successes}")
     print(f"  - Checked, no match found (NO MATCH): {run_no_matches}")
     print(f"  - Failures (errors): {run_failures}")
+    print("\n  Batch | URLs | Hits | Hit rate | Score range")
+    for batch_number, batch_size, batch_hits, high, low in batch_report:
+        print(f"  {batch_number:5d} | {batch_size:4d} | {batch_hits:4d} | {batch_hits / batch_size:8.0%} | {high:.2f}..{low:.2f}")
     
-    remaining_after_this_run = total_remaining - len(urls_for_this_run)
+    remaining_after_this_run = total_remaining - urls_processed
     
     print("\nResults have been saved incrementally.")
     if remaining_after_this_run > 0:
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+from dataset_store import book_id_from_url
+from book_registry import load_registry
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+VERIFICATION_STATE_FILENAME = 'verification_state.json'
+OUTCOME_FILENAMES = {
+    'VALID_MATCH': 'urls_verified_kafkaesque.txt',
+    'NO_MATCH': 'urls_no_match_found.txt',
+    'FAILURE': 'urls_failed_to_process.txt',
+}
+
+# FAILURE: retried after RETRY_BASE_HOURS * 2^(attempts - 1), at most MAX_RETRIES times.
+# A URL that exhausts the budget is only retried again after EXHAUSTED_RETRY_DAYS.
+RETRY_BASE_HOURS = 6
+MAX_RETRIES = 4
+EXHAUSTED_RETRY_DAYS = 90
+
+# NO_MATCH: re-checked once the book has probably gained NEW_REVIEWS_FOR_RECHECK reviews
+# since the last check (TTL = NEW_REVIEWS_FOR_RECHECK / review velocity), clamped to the bounds below.
+NEW_REVIEWS_FOR_RECHECK = 500
+MIN_TTL_DAYS = 30
+MAX_TTL_DAYS = 365
+DEFAULT_BOOK_AGE_DAYS = 10 * 365 # velocity guess from a single review count
+DEFAULT_VELOCITY = 0.5 # reviews/day for books the registry knows nothing about
+
+DAY = 86400
+
+# ==============================================================================
+# LEDGER (url -> last outcome, check times and review counts)
+# ==============================================================================
+def read_urls(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def bootstrap_ledger(outcome_filenames=OUTCOME_FILENAMES):
+    """
+    Builds the ledger from the plain outcome files of earlier runs. They carry no
+    timestamps, so each file's modification time stands in for the check time.
+    Later files win, so a URL that was verified after failing counts as verified.
+    """
+    ledger = {}
+    for status in ['FAILURE', 'NO_MATCH', 'VALID_MATCH']:
+        filename = outcome_filenames[status]
+        if not os.path.exists(filename):
+            continue
+        checked_at = os.path.getmtime(filename)
+        for url in read_urls(filename):
+            ledger[url] = {'status': status, 'checked_at': checked_at, 'attempts': 1, 'observations': []}
+    return ledger
+
+def load_ledger(filename=VERIFICATION_STATE_FILENAME):
+    if not os.path.exists(filename):
+        ledger = bootstrap_ledger()
+        print(f"No '{filename}' yet. Bootstrapped {len(ledger)} URLs from the outcome files.")
+        return ledger
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_ledger(ledger, filename=VERIFICATION_STATE_FILENAME):
+    """Atomic write, like the scrape checkpoints."""
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(ledger, f)
+    os.replace(tmp_filename, filename)
+
+def record_result(ledger, url, status, registry=None, now=None, review_count=None):
+    """
+    Stores the outcome of one check. 'attempts' counts consecutive failures; 'observations'
+    keeps (time, review_count) pairs to estimate the review velocity. The count is the one
+    the verifier read from the page it loaded anyway; the registry is only a fallback.
+    """
+    now = time.time() if now is None else now
+    entry = ledger.get(url, {'attempts': 0, 'observations': []})
+    entry['attempts'] = entry['attempts'] + 1 if status == 'FAILURE' and entry.get('status') == 'FAILURE' else 1
+    entry['status'] = status
+    entry['checked_at'] = now
+    if review_count is None:
+        review_count = ((registry or {}).get(book_id_from_url(url)) or {}).get('review_count')
+    if review_count is not None:
+        entry['observations'] = (entry['observations'] + [[now, int(review_count)]])[-2:]
+    ledger[url] = entry
+    return entry
+
+def write_outcome_files(ledger, outcome_filenames=OUTCOME_FILENAMES):
+    """Rewrites the outcome files from the ledger, so each URL only appears under its latest status."""
+    for status, filename in outcome_filenames.items():
+        urls = sorted(url for url, entry in ledger.items() if entry['status'] == status)
+        with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(url + '\n' for url in urls)
+        os.replace(filename + '.tmp', filename)
+
+# ==============================================================================
+# POLICY
+# ==============================================================================
+def review_velocity(entry, registry_entry=None):
+    """Reviews per day: from two observations if possible, else review_count / assumed book age."""
+    observations = entry.get('observations', [])
+    if len(observations) == 2 and observations[1][0] > observations[0][0]:
+        (t0, count0), (t1, count1) = observations
+        if count1 > count0:
+            return (count1 - count0) / ((t1 - t0) / DAY)
+    review_count = (registry_entry or {}).get('review_count') or (observations[-1][1] if observations else None)
+    return review_count / DEFAULT_BOOK_AGE_DAYS if review_count else DEFAULT_VELOCITY
+
+def retry_delay_seconds(entry, registry_entry=None):
+    """Time after the last check at which the URL is due again; None for verified URLs."""
+    if entry['status'] == 'FAILURE':
+        if entry['attempts'] > MAX_RETRIES:
+            return EXHAUSTED_RETRY_DAYS * DAY
+        return RETRY_BASE_HOURS * 3600 * 2 ** (entry['attempts'] - 1)
+    if entry['status'] == 'NO_MATCH':
+        ttl_days = NEW_REVIEWS_FOR_RECHECK / review_velocity(entry, registry_entry)
+        return min(max(ttl_days, MIN_TTL_DAYS), MAX_TTL_DAYS) * DAY
+    return None
+
+def due_for_reverification(ledger, registry=None, now=None):
+    """The expired subset of the NO_MATCH and FAILURE URLs, most overdue first."""
+    registry = load_registry() if registry is None else registry
+    now = time.time() if now is None else now
+    overdue = {}
+    for url, entry in ledger.items():
+        delay = retry_delay_seconds(entry, registry.get(book_id_from_url(url)))
+        if delay is not None and entry['checked_at'] + delay <= now:
+            overdue[url] = (now - entry['checked_at']) / delay
+    return sorted(overdue, key=overdue.get, reverse=True)
+
+def schedule_summary(ledger, registry=None, now=None):
+    """Counts per status and how many of each are due now."""
+    registry = load_registry() if registry is None else registry
+    due = set(due_for_reverification(ledger, registry, now))
+    summary = {}
+    for url, entry in ledger.items():
+        counts = summary.setdefault(entry['status'], {'total': 0, 'due': 0})
+        counts['total'] += 1
+        counts['due'] += url in due
+    return summary
+
+# ==============================================================================
+# MAIN SCRIPT (show what the next preprocessor run would re-verify)
+# ==============================================================================
+if __name__ == '__main__':
+    ledger = load_ledger()
+    for status, counts in sorted(schedule_summary(ledger).items()):
+        print(f"{status:<12} {counts['total']:6d} URLs, {counts['due']:6d} due for re-verification")
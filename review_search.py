@@ -0,0 +1,407 @@
+import os
+import re
+import time
+import asyncio
+import datetime
+import aiohttp
+from dataset_store import DATE_FORMAT
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+# The reviews page loads its results from this GraphQL API; the search box and 'loadMore'
+# only send 'searchText' and the 'after' page token. Override both for a stand-in server.
+GRAPHQL_ENDPOINT = os.environ.get('GOODREADS_GRAPHQL_ENDPOINT', 'https://kxbwmqov6jgg3daaamb744ycu4.appsync-api.us-east-1.amazonaws.com/graphql')
+GRAPHQL_API_KEY = os.environ.get('GOODREADS_GRAPHQL_API_KEY') # None: read from the book page
+PAGE_SIZE = 30
+MAX_CONNECTIONS = 20 # pooled keep-alive connections shared by all concurrent searches
+MAX_CONCURRENT_BOOKS = 10
+PAGE_CACHE_SIZE = 2 * MAX_CONCURRENT_BOOKS # book pages kept for metadata after the review search
+REQUEST_TIMEOUT = 20
+MAX_RETRIES = 3
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
+
+WORK_ID_PATTERN = re.compile(r'kca://work/[A-Za-z0-9.\-]+')
+API_KEY_PATTERN = re.compile(r'"(da2-[a-z0-9]{26})"')
+NEXT_DATA_PATTERN = re.compile(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', re.S)
+
+REVIEWS_QUERY = """
+query getReviews($filters: BookReviewsFilterInput!, $pagination: PaginationInput) {
+  getReviews(filters: $filters, pagination: $pagination) {
+    totalCount
+    edges { node { id legacyId text rating createdAt } }
+    pageInfo { nextPageToken }
+  }
+}
+"""
+
+class ReviewSearchError(Exception):
+    """The backend cannot search this book (e.g. no work ID or API key on the page)."""
+
+# ==============================================================================
+# BACKEND INTERFACE
+# ==============================================================================
+class ReviewSearchBackend:
+    """
+    'Search the reviews of book X for keyword K, page through the results.'
+    search() returns (reviews, next_token); reviews are dicts with review_id, date, html
+    and stars (the same fields the scraper reads from a ReviewCard); next_token is None
+    on the last page. A token can be stored in a checkpoint and passed back later.
+    """
+    name = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def search(self, book_url, keyword, page_token=None):
+        raise NotImplementedError
+
+    async def book_page(self, book_url):
+        """HTML of the book page (for metadata and the book registry)."""
+        raise NotImplementedError
+
+    async def has_match(self, book_url, keyword):
+        """True if the first result page has a review whose text really contains the keyword."""
+        from grscraper import process_and_truncate_context
+        reviews, _ = await self.search(book_url, keyword)
+        return any(process_and_truncate_context(review['html'], keyword) is not None for review in reviews)
+
+    def review_count(self, book_url):
+        """The book's total review count if the backend already has its page (no extra request), else None."""
+        return None
+
+# ==============================================================================
+# HTTP/JSON BACKEND (default)
+# ==============================================================================
+class HttpReviewSearch(ReviewSearchBackend):
+    """
+    Calls the GraphQL API directly over one pooled aiohttp session. The book page is
+    fetched once per book to resolve its work ID (and the public API key if none is
+    configured); every result page after that is a single small JSON request.
+    """
+    name = 'http'
+
+    def __init__(self, endpoint=GRAPHQL_ENDPOINT, api_key=GRAPHQL_API_KEY, base_url=None,
+                 max_connections=MAX_CONNECTIONS, page_size=PAGE_SIZE):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.base_url = base_url # e.g. 'http://127.0.0.1:8765' to send book page requests to a stand-in
+        self.max_connections = max_connections
+        self.page_size = page_size
+        self.session = None
+        self._pages = {}
+        self._work_ids = {}
+        self.requests = 0
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT},
+                                             timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def page_url(self, book_url):
+        book_url = book_url.split('?')[0].replace('/reviews', '')
+        return re.sub(r'^https?://[^/]+', self.base_url, book_url) if self.base_url else book_url
+
+    async def _request(self, method, url, **kwargs):
+        for attempt in range(MAX_RETRIES):
+            try:
+                self.requests += 1
+                async with self.session.request(method, url, **kwargs) as response:
+                    if response.status == 200:
+                        return await (response.json(content_type=None) if method == 'POST' else response.text())
+                    if response.status not in (429, 500, 502, 503, 504):
+                        raise ReviewSearchError(f"HTTP {response.status} for {url}")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == MAX_RETRIES - 1:
+                    raise
+            await asyncio.sleep(2 ** attempt)
+        raise ReviewSearchError(f"Giving up on {url} after {MAX_RETRIES} attempts")
+
+    async def book_page(self, book_url):
+        url = self.page_url(book_url)
+        if url not in self._pages:
+            self._pages[url] = await self._request('GET', url)
+            while len(self._pages) > PAGE_CACHE_SIZE:
+                self._pages.pop(next(iter(self._pages)))
+        return self._pages[url]
+
+    def review_count(self, book_url):
+        from book_registry import review_count_from_html
+        html = self._pages.get(self.page_url(book_url))
+        return review_count_from_html(html) if html else None
+
+    async def resolve(self, book_url):
+        """(work_id, api_key) of a book, both read from its page (once per book)."""
+        url = self.page_url(book_url)
+        if url in self._work_ids and self.api_key:
+            return self._work_ids[url], self.api_key
+        html = await self.book_page(book_url)
+        next_data = NEXT_DATA_PATTERN.search(html)
+        work_match = WORK_ID_PATTERN.search(next_data.group(1) if next_data else html)
+        if not work_match:
+            raise ReviewSearchError(f"No work ID on the page of {book_url}")
+        self._work_ids[url] = work_match.group(0)
+        api_key = self.api_key
+        if not api_key:
+            key_match = API_KEY_PATTERN.search(html)
+            if not key_match:
+                raise ReviewSearchError("No GraphQL API key configured or found on the page")
+            api_key = self.api_key = key_match.group(1)
+        return work_match.group(0), api_key
+
+    async def search(self, book_url, keyword, page_token=None):
+        work_id, api_key = await self.resolve(book_url)
+        pagination = {'limit': self.page_size}
+        if page_token:
+            pagination['after'] = page_token
+        payload = {'operationName': 'getReviews', 'query': REVIEWS_QUERY, 'variables': {
+            'filters': {'resourceType': 'WORK', 'resourceId': work_id, 'searchText': keyword},
+            'pagination': pagination}}
+        data = await self._request('POST', self.endpoint, json=payload, headers={'x-api-key': api_key})
+        if data.get('errors'):
+            raise ReviewSearchError(data['errors'][0].get('message', 'GraphQL error'))
+        result = data['data']['getReviews']
+        reviews = [review_from_node(edge['node']) for edge in result.get('edges') or []]
+        return reviews, (result.get('pageInfo') or {}).get('nextPageToken')
+
+def review_from_node(node):
+    """GraphQL review node -> the fields a ReviewCard shows (review URL, display date, HTML text, stars)."""
+    review_id = f"https://www.goodreads.com/review/show/{node['legacyId']}" if node.get('legacyId') else node['id']
+    created = node.get('createdAt')
+    date = datetime.datetime.fromtimestamp(created / 1000, datetime.timezone.utc).strftime(DATE_FORMAT) if created else None
+    return {'review_id': review_id, 'date': date, 'html': node.get('text'),
+            'stars': str(node['rating']) if node.get('rating') else "Not rated"}
+
+# ==============================================================================
+# SELENIUM BACKEND (fallback)
+# ==============================================================================
+class SeleniumReviewSearch(ReviewSearchBackend):
+    """
+    The browser workflow of grscraper behind the same interface: one Chrome per instance,
+    driven in a worker thread. The page token is the number of pages loaded so far, so a
+    stored token is resumed by clicking 'loadMore' up to it.
+    """
+    name = 'selenium'
+
+    def __init__(self, headless=True):
+        self.headless = headless
+        self.driver = None
+        self._current = None # (book_url, keyword, pages loaded, review IDs seen)
+
+    async def open(self):
+        await asyncio.to_thread(self._start)
+
+    def _start(self):
+        from selenium import webdriver
+        options = webdriver.ChromeOptions()
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_argument(f"user-agent={USER_AGENT}")
+        if self.headless:
+            options.add_argument("--headless")
+        options.add_argument("--window-size=1920,1200")
+        self.driver = webdriver.Chrome(options=options)
+
+    async def close(self):
+        if self.driver is not None:
+            await asyncio.to_thread(self.driver.quit)
+
+    async def search(self, book_url, keyword, page_token=None):
+        return await asyncio.to_thread(self._search, book_url, keyword, int(page_token or 0))
+
+    async def book_page(self, book_url):
+        return await asyncio.to_thread(self._book_page, book_url)
+
+    def _book_page(self, book_url):
+        self._current = None
+        self.driver.get(book_url.split('?')[0].replace('/reviews', ''))
+        return self.driver.page_source
+
+    def _search(self, book_url, keyword, pages_returned):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        from grscraper import handle_popups, click_load_more
+        wait = WebDriverWait(self.driver, 15)
+        if self._current and self._current[:3] == (book_url, keyword, pages_returned):
+            pages, seen = self._current[2], self._current[3]
+        else:
+            # New search, or a token from a checkpoint: search again, then fast-forward below
+            reviews_url = book_url if '/reviews' in book_url else book_url.split('?')[0] + '/reviews'
+            self.driver.get(reviews_url)
+            handle_popups(self.driver)
+            search_box = wait.until(EC.presence_of_element_located((By.XPATH, "//input[@placeholder='Search review text']")))
+            self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", search_box)
+            search_box.clear()
+            search_box.send_keys(keyword + Keys.RETURN)
+            time.sleep(1.5)
+            try:
+                WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "article.ReviewCard")))
+            except TimeoutException:
+                self._current = None
+                return [], None
+            pages, seen = 1, set()
+        try:
+            while pages < pages_returned + 1:
+                click_load_more(self.driver, wait, settle_seconds=1.5)
+                pages += 1
+        except TimeoutException:
+            self._current = None
+            return [], None
+        for button in self.driver.find_elements(By.XPATH, ".//button[span[text()='Show more']]"):
+            try: self.driver.execute_script("arguments[0].click();", button)
+            except Exception: pass
+        reviews = []
+        for card in self.driver.find_elements(By.CSS_SELECTOR, "article.ReviewCard"):
+            try:
+                link = card.find_element(By.XPATH, ".//a[contains(@href, '/review/show/')]")
+                review_id = link.get_attribute('href')
+                if review_id in seen:
+                    continue
+                seen.add(review_id)
+                stars_elements = card.find_elements(By.CSS_SELECTOR, "span.RatingStars")
+                stars_match = re.search(r'\d+', stars_elements[0].get_attribute('aria-label') or '') if stars_elements else None
+                reviews.append({'review_id': review_id, 'date': link.text.strip(),
+                                'html': card.find_element(By.CSS_SELECTOR, "span.Formatted").get_attribute('innerHTML'),
+                                'stars': stars_match.group(0) if stars_match else "Not rated"})
+            except Exception:
+                continue
+        has_more = bool(self.driver.find_elements(By.XPATH, "//span[@data-testid='loadMore']"))
+        self._current = (book_url, keyword, pages, seen)
+        return reviews, pages if has_more else None
+
+def make_backend(name, **kwargs):
+    backends = {'http': HttpReviewSearch, 'selenium': SeleniumReviewSearch}
+    if name not in backends:
+        raise ValueError(f"Unknown review search backend '{name}' (choose from {', '.join(backends)})")
+    return backends[name](**kwargs)
+
+# ==============================================================================
+# SCRAPER OPERATIONS ON TOP OF A BACKEND
+# ==============================================================================
+async def collect_reviews(backend, reviews_url, book_name, keyword, checkpoint_path=None):
+    """
+    Pages through all keyword reviews of a book. Same contract and checkpoint file as
+    grscraper.scrape_goodreads_reviews: returns (reviews, 'complete' | 'partial'); the
+    checkpoint also stores the backend's next page token, so a retry resumes exactly there.
+    """
+    from grscraper import process_and_truncate_context, load_checkpoint, save_checkpoint, CHECKPOINT_EVERY_PAGES
+    checkpoint = load_checkpoint(checkpoint_path) or {}
+    if checkpoint.get('status') == 'complete':
+        return checkpoint.get('reviews', []), 'complete'
+    scraped_data = checkpoint.get('reviews', [])
+    scraped_review_ids = set(checkpoint.get('review_ids', []))
+    page_token = checkpoint.get('page_token') if checkpoint.get('backend') == backend.name else None
+    page_count = checkpoint.get('page_count', 0) if page_token else 0
+    checkpoint.update({'url': reviews_url, 'book_name': book_name, 'status': 'in_progress', 'backend': backend.name})
+    status = 'partial'
+    try:
+        while True:
+            reviews, page_token = await backend.search(reviews_url, keyword, page_token)
+            page_count += 1
+            for review in reviews:
+                if review['review_id'] in scraped_review_ids:
+                    continue
+                final_context = process_and_truncate_context(review['html'], keyword)
+                if final_context is None:
+                    continue
+                scraped_review_ids.add(review['review_id'])
+                checkpoint['last_review_id'] = review['review_id']
+                scraped_data.append({"book_name": book_name, "stars": review['stars'], "date": review['date'],
+                                     "context": final_context, "review_id": review['review_id']})
+            checkpoint.update({'page_count': page_count, 'page_token': page_token,
+                               'review_ids': sorted(scraped_review_ids), 'reviews': scraped_data})
+            if not page_token:
+                status = 'complete'
+                break
+            if page_count % CHECKPOINT_EVERY_PAGES == 0:
+                save_checkpoint(checkpoint_path, checkpoint)
+    except ReviewSearchError:
+        # The caller falls back to another backend, which resumes from this checkpoint
+        save_checkpoint(checkpoint_path, checkpoint)
+        raise
+    except Exception as e:
+        print(f"An unexpected critical error during review scraping for {book_name}: {type(e).__name__}")
+    checkpoint['status'] = status
+    save_checkpoint(checkpoint_path, checkpoint)
+    return scraped_data, status
+
+def metadata_from_html(html):
+    """The fields of grscraper.scrape_book_metadata, read from the server-rendered book page."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def text(selector):
+        element = soup.select_one(selector)
+        return element.get_text(strip=True) if element else None
+
+    authors = [e.get_text(strip=True) for e in soup.select("div.ContributorLinksList span.ContributorLink__name") if e.get_text(strip=True)]
+    reviews_link = soup.select_one("a[href*='#CommunityReviews']")
+    reviews_match = re.search(r'([\d,]+)\s+reviews', reviews_link.get_text(' ', strip=True)) if reviews_link else None
+    genres = [e.get_text(strip=True) for e in soup.select("div[data-testid='genresList'] a.Button--tag span.Button__labelItem")]
+    return {
+        'author': " | ".join(authors) if authors else "Not Found",
+        'avg_rating': text("div.RatingStatistics__rating") or "Not Found",
+        'total_reviews': reviews_match.group(1).replace(',', '') if reviews_match else "Not Found",
+        'release_date': (text("[data-testid='publicationInfo']") or "Not Found").replace('First published ', ''),
+        'genres': " | ".join(g for g in genres if g) or "Not Found",
+    }
+
+async def verify_url(backend, url, keyword='kafkaesque'):
+    """Same contract as preprocessor.worker_function: (status, url, review_count) or ('FAILURE', url, error_type)."""
+    try:
+        status = 'VALID_MATCH' if await backend.has_match(url, keyword) else 'NO_MATCH'
+        return (status, url, backend.review_count(url))
+    except Exception as e:
+        return ('FAILURE', url, type(e).__name__)
+
+async def process_book(backend, url, keyword='kafkaesque'):
+    """Backend counterpart of grscraper.process_single_book (same result dict). Raises ReviewSearchError."""
+    from grscraper import book_urls_and_name, book_result, get_checkpoint_path
+    from book_registry import parse_book_page
+    reviews_url, main_book_url, book_id, book_name = book_urls_and_name(url, os.getpid())
+    reviews, status = await collect_reviews(backend, reviews_url, book_name, keyword, get_checkpoint_path(main_book_url))
+    if reviews:
+        html = await backend.book_page(main_book_url)
+        return book_result(url, book_id, book_name, reviews, metadata_from_html(html), status, parse_book_page(html))
+    if status == 'partial':
+        return {'reviews_data': [], 'summary_data': None, 'status': status, 'url': url}
+    return None
+
+async def run_with_backend(items, task, backend_name='http', max_concurrent=MAX_CONCURRENT_BOOKS, on_result=None, **backend_kwargs):
+    """
+    Runs 'await task(backend, item)' for all items on one shared backend (one connection
+    pool), at most max_concurrent at a time. Exceptions are returned in place of results.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    async with make_backend(backend_name, **backend_kwargs) as backend:
+        async def run(item):
+            async with semaphore:
+                try:
+                    result = await task(backend, item)
+                except Exception as e:
+                    result = e
+            if on_result:
+                on_result(item, result)
+            return result
+        return await asyncio.gather(*(run(item) for item in items))
+
+def run_sync(items, task, backend_name='http', max_concurrent=MAX_CONCURRENT_BOOKS, on_result=None, **backend_kwargs):
+    """Blocking entry point for the (synchronous) scripts."""
+    return asyncio.run(run_with_backend(items, task, backend_name, max_concurrent, on_result, **backend_kwargs))
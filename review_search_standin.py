@@ -0,0 +1,216 @@
+import re
+import csv
+import json
+import time
+import random
+import threading
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+# A local stand-in for the Goodreads book page, reviews page and review GraphQL API,
+# so both review search backends can be run (and timed) without touching the live site.
+REVIEWS_FILENAME = 'goodreads_reviews_output.csv'
+SUMMARY_FILENAME = 'goodreads_book_summary.csv'
+STANDIN_API_KEY = 'da2-standinstandinstandinstand'
+LATENCY_S = 0.05 # simulated network latency per request
+FILLER_REVIEWS_PER_BOOK = 60 # reviews without the keyword, so the search filter has something to drop
+DEFAULT_PAGE_SIZE = 30
+
+FILLER_TEXT = "A slow start, but the second half makes up for it. The characters stay with you for a long time afterwards."
+
+# ==============================================================================
+# FIXTURE (books + reviews from the scraper's own CSV output)
+# ==============================================================================
+def load_fixture(reviews_filename=REVIEWS_FILENAME, summary_filename=SUMMARY_FILENAME, max_books=None, seed=42):
+    """{book_id: {'name', 'author', ..., 'reviews': [node, ...]}} with synthetic IDs and timestamps."""
+    rng = random.Random(seed)
+    with open(summary_filename, 'r', encoding='utf-8') as f:
+        summaries = {row['book_name']: row for row in csv.DictReader(f)}
+    books, ids_by_name = {}, {}
+    with open(reviews_filename, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            name = row['book_name']
+            if name not in ids_by_name:
+                if max_books and len(ids_by_name) >= max_books:
+                    continue
+                ids_by_name[name] = 1000 + len(ids_by_name)
+                books[ids_by_name[name]] = {'name': name, 'summary': summaries.get(name, {}), 'reviews': []}
+            books[ids_by_name[name]]['reviews'].append(row)
+    review_id = 5000000
+    for book in books.values():
+        rows = book['reviews'] + [{'stars': str(rng.randint(1, 5)), 'context': FILLER_TEXT}] * FILLER_REVIEWS_PER_BOOK
+        rng.shuffle(rows)
+        book['reviews'] = []
+        for row in rows:
+            review_id += 1
+            book['reviews'].append({'id': f'kca://review/standin.{review_id}', 'legacyId': str(review_id),
+                                    'text': escape(row['context'] or ''), 'rating': int(row['stars']) if str(row.get('stars')).isdigit() else 0,
+                                    'createdAt': rng.randint(1_200_000_000, 1_700_000_000) * 1000})
+    return books
+
+def slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'book'
+
+# ==============================================================================
+# PAGES
+# ==============================================================================
+REVIEWS_PAGE_SCRIPT = """
+<input placeholder="Search review text">
+<div id="results"></div>
+<script>
+let query = '', after = null;
+async function loadPage() {
+  const response = await fetch('/graphql', {method: 'POST', headers: {'Content-Type': 'application/json', 'x-api-key': API_KEY},
+    body: JSON.stringify({variables: {filters: {resourceType: 'WORK', resourceId: WORK_ID, searchText: query},
+                                      pagination: {limit: PAGE_SIZE, after: after}}})});
+  const result = (await response.json()).data.getReviews;
+  const container = document.getElementById('results');
+  document.querySelectorAll('#more').forEach(b => b.remove());
+  for (const edge of result.edges) {
+    const node = edge.node;
+    const card = document.createElement('article');
+    card.className = 'ReviewCard';
+    const stars = node.rating ? `<span class="RatingStars" aria-label="Rating ${node.rating} out of 5"></span>` : '';
+    card.innerHTML = `${stars}<a href="https://www.goodreads.com/review/show/${node.legacyId}">${node.displayDate}</a>` +
+                     `<span class="Formatted">${node.text}</span>`;
+    container.appendChild(card);
+  }
+  after = result.pageInfo.nextPageToken;
+  if (after) {
+    const more = document.createElement('button');
+    more.id = 'more';
+    more.innerHTML = '<span data-testid="loadMore">Show more reviews</span>';
+    more.onclick = loadPage;
+    container.after(more);
+  }
+}
+document.querySelector('input').addEventListener('keydown', e => {
+  if (e.key === 'Enter') { query = e.target.value; after = null; document.getElementById('results').innerHTML = ''; loadPage(); }
+});
+</script>
+"""
+
+def book_page(book_id, book, reviews_page=False):
+    summary = book['summary']
+    work_id = f'kca://work/amzn1.gr.work.v1.standin{book_id}'
+    next_data = json.dumps({'props': {'pageProps': {'apolloState': {'Book': {'work': {'__ref': f'Work:{work_id}'}}}}},
+                            'runtimeConfig': {'graphql': {'apiKey': STANDIN_API_KEY}}})
+    json_ld = json.dumps({'@type': 'Book', 'name': book['name'],
+                          'author': [{'name': a.strip()} for a in summary.get('author', '').split('|') if a.strip()],
+                          'aggregateRating': {'reviewCount': summary.get('total_reviews') or 0}})
+    authors = ''.join(f'<span class="ContributorLink__name">{escape(a.strip())}</span>'
+                      for a in summary.get('author', '').split('|') if a.strip())
+    genres = ''.join(f'<a class="Button--tag"><span class="Button__labelItem">{escape(g.strip())}</span></a>'
+                     for g in summary.get('genres', '').split('|') if g.strip())
+    body = f"""
+<div class="BookPage__mainContent">
+  <div class="ContributorLinksList">{authors}</div>
+  <div class="RatingStatistics__rating">{escape(summary.get('avg_rating', ''))}</div>
+  <a href="#CommunityReviews">{summary.get('total_reviews', '0')} reviews</a>
+  <p data-testid="publicationInfo">First published {escape(summary.get('release_date', ''))}</p>
+  <div data-testid="genresList">{genres}</div>
+</div>"""
+    if reviews_page:
+        body += REVIEWS_PAGE_SCRIPT.replace('API_KEY', json.dumps(STANDIN_API_KEY)).replace(
+            'WORK_ID', json.dumps(work_id)).replace('PAGE_SIZE', str(DEFAULT_PAGE_SIZE))
+    return f"""<html><head>
+<meta property="og:url" content="https://www.goodreads.com/book/show/{book_id}.{slug(book['name'])}">
+<meta property="og:title" content="{escape(book['name'])}">
+<script type="application/ld+json">{json_ld}</script>
+</head><body>{body}
+<script id="__NEXT_DATA__" type="application/json">{next_data}</script>
+</body></html>"""
+
+def search_reviews(book, search_text, after=None, limit=DEFAULT_PAGE_SIZE):
+    """GraphQL getReviews: case-insensitive text filter, page token = offset."""
+    matches = [node for node in book['reviews'] if (search_text or '').lower() in node['text'].lower()]
+    start = int(after or 0)
+    page = matches[start:start + limit]
+    edges = [{'node': dict(node, displayDate=time.strftime('%B %d, %Y', time.gmtime(node['createdAt'] / 1000)))} for node in page]
+    next_token = str(start + limit) if start + limit < len(matches) else None
+    return {'data': {'getReviews': {'totalCount': len(matches), 'edges': edges, 'pageInfo': {'nextPageToken': next_token}}}}
+
+# ==============================================================================
+# SERVER
+# ==============================================================================
+class StandInServer:
+    """ThreadingHTTPServer in a background thread. Use as a context manager; .book_urls lists the books."""
+
+    def __init__(self, books=None, port=0, latency=LATENCY_S):
+        self.books = books if books is not None else load_fixture()
+        self.latency = latency
+        self.stats = {'GET': 0, 'POST': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"{self.base_url}/graphql"
+
+    @property
+    def book_urls(self):
+        return [f"{self.base_url}/book/show/{book_id}.{slug(book['name'])}" for book_id, book in self.books.items()]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                standin.stats['GET'] += 1
+                time.sleep(standin.latency)
+                match = re.match(r'^/book/show/(\d+)[^/]*(/reviews)?', self.path)
+                book = standin.books.get(int(match.group(1))) if match else None
+                if not book:
+                    return self._send(404, 'Not found', 'text/plain')
+                self._send(200, book_page(int(match.group(1)), book, bool(match.group(2))), 'text/html; charset=utf-8')
+
+            def do_POST(self):
+                standin.stats['POST'] += 1
+                time.sleep(standin.latency)
+                if self.path != '/graphql' or self.headers.get('x-api-key') != STANDIN_API_KEY:
+                    return self._send(403, json.dumps({'errors': [{'message': 'Forbidden'}]}), 'application/json')
+                variables = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0)))).get('variables', {})
+                filters, pagination = variables.get('filters', {}), variables.get('pagination') or {}
+                book_match = re.search(r'standin(\d+)$', filters.get('resourceId', ''))
+                book = standin.books.get(int(book_match.group(1))) if book_match else None
+                if not book:
+                    return self._send(200, json.dumps({'errors': [{'message': 'Unknown work'}]}), 'application/json')
+                result = search_reviews(book, filters.get('searchText'), pagination.get('after'), pagination.get('limit', DEFAULT_PAGE_SIZE))
+                self._send(200, json.dumps(result), 'application/json')
+
+        return Handler
+
+# ==============================================================================
+# MAIN SCRIPT (serve until Ctrl+C)
+# ==============================================================================
+if __name__ == '__main__':
+    with StandInServer(port=8765) as standin:
+        print(f"Stand-in serving {len(standin.books)} books at {standin.base_url} (GraphQL: {standin.endpoint})")
+        print(f"Example: {standin.book_urls[0]}/reviews")
+        try:
+            standin.thread.join()
+        except KeyboardInterrupt:
+            pass
@@ -1,7 +1,9 @@
 import pandas as pd
+import numpy as np
 import re
-import warnings
-import os
+from concurrent.futures import ProcessPoolExecutor
+from dataset_store import iter_table_batches, write_table, export_table, CSV_EXPORTS
+from book_registry import load_registry, resolve_placeholder_names
 
 # ==============================================================================
 # CONFIGURATION
@@ -13,6 +15,21 @@ REVIEWS_FILENAME_INPUT = 'goodreads_reviews_output.csv'
 SUMMARY_FILENAME_OUTPUT = 'goodreads_book_summary_corrected.csv'
 REVIEWS_FILENAME_OUTPUT = 'goodreads_reviews_output_corrected.csv'
 
+# --- Dataset tables (Parquet). The CSVs above are the legacy import source / export target ---
+SUMMARY_TABLE_INPUT = 'summary'
+REVIEWS_TABLE_INPUT = 'reviews'
+SUMMARY_TABLE_OUTPUT = 'summary_corrected'
+REVIEWS_TABLE_OUTPUT = 'reviews_corrected'
+
+# Rows per chunk when streaming large tables
+CHUNK_SIZE = 200000
+
+# --- Precompiled patterns (shared by the scalar and the vectorized path) ---
+URL_PATTERN = re.compile(r'(https?://[^\s]+)')
+NAME_PATTERN = re.compile(r'/show/\d+[\.\-]([^/?]+)')
+ID_PATTERN = re.compile(r'/show/(\d+)')
+BAD_NAME_PATTERN = re.compile(r'[/_]|^(?:Unknown_Book_From_|URL_ID_)')
+
 # ==============================================================================
 # HELPER FUNCTION (Unchanged)
 # ==============================================================================
@@ -23,99 +40,124 @@ def extract_name_from_url(book_name_or_url):
     if not isinstance(book_name_or_url, str):
         return book_name_or_url
 
-    url_match = re.search(r'(https?://[^\s]+)', book_name_or_url)
+    url_match = URL_PATTERN.search(book_name_or_url)
     url_to_parse = url_match.group(1) if url_match else book_name_or_url
 
-    name_match = re.search(r'/show/\d+[\.\-]([^/?]+)', url_to_parse)
+    name_match = NAME_PATTERN.search(url_to_parse)
     if name_match:
         return name_match.group(1).replace('_', ' ').replace('-', ' ')
 
-    id_match = re.search(r'/show/(\d+)', url_to_parse)
+    id_match = ID_PATTERN.search(url_to_parse)
     if id_match:
         return f"Book_ID_{id_match.group(1)}"
         
     return book_name_or_url
 
 # ==============================================================================
-# EFFICIENT "FIXER" FUNCTION (Unchanged)
+# VECTORIZED "FIXER" FUNCTIONS
 # ==============================================================================
+def extract_names_vectorized(values):
+    """
+    Vectorized extract_name_from_url over a Series of (unique) strings:
+    the same three patterns, applied column-wise with str.extract.
+    """
+    values = values.astype('string')
+    url = values.str.extract(URL_PATTERN, expand=False).fillna(values)
+    name = url.str.extract(NAME_PATTERN, expand=False).str.replace(r'[_-]', ' ', regex=True)
+    book_id = url.str.extract(ID_PATTERN, expand=False)
+    return name.fillna('Book_ID_' + book_id).fillna(values)
+
+def fix_names_frame(df, column='book_name', verbose=True, registry=None):
+    """
+    Corrects implausible book names. Only the unique category values are inspected and
+    fixed; the result is mapped back to every row through the categorical codes.
+    Placeholders left over ('Book_ID_<id>', 'URL_ID_<n>') are then resolved through the
+    book registry (see book_registry.py), if one is given.
+    Returns (df, number of corrected rows).
+    """
+    df, num_fixed = _fix_names_by_pattern(df, column, verbose)
+    df, num_resolved = resolve_placeholder_names(df, registry, column)
+    if num_resolved:
+        df[column] = df[column].astype('category')
+        if verbose:
+            print(f"Resolved {num_resolved} placeholder names through the book registry.")
+    return df, num_fixed + num_resolved
+
+def _fix_names_by_pattern(df, column, verbose):
+    categorical = df[column].astype('string').astype('category')
+    categories = categorical.cat.categories.to_series(index=None).astype('string')
+    is_bad = categories.str.contains(BAD_NAME_PATTERN, na=False).values
+    if not is_bad.any():
+        if verbose:
+            print("No incorrect names found based on plausibility check.")
+        return df, 0
+    if verbose:
+        print(f"Found {int(is_bad.sum())} unique incorrect book names to correct.")
+
+    fixed_categories = categories.to_numpy(dtype=object, na_value=None).copy()
+    fixed_categories[is_bad] = extract_names_vectorized(categories[is_bad]).to_numpy(dtype=object, na_value=None)
+    codes = categorical.cat.codes.to_numpy()
+    num_fixed = int(np.isin(codes, np.flatnonzero(is_bad)).sum())
+    # Codes -1 (missing values) stay missing
+    fixed_values = np.where(codes >= 0, fixed_categories[np.maximum(codes, 0)], None)
+    df[column] = pd.Series(fixed_values, index=df.index, dtype='string').astype('category')
+    if verbose:
+        print("Correction complete.")
+    return df, num_fixed
+
 def efficient_fix_names(df):
     """
     Finds unique incorrect names using a robust heuristic, creates a correction map, and applies it.
+    (Kept for existing callers; delegates to the vectorized fix_names_frame.)
     """
-    bad_name_pattern = r'[/_]|^(Unknown_Book_From_|URL_ID_)'
-    
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", UserWarning)
-        incorrect_rows = df[df['book_name'].astype(str).str.contains(bad_name_pattern, na=False)]
-    
-    if incorrect_rows.empty:
-        print("No incorrect names found based on plausibility check.")
-        return df, 0
-        
-    unique_incorrect_names = incorrect_rows['book_name'].unique()
-    
-    print(f"Found {len(unique_incorrect_names)} unique incorrect book names to correct.")
-    
-    correction_map = {
-        bad_name: extract_name_from_url(bad_name)
-        for bad_name in unique_incorrect_names
-    }
-    
-    df['book_name'] = df['book_name'].replace(correction_map)
-    
-    print("Correction complete.")
-    return df, len(incorrect_rows)
+    return fix_names_frame(df, registry=load_registry())
 
-# ==============================================================================
-# MAIN SCRIPT (With Safe Saving)
-# ==============================================================================
-if __name__ == '__main__':
-    print("--- Starting Definitive Goodreads CSV Name Corrector (V5 - Safe Save) ---")
+def fix_table_streaming(table_input, table_output, csv_fallback, chunk_size=CHUNK_SIZE):
+    """
+    Streams a table chunk by chunk, fixes the names and appends each chunk to the
+    output table, so the whole file is never in memory. Returns the number of fixed rows.
+    """
+    total_fixed = total_rows = 0
+    registry = load_registry()
+    for i, chunk in enumerate(iter_table_batches(table_input, batch_size=chunk_size, csv_fallback=csv_fallback)):
+        chunk, num_fixed = fix_names_frame(chunk, verbose=False, registry=registry)
+        write_table(table_output, chunk, mode='overwrite' if i == 0 else 'append', export_csv=False)
+        total_fixed += num_fixed
+        total_rows += len(chunk)
+    if total_rows and table_output in CSV_EXPORTS:
+        export_table(table_output, CSV_EXPORTS[table_output])
+    print(f"'{table_input}': {total_rows} rows processed, {total_fixed} corrected -> table '{table_output}'.")
+    return total_fixed
 
-    # --- FIX THE SUMMARY FILE ---
+def _fix_job(args):
+    label, table_input, table_output, csv_fallback = args
     try:
-        print(f"\nProcessing summary file: '{SUMMARY_FILENAME_INPUT}'...")
-        if not os.path.exists(SUMMARY_FILENAME_INPUT):
-            raise FileNotFoundError(f"Input file not found: {SUMMARY_FILENAME_INPUT}")
-            
-        summary_df = pd.read_csv(SUMMARY_FILENAME_INPUT)
-        
-        corrected_summary_df, num_fixed = efficient_fix_names(summary_df)
-        
-        if num_fixed > 0:
-            # --- MODIFIED: Save to a NEW file ---
-            corrected_summary_df.to_csv(SUMMARY_FILENAME_OUTPUT, index=False, encoding='utf-8')
-            print(f"SUCCESS: Corrected {num_fixed} rows. NEW file saved to '{SUMMARY_FILENAME_OUTPUT}'.")
-        else:
-            print("No changes were needed for the summary file.")
-
+        return label, fix_table_streaming(table_input, table_output, csv_fallback), None
     except FileNotFoundError as e:
-        print(f"WARNING: {e}. Skipping.")
+        return label, 0, f"WARNING: {e}. Skipping."
     except Exception as e:
-        print(f"An error occurred while processing the summary file: {e}")
-
-    # --- FIX THE REVIEWS FILE ---
-    try:
-        print(f"\nProcessing reviews file: '{REVIEWS_FILENAME_INPUT}'...")
-        if not os.path.exists(REVIEWS_FILENAME_INPUT):
-            raise FileNotFoundError(f"Input file not found: {REVIEWS_FILENAME_INPUT}")
+        return label, 0, f"An error occurred while processing the {label} file: {e}"
 
-        reviews_df = pd.read_csv(REVIEWS_FILENAME_INPUT)
-        
-        corrected_reviews_df, num_fixed = efficient_fix_names(reviews_df)
-        
-        if num_fixed > 0:
-            # --- MODIFIED: Save to a NEW file ---
-            corrected_reviews_df.to_csv(REVIEWS_FILENAME_OUTPUT, index=False, encoding='utf-8')
-            print(f"SUCCESS: Corrected {num_fixed} rows. NEW file saved to '{REVIEWS_FILENAME_OUTPUT}'.")
-        else:
-            print("No changes were needed for the reviews file.")
+# ==============================================================================
+# MAIN SCRIPT (With Safe Saving)
+# ==============================================================================
+if __name__ == '__main__':
+    print("--- Starting Definitive Goodreads Name Corrector (V6 - Vectorized, Streaming) ---")
 
-    except FileNotFoundError as e:
-        print(f"WARNING: {e}. Skipping.")
-    except Exception as e:
-        print(f"An error occurred while processing the reviews file: {e}")
+    # --- FIX THE SUMMARY AND REVIEWS TABLES IN PARALLEL ---
+    # Each output is a NEW table (+ '_corrected.csv' export); the inputs are never modified.
+    jobs = [
+        ('summary', SUMMARY_TABLE_INPUT, SUMMARY_TABLE_OUTPUT, SUMMARY_FILENAME_INPUT),
+        ('reviews', REVIEWS_TABLE_INPUT, REVIEWS_TABLE_OUTPUT, REVIEWS_FILENAME_INPUT),
+    ]
+    with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+        for label, num_fixed, message in executor.map(_fix_job, jobs):
+            if message:
+                print(message)
+            elif num_fixed > 0:
+                print(f"SUCCESS: Corrected {num_fixed} rows in the {label} table.")
+            else:
+                print(f"No changes were needed for the {label} file.")
         
     print("\n--- Correction process finished. ---")
-    print("Please check the new '_corrected.csv' files for the results.")
\ No newline at end of file
+    print("Please check the new '_corrected.csv' files for the results.")
@@ -0,0 +1,215 @@
+# rollup_cube.py
+#
+# Vorberechneter Rollup-Würfel über die englischen Reviews + Buch-Metadaten. Feinste
+# Körnung: Buch x Autoren-Typ x Monat x Sterne, Kennzahlen additiv (Anzahl, Anzahl
+# bewertet, Sternesumme). Genres hängen am Buch (mehrere pro Buch) und werden erst bei
+# einer Abfrage über 'genre' dazugenommen, damit nichts doppelt gezählt wird.
+# Neue Reviews werden als eigener Parquet-Teil angehängt; Abfragen summieren die Teile.
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from entity_scrubber import text_hash
+from dataset_store import (read_table, write_table, iter_table_batches, table_exists, table_path, DATASET_DIR)
+from book_registry import load_registry
+from final_analyzer_sbert_umap_cpca import (
+    join_metadata, stage_prepare, REVIEWS_TABLE, SUMMARY_TABLE, REVIEWS_FILENAME, SUMMARY_FILENAME, SPLIT_DATE
+)
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+CUBE_TABLE = 'rollup_cube'
+BOOK_GENRES_TABLE = 'rollup_book_genres'
+CUBE_STATE_FILENAME = os.path.join(DATASET_DIR, 'rollup_cube_state.json') # bereits gezählte Reviews
+DIMENSIONS = ['book_id', 'book_name', 'author', 'author_type', 'month', 'stars']
+MEASURES = ['n_reviews', 'n_rated', 'stars_sum']
+DERIVED = {'year': lambda cube: cube['month'].str[:4]} # aus gespeicherten Dimensionen abgeleitet
+MAX_PARTS = 20 # mehr angehängte Teile -> einmal zu einem Teil verdichten
+BATCH_SIZE = 100000
+
+# ==============================================================================
+# AUFBAU (inkrementell)
+# ==============================================================================
+def review_keys(df):
+    """review_id, falls vorhanden; sonst Hash aus Buch, Datum und Text."""
+    fallback = (df['book_name'].astype(str) + '\x00' + df['date'].astype(str) + '\x00' + df['context'].astype(str)).map(text_hash)
+    if 'review_id' not in df.columns:
+        return fallback
+    return df['review_id'].astype(object).where(df['review_id'].notna(), fallback).astype(str)
+
+def aggregate(df):
+    """Reviews (nach stage_prepare) -> Zeilen des Würfels in feinster Körnung."""
+    cube = pd.DataFrame({
+        'book_id': df['book_id'].astype('Int64'),
+        'book_name': df['book_name'].astype(str),
+        'author': df['author'].astype(str),
+        'author_type': df['is_kafka_author'].astype(str),
+        'month': df['date'].dt.strftime('%Y-%m'),
+        'stars': pd.to_numeric(df['stars'], errors='coerce').astype('Int8'),
+    })
+    cube['n_reviews'] = 1
+    cube['n_rated'] = cube['stars'].notna().astype(int)
+    cube['stars_sum'] = cube['stars'].fillna(0).astype(int)
+    return cube.groupby(DIMENSIONS, dropna=False, observed=True)[MEASURES].sum().reset_index()
+
+def book_genres(df):
+    """Eine Zeile pro (Buch, Genre) für die Buch-Namen des Würfels."""
+    genres = df[['book_name', 'genres']].drop_duplicates(subset=['book_name']) if 'genres' in df.columns else pd.DataFrame(columns=['book_name', 'genres'])
+    genres = genres.assign(book_name=genres['book_name'].astype(str)).explode('genres').dropna(subset=['genres'])
+    return genres.rename(columns={'genres': 'genre'})[['book_name', 'genre']]
+
+def load_state(filename=CUBE_STATE_FILENAME):
+    if not os.path.exists(filename) or not table_exists(CUBE_TABLE):
+        return set()
+    with open(filename, 'r', encoding='utf-8') as f:
+        return set(json.load(f)['seen'])
+
+def save_state(seen, filename=CUBE_STATE_FILENAME):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'seen': sorted(seen)}, f)
+    os.replace(filename + '.tmp', filename)
+
+def compact(table=CUBE_TABLE):
+    """
+    Fasst alle angehängten Teile zu einem zusammen (gleiche Schlüssel werden summiert).
+    Der neue Teil wird vollständig geschrieben, bevor die alten gelöscht werden; dabei
+    darf sich keine Summe ändern.
+    """
+    cube = read_table(table)
+    merged = cube.groupby(DIMENSIONS, dropna=False, observed=True)[MEASURES].sum().reset_index()
+    if merged['n_reviews'].sum() != cube['n_reviews'].sum():
+        raise RuntimeError("Verdichtung würde Reviews verlieren. Abgebrochen.")
+    write_table(table, merged, mode='overwrite', export_csv=False)
+    return len(merged)
+
+def update_cube(reviews_table=REVIEWS_TABLE, summary_table=SUMMARY_TABLE, batch_size=BATCH_SIZE, rebuild=False):
+    """
+    Streamt die Reviews und hängt nur die noch nicht gezählten als neuen Teil an den
+    Würfel an. Die Genre-Zuordnung der Bücher wird bei jedem Lauf neu geschrieben.
+    """
+    seen = set() if rebuild else load_state()
+    summary_df = read_table(summary_table, columns=['book_id', 'book_name', 'author', 'genres'], csv_fallback=SUMMARY_FILENAME)
+    registry = load_registry()
+    new_parts, genre_parts = [], []
+    total = 0
+    for batch in iter_table_batches(reviews_table, batch_size=batch_size, csv_fallback=REVIEWS_FILENAME):
+        df = stage_prepare(join_metadata(batch, summary_df, registry), SPLIT_DATE)
+        genre_parts.append(book_genres(df))
+        keys = review_keys(df)
+        new = (~keys.isin(seen) & ~keys.duplicated()).values
+        if new.any():
+            new_parts.append(aggregate(df[new]))
+            seen.update(keys[new].tolist())
+        total += len(df)
+    added = int(sum(part['n_reviews'].sum() for part in new_parts))
+    if new_parts:
+        cube = pd.concat(new_parts, ignore_index=True)
+        cube = cube.groupby(DIMENSIONS, dropna=False, observed=True)[MEASURES].sum().reset_index()
+        part_filename = write_table(CUBE_TABLE, cube, mode='overwrite' if rebuild else 'append', export_csv=False)
+        # Die Reviews gelten erst als gezählt, wenn ihr Teil auf der Platte liegt
+        if not os.path.exists(part_filename):
+            raise RuntimeError(f"Rollup-Teil '{part_filename}' wurde nicht geschrieben.")
+        save_state(seen)
+    if genre_parts:
+        write_table(BOOK_GENRES_TABLE, pd.concat(genre_parts, ignore_index=True).drop_duplicates(), export_csv=False)
+    n_parts = len([f for f in os.listdir(table_path(CUBE_TABLE)) if f.endswith('.parquet')]) if table_exists(CUBE_TABLE) else 0
+    if n_parts > MAX_PARTS:
+        print(f"Rollup-Würfel: {n_parts} Teile, verdichte zu einem ({compact()} Zeilen).")
+    print(f"Rollup-Würfel: {added} neue von {total} Reviews eingerechnet ({len(seen)} insgesamt).")
+    return added
+
+# ==============================================================================
+# ABFRAGE-API
+# ==============================================================================
+def apply_filter(frame, column, condition):
+    """Wert, Liste (isin), (Operator, Wert) wie ('>=', 4) oder Funktion Series -> Maske."""
+    values = frame[column]
+    if callable(condition):
+        return condition(values)
+    if isinstance(condition, tuple):
+        op, value = condition
+        return {'==': values.eq, '!=': values.ne, '<': values.lt, '<=': values.le, '>': values.gt, '>=': values.ge}[op](value)
+    if isinstance(condition, (list, set)):
+        return values.isin(list(condition))
+    return values == condition
+
+class RollupCube:
+    """
+    Liest den Würfel einmal (klein gegenüber den Reviews) und beantwortet Abfragen per groupby:
+
+        cube = RollupCube()
+        cube.query(by=['month'], where={'author_type': 'Other', 'stars': ('>=', 4)})
+        cube.query(by=['genre', 'year'], where={'genre': ['Classics', 'Philosophy']})
+    """
+
+    def __init__(self, table=CUBE_TABLE, genres_table=BOOK_GENRES_TABLE):
+        self.table = table
+        self.genres_table = genres_table
+        self._cube = self._genres = None
+
+    def reload(self):
+        self._cube = self._genres = None
+        return self
+
+    @property
+    def cube(self):
+        if self._cube is None:
+            cube = read_table(self.table)
+            # Angehängte Teile können dieselben Schlüssel enthalten -> hier zusammenfassen
+            self._cube = cube.groupby(DIMENSIONS, dropna=False, observed=True)[MEASURES].sum().reset_index()
+        return self._cube
+
+    @property
+    def genres(self):
+        if self._genres is None:
+            self._genres = read_table(self.genres_table) if table_exists(self.genres_table) else pd.DataFrame(columns=['book_name', 'genre'])
+        return self._genres
+
+    def query(self, by=(), where=None):
+        """
+        Summiert die Kennzahlen gruppiert nach 'by' (Dimensionen, 'genre' oder 'year') nach
+        Anwendung der Filter 'where'. Liefert n_reviews, n_rated und mean_stars pro Gruppe.
+        Mit 'genre' zählt ein Review in jedem Genre seines Buchs.
+        """
+        by, where = list(by), dict(where or {})
+        frame = self.cube
+        used = set(by) | set(where)
+        for name, derive in DERIVED.items():
+            if name in used:
+                frame = frame.assign(**{name: derive(frame)})
+        if 'genre' in used:
+            frame = frame.merge(self.genres, on='book_name', how='inner')
+        unknown = used - set(frame.columns)
+        if unknown:
+            raise KeyError(f"Unbekannte Dimension(en): {', '.join(sorted(unknown))}")
+        mask = np.ones(len(frame), dtype=bool)
+        for column, condition in where.items():
+            mask &= apply_filter(frame, column, condition).fillna(False).values
+        frame = frame[mask]
+        if by:
+            result = frame.groupby(by, dropna=False, observed=True)[MEASURES].sum().reset_index()
+        else:
+            result = frame[MEASURES].sum().to_frame().T
+        result['mean_stars'] = (result['stars_sum'] / result['n_rated'].replace(0, np.nan)).round(3)
+        return result.drop(columns=['stars_sum'])
+
+# ==============================================================================
+# HAUPTSKRIPT: python rollup_cube.py [rebuild]
+# ==============================================================================
+if __name__ == '__main__':
+    update_cube(rebuild=len(sys.argv) > 1 and sys.argv[1] == 'rebuild')
+    cube = RollupCube()
+    start = time.perf_counter()
+    _ = cube.cube
+    print(f"Würfel geladen: {len(cube.cube)} Zeilen in {1000 * (time.perf_counter() - start):.0f} ms")
+    start = time.perf_counter()
+    monthly = cube.query(by=['month'], where={'author_type': 'Other', 'stars': ('>=', 4)})
+    print(f"\n'kafkaesque'-Erwähnungen pro Monat (Nicht-Kafka-Autoren, 4+ Sterne) in {1000 * (time.perf_counter() - start):.1f} ms:")
+    print(monthly.tail(24).to_string(index=False))
+    print("\nPro Jahr und Autoren-Typ:")
+    print(cube.query(by=['year', 'author_type']).tail(20).to_string(index=False))
@@ -0,0 +1,95 @@
+# sbert_encoder.py
+
+import os
+import numpy as np
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+SBERT_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_BATCH_SIZE = 64
+# Dateiname des dynamisch quantisierten ONNX-Modells (wird beim ersten Gebrauch exportiert)
+ONNX_QUANTIZATION_CONFIG = 'avx2' # 'avx512_vnni' auf neueren Xeons
+ONNX_INT8_FILENAME = f'model_qint8_{ONNX_QUANTIZATION_CONFIG}.onnx'
+ONNX_EXPORT_DIR = 'sbert_onnx_models'
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def length_sorted_order(texts):
+    """
+    Reihenfolge der Texte nach Länge (absteigend). So landen ähnlich lange Reviews
+    in derselben Batch (wenig Padding) - auch über die Chunks des Prozess-Pools hinweg.
+    """
+    return np.argsort([-len(t) for t in texts], kind='stable')
+
+def encoder_key(model_name, backend='torch'):
+    """
+    Kennung der Embeddings eines Modells mit einem Backend. ONNX und vor allem int8 liefern
+    leicht andere Vektoren als torch, deshalb bekommt jedes Backend (bei int8 samt
+    Quantisierungs-Konfiguration) einen eigenen Store. torch behält den reinen Modellnamen.
+    """
+    if backend not in SBERT_BACKENDS:
+        raise ValueError(f"Unbekanntes Backend '{backend}', erlaubt: {SBERT_BACKENDS}")
+    if backend == 'torch':
+        return model_name
+    if backend == 'onnx-int8':
+        return f"{model_name}@{backend}-{ONNX_QUANTIZATION_CONFIG}"
+    return f"{model_name}@{backend}"
+
+def load_model(model_name, backend='torch'):
+    """Lädt das SBERT-Modell für das gewünschte Backend (ONNX-int8 wird bei Bedarf exportiert)."""
+    from sentence_transformers import SentenceTransformer
+    if backend not in SBERT_BACKENDS:
+        raise ValueError(f"Unbekanntes Backend '{backend}', erlaubt: {SBERT_BACKENDS}")
+    if backend == 'torch':
+        return SentenceTransformer(model_name, device='cpu')
+    if backend == 'onnx':
+        return SentenceTransformer(model_name, device='cpu', backend='onnx')
+
+    export_dir = os.path.join(ONNX_EXPORT_DIR, model_name.replace('/', '_'))
+    if not os.path.exists(os.path.join(export_dir, 'onnx', ONNX_INT8_FILENAME)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"Exportiere quantisiertes int8-ONNX-Modell nach '{export_dir}'...")
+        onnx_model = SentenceTransformer(model_name, device='cpu', backend='onnx')
+        onnx_model.save(export_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION_CONFIG, export_dir)
+    return SentenceTransformer(export_dir, device='cpu', backend='onnx',
+                               model_kwargs={'file_name': f'onnx/{ONNX_INT8_FILENAME}'})
+
+def encode_sorted(model, texts, batch_size=DEFAULT_BATCH_SIZE, processes=1, show_progress_bar=True):
+    """
+    Kodiert die Texte global nach Länge sortiert und stellt danach die ursprüngliche
+    Reihenfolge wieder her. Mit processes > 1 wird ein CPU-Prozess-Pool verwendet.
+    """
+    if len(texts) == 0:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    order = length_sorted_order(texts)
+    sorted_texts = [texts[i] for i in order]
+    if processes > 1:
+        pool = model.start_multi_process_pool(target_devices=['cpu'] * processes)
+        try:
+            # Kleine Chunks, damit die Worker abwechselnd lange und kurze Texte bekommen
+            chunk_size = max(batch_size, min(1000, len(sorted_texts) // (processes * 4) + 1))
+            sorted_embeddings = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size, chunk_size=chunk_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        sorted_embeddings = model.encode(sorted_texts, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                                         convert_to_numpy=True)
+    embeddings = np.empty_like(sorted_embeddings, dtype=np.float32)
+    embeddings[order] = sorted_embeddings
+    return embeddings
+
+def make_encoder(model_name, backend='torch', processes=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Liefert encode(texts) -> float32-Matrix. Das Modell wird erst beim ersten Aufruf
+    geladen, damit ein voll gecachter Lauf gar kein Modell braucht.
+    """
+    model = None
+    def encode(texts):
+        nonlocal model
+        if model is None:
+            model = load_model(model_name, backend)
+        return encode_sorted(model, list(texts), batch_size=batch_size, processes=processes)
+    return encode
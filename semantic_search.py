@@ -0,0 +1,281 @@
+# semantic_search.py
+#
+# Semantische Nächste-Nachbarn-Suche über den Embedding-Store des Analyzers.
+#
+# Beispiele:
+#   python semantic_search.py build --ivf
+#   python semantic_search.py update
+#   python semantic_search.py query --review-id https://www.goodreads.com/review/show/123 --top-k 10
+#   python semantic_search.py query --text "endless bureaucracy and absurd guilt" --author-type Other --min-stars 4
+#   python semantic_search.py query --kafka-centroid --author-type Other --group-by-book
+
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from embedding_store import EmbeddingStore
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+INDEX_DIR = 'semantic_index'
+BLOCK_ROWS = 8192
+IVF_MIN_ROWS = 20000 # darunter ist die exakte Suche schnell genug
+IVF_ITERATIONS = 15
+IVF_TRAIN_SAMPLE = 50000
+DEFAULT_NPROBE = 8
+# Wächst eine Liste über dieses Vielfache der mittleren Listengröße, wird der IVF-Index neu trainiert.
+IVF_REBALANCE_FACTOR = 4.0
+META_COLUMNS = ['review_id', 'book_name', 'author', 'is_kafka_author', 'period', 'stars', 'context']
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def normalize(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def merge_top_k(best_scores, best_rows, scores, rows, k):
+    """Vereinigt die bisherigen Top-k mit einem neuen Block (pro Anfrage-Zeile)."""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+    keep = np.argpartition(-all_scores, min(k, all_scores.shape[1] - 1), axis=1)[:, :k]
+    return np.take_along_axis(all_scores, keep, axis=1), np.take_along_axis(all_rows, keep, axis=1)
+
+def exact_top_k(store, rows, queries, k, block_rows=BLOCK_ROWS):
+    """
+    Exakte Kosinus-Top-k per geblockter Matrixmultiplikation: der Store wird
+    blockweise gelesen (Memory-Map), nie als ganze Matrix normalisiert.
+    Liefert (scores, Positionen in 'rows'), absteigend sortiert.
+    """
+    queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_positions = np.zeros((len(queries), 0), dtype=np.int64)
+    for start, block in zip(range(0, len(rows), block_rows), store.iter_blocks(rows, block_rows)):
+        scores = queries @ normalize(block).T
+        positions = np.arange(start, start + len(block))
+        best_scores, best_positions = merge_top_k(best_scores, best_positions, scores, positions, k)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_positions, order, axis=1)
+
+def train_ivf(store, rows, n_lists, iterations=IVF_ITERATIONS, random_state=42):
+    """Sphärisches k-Means (reines numpy) auf einer Stichprobe -> Zentroiden der IVF-Listen."""
+    rng = np.random.default_rng(random_state)
+    n_lists = min(n_lists, len(rows))
+    sample = np.sort(rng.choice(rows, size=min(IVF_TRAIN_SAMPLE, len(rows)), replace=False))
+    data = normalize(store.take(sample))
+    centroids = data[rng.choice(len(data), size=n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = data[assignment == c]
+            centroids[c] = members.mean(axis=0) if len(members) else data[rng.integers(len(data))]
+        centroids = normalize(centroids)
+    return centroids.astype(np.float32)
+
+def store_state(store, rows):
+    """Fingerprint von Speicherformat und Store-Zeilen der Index-Reviews (ändert sich nach prune/Umbau des Stores)."""
+    return hashlib.sha1(store.dtype.encode('utf-8') + np.asarray(rows, dtype=np.int64).tobytes()).hexdigest()[:16]
+
+def assign_ivf(store, rows, centroids):
+    """Nächster Zentroid für jede Zeile (blockweise)."""
+    return np.concatenate([np.argmax(normalize(block) @ centroids.T, axis=1)
+                           for block in store.iter_blocks(rows)]) if len(rows) else np.zeros(0, np.int64)
+
+# ==============================================================================
+# INDEX
+# ==============================================================================
+class SemanticIndex:
+    """
+    Metadaten (eine Zeile pro Review, mit Inhalts-Schlüssel im Store) plus optionalem IVF-Index.
+    Wird einmal gebaut und danach inkrementell um neue Reviews ergänzt. Die Store-Zeilen werden
+    beim Öffnen aus den Schlüsseln aufgelöst; gespeichert werden sie nie (prune, Umbau oder
+    dtype-Konvertierung des Stores verschieben sie).
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+        self.meta = pd.read_parquet(os.path.join(index_dir, 'meta.parquet'))
+        if 'store_key' not in self.meta.columns:
+            raise ValueError(f"Index '{index_dir}' hat noch das alte Format (Store-Zeilen statt Schlüssel). "
+                             "Index mit 'build' neu aufbauen.")
+        self.store = EmbeddingStore(self.info['model_name'], self.info['store_dir'],
+                                    dtype=self.info['store_dtype'], mmap_mode='r', backend=self.info.get('backend', 'torch'))
+        self.meta['store_row'] = self.store.require_rows(self.meta['store_key'])
+        self.centroids = self.assignment = None
+        if self.info.get('ivf'):
+            self.centroids = np.load(os.path.join(index_dir, 'ivf_centroids.npy'))
+            self.assignment = np.load(os.path.join(index_dir, 'ivf_assignment.npy'))
+            if self.info.get('store_state') != store_state(self.store, self.meta['store_row'].values):
+                print("Embedding-Store hat sich seit dem letzten Lauf geändert, ordne die IVF-Listen neu zu...")
+                self.assignment = assign_ivf(self.store, self.meta['store_row'].values, self.centroids)
+                np.save(os.path.join(index_dir, 'ivf_assignment.npy'), self.assignment)
+                self._save_info()
+
+    def _save_info(self):
+        self.info['store_state'] = store_state(self.store, self.meta['store_row'].values)
+        with open(os.path.join(self.index_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.info, f)
+
+    def _save_meta(self):
+        self.meta.drop(columns=['store_row']).to_parquet(os.path.join(self.index_dir, 'meta.parquet'), index=False)
+
+    @staticmethod
+    def build(meta, embedded, index_dir=INDEX_DIR, ivf=None, n_lists=None):
+        """Baut den Index aus den Analyzer-Artefakten ('scrub' = Metadaten, 'embed' = Store-Schlüssel)."""
+        os.makedirs(index_dir, exist_ok=True)
+        meta = meta.reset_index(drop=True)
+        info = {'model_name': embedded['model_name'], 'backend': embedded.get('backend', 'torch'), 'store_dir': embedded['store_dir'],
+                'store_dtype': embedded['store_dtype'], 'ivf': bool(ivf if ivf is not None else len(meta) >= IVF_MIN_ROWS)}
+        store = EmbeddingStore(info['model_name'], info['store_dir'], dtype=info['store_dtype'], mmap_mode='r', backend=info['backend'])
+        meta['store_key'] = list(embedded['keys'])
+        rows = store.require_rows(meta['store_key'])
+        if info['ivf']:
+            n_lists = n_lists or max(1, int(np.sqrt(len(meta))))
+            centroids = train_ivf(store, rows, n_lists)
+            np.save(os.path.join(index_dir, 'ivf_centroids.npy'), centroids)
+            np.save(os.path.join(index_dir, 'ivf_assignment.npy'), assign_ivf(store, rows, centroids))
+        info['store_state'] = store_state(store, rows)
+        meta.to_parquet(os.path.join(index_dir, 'meta.parquet'), index=False)
+        with open(os.path.join(index_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        print(f"Index mit {len(meta)} Reviews gebaut (IVF: {info['ivf']}).")
+        return SemanticIndex(index_dir)
+
+    def update(self, meta, embedded):
+        """Fügt nur Reviews hinzu, deren review_id noch nicht im Index ist."""
+        if (embedded['model_name'], embedded.get('backend', 'torch')) != (self.info['model_name'], self.info.get('backend', 'torch')):
+            raise ValueError("Die Embeddings stammen aus einem anderen Modell/Backend als der Index. "
+                             "Index mit 'build' neu aufbauen.")
+        meta = meta.reset_index(drop=True)
+        meta['store_key'] = list(embedded['keys'])
+        meta['store_row'] = self.store.require_rows(meta['store_key'])
+        new = meta[~meta['review_id'].isin(set(self.meta['review_id']))]
+        if new.empty:
+            print("Index ist aktuell, keine neuen Reviews.")
+            return 0
+        if self.centroids is not None:
+            new_assignment = assign_ivf(self.store, new['store_row'].values, self.centroids)
+            self.assignment = np.concatenate([self.assignment, new_assignment])
+            sizes = np.bincount(self.assignment, minlength=len(self.centroids))
+            if sizes.max() > IVF_REBALANCE_FACTOR * sizes.mean():
+                print("IVF-Listen sind unausgewogen, trainiere Zentroiden neu...")
+                all_rows = np.concatenate([self.meta['store_row'].values, new['store_row'].values])
+                self.centroids = train_ivf(self.store, all_rows, len(self.centroids))
+                self.assignment = assign_ivf(self.store, all_rows, self.centroids)
+            np.save(os.path.join(self.index_dir, 'ivf_centroids.npy'), self.centroids)
+            np.save(os.path.join(self.index_dir, 'ivf_assignment.npy'), self.assignment)
+        self.meta = pd.concat([self.meta, new[self.meta.columns]], ignore_index=True)
+        self._save_meta()
+        self._save_info()
+        print(f"{len(new)} neue Reviews in den Index aufgenommen.")
+        return len(new)
+
+    def filter_mask(self, author_type=None, period=None, min_stars=None, max_stars=None, exclude_book=None):
+        mask = np.ones(len(self.meta), dtype=bool)
+        if author_type:
+            mask &= (self.meta['is_kafka_author'] == author_type).values
+        if period:
+            mask &= (self.meta['period'] == period).values
+        if min_stars is not None:
+            mask &= (self.meta['stars'].fillna(-1) >= min_stars).values
+        if max_stars is not None:
+            mask &= (self.meta['stars'].fillna(99) <= max_stars).values
+        if exclude_book is not None:
+            mask &= (self.meta['book_name'] != exclude_book).values
+        return mask
+
+    def vector_for_review(self, review_id):
+        match = self.meta.index[self.meta['review_id'] == str(review_id)]
+        if match.empty:
+            raise KeyError(f"Review '{review_id}' ist nicht im Index.")
+        return self.store.take([self.meta.at[match[0], 'store_row']])[0], match[0]
+
+    def search(self, query_vector, k=10, mask=None, approximate=None, nprobe=DEFAULT_NPROBE):
+        """Top-k Reviews (DataFrame mit 'score'), exakt oder über die IVF-Listen."""
+        mask = np.ones(len(self.meta), dtype=bool) if mask is None else mask
+        use_ivf = self.centroids is not None if approximate is None else (approximate and self.centroids is not None)
+        if use_ivf:
+            probe = np.argsort(-(normalize(np.atleast_2d(query_vector)) @ self.centroids.T)[0])[:nprobe]
+            mask = mask & np.isin(self.assignment, probe)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return self.meta.iloc[[]].assign(score=[])
+        scores, positions = exact_top_k(self.store, self.meta['store_row'].values[candidates], query_vector, min(k, len(candidates)))
+        result = self.meta.iloc[candidates[positions[0]]].copy()
+        result['score'] = scores[0]
+        return result
+
+# ==============================================================================
+# CLI
+# ==============================================================================
+def load_analyzer_artifacts():
+    """Metadaten und Store-Schlüssel aus den gecachten Pipeline-Artefakten des Analyzers."""
+    from pipeline_runner import load_artifact
+    from final_analyzer_sbert_umap_cpca import build_stages, ARTIFACT_DIR
+    stages = build_stages()
+    df = load_artifact('scrub', stages, ARTIFACT_DIR)
+    embedded = load_artifact('embed', stages, ARTIFACT_DIR)
+    if 'review_id' not in df.columns:
+        from embedding_store import content_hash
+        df['review_id'] = df['context'].map(content_hash)
+    df['stars'] = pd.to_numeric(df['stars'], errors='coerce')
+    return df[META_COLUMNS].astype({'review_id': str}), embedded
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantische Suche über die Review-Embeddings")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Index aus den Analyzer-Artefakten bauen")
+    build.add_argument('--ivf', action='store_true', default=None, help="Approximativen IVF-Index erzwingen")
+    build.add_argument('--n-lists', type=int)
+    subparsers.add_parser('update', help="Neue Reviews inkrementell aufnehmen")
+    query = subparsers.add_parser('query', help="Nächste Nachbarn suchen")
+    source = query.add_mutually_exclusive_group(required=True)
+    source.add_argument('--review-id')
+    source.add_argument('--text')
+    source.add_argument('--kafka-centroid', action='store_true', help="Mittelwert aller Kafka-Reviews als Anfrage")
+    query.add_argument('--top-k', type=int, default=10)
+    query.add_argument('--author-type', choices=['Franz Kafka', 'Other'])
+    query.add_argument('--period', choices=['Pre-2021', '2021+'])
+    query.add_argument('--min-stars', type=int)
+    query.add_argument('--max-stars', type=int)
+    query.add_argument('--exact', action='store_true', help="IVF-Index ignorieren")
+    query.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE)
+    query.add_argument('--group-by-book', action='store_true', help="Treffer pro Buch zusammenfassen")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        meta, embedded = load_analyzer_artifacts()
+        SemanticIndex.build(meta, embedded, ivf=args.ivf, n_lists=args.n_lists)
+        return
+    index = SemanticIndex()
+    if args.command == 'update':
+        index.update(*load_analyzer_artifacts())
+        return
+
+    mask = index.filter_mask(args.author_type, args.period, args.min_stars, args.max_stars)
+    if args.review_id:
+        query_vector, own_position = index.vector_for_review(args.review_id)
+        mask[own_position] = False
+    elif args.text:
+        from sbert_encoder import make_encoder
+        query_vector = make_encoder(index.info['model_name'], backend=index.info.get('backend', 'torch'))([args.text])[0]
+    else:
+        kafka_rows = index.meta.loc[index.meta['is_kafka_author'] == 'Franz Kafka', 'store_row'].values
+        query_vector = np.sum([normalize(block).sum(axis=0) for block in index.store.iter_blocks(kafka_rows)], axis=0) / len(kafka_rows)
+
+    top_k = args.top_k * 20 if args.group_by_book else args.top_k
+    results = index.search(query_vector, k=top_k, mask=mask, approximate=not args.exact, nprobe=args.nprobe)
+    pd.set_option('display.max_colwidth', 100)
+    if args.group_by_book:
+        books = (results.groupby(['book_name', 'author'], observed=True)['score']
+                        .agg(['count', 'mean', 'max']).sort_values('mean', ascending=False).head(args.top_k))
+        print(books)
+    else:
+        print(results[['score', 'book_name', 'author', 'stars', 'period', 'context']].to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# stage_profiler.py
+
+import os
+import sys
+import json
+import time
+import cProfile
+import platform
+import threading
+import tracemalloc
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+try:
+    import psutil # optional, Ersatz für /proc und resource
+except ImportError:
+    psutil = None
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+RUN_REPORT_DIR = 'run_reports'
+PROFILE_DIR = 'run_reports/profiles'
+TOP_ALLOCATIONS = 10
+RSS_SAMPLE_INTERVAL = 0.05 # Sekunden
+
+# ==============================================================================
+# MESSGRÖSSEN
+# ==============================================================================
+def count_rows(obj):
+    """Zeilenzahl eines Artefakts (DataFrame, Array, Liste; Embed-Artefakt über seine 'keys')."""
+    if isinstance(obj, dict):
+        return count_rows(obj['keys']) if 'keys' in obj else None
+    shape = getattr(obj, 'shape', None)
+    if shape:
+        return int(shape[0])
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+def current_rss_mb():
+    """Aktueller RSS aus /proc (Linux), sonst über psutil; ohne beides None."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return psutil.Process().memory_info().rss / 2 ** 20 if psutil else None
+
+def max_rss_mb():
+    """
+    Höchststand des RSS seit Prozessstart (ru_maxrss ist unter macOS in Bytes, sonst in KB).
+    Ohne resource (Windows) die Peak Working Set Size über psutil, sonst None.
+    """
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10
+    peak = getattr(psutil.Process().memory_info(), 'peak_wset', None) if psutil else None
+    return peak / 2 ** 20 if peak is not None else None
+
+def children_cpu_s():
+    """CPU-Zeit (User + System) aller beendeten Kind-Prozesse; None, wenn nicht messbar."""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    if psutil:
+        times = psutil.Process().cpu_times()
+        return times.children_user + times.children_system
+    return None
+
+class RssSampler:
+    """
+    Misst den RSS-Spitzenwert eines Zeitfensters in einem Hintergrund-Thread. ru_maxrss allein
+    reicht nicht, weil ein Worker-Prozess mehrere Stages nacheinander ausführt.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None:
+                self.peak = max(self.peak or 0.0, rss)
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        rss = current_rss_mb()
+        self.peak = max(self.peak, rss) if rss is not None else max_rss_mb()
+
+def top_allocations(snapshot, limit=TOP_ALLOCATIONS):
+    stats = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')
+    return [{'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             'size_mb': round(stat.size / 2 ** 20, 3), 'count': stat.count} for stat in stats[:limit]]
+
+# ==============================================================================
+# PROFILIERTER AUFRUF
+# ==============================================================================
+def profile_call(name, func, args=(), kwargs=None, trace_malloc=True, cprofile_dir=None):
+    """
+    Führt func(*args, **kwargs) aus und misst Wall- und CPU-Zeit (eigener Prozess und
+    Kind-Prozesse, z.B. SBERT-Pool), RSS-Spitze, tracemalloc-Spitze und Top-Allokationen.
+    Mit cprofile_dir wird zusätzlich ein cProfile-Dump '<name>.prof' geschrieben
+    (z.B. mit snakeviz oder flameprof als Flamegraph ansehen).
+    Gibt (Ergebnis, Messwerte) zurück.
+    """
+    kwargs = kwargs or {}
+    if trace_malloc and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if trace_malloc:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile() if cprofile_dir else None
+    children_before = children_cpu_s()
+    cpu_before, wall_before = time.process_time(), time.perf_counter()
+    with RssSampler() as sampler:
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+    wall, cpu = time.perf_counter() - wall_before, time.process_time() - cpu_before
+    children_after = children_cpu_s()
+
+    metrics = {
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'cpu_children_s': round(children_after - children_before, 3) if children_before is not None else None,
+        'peak_rss_mb': round(sampler.peak, 1) if sampler.peak is not None else None,
+        'pid': os.getpid(),
+    }
+    if trace_malloc:
+        metrics['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        metrics['top_allocations'] = top_allocations(tracemalloc.take_snapshot())
+    if profiler:
+        os.makedirs(cprofile_dir, exist_ok=True)
+        metrics['cprofile'] = os.path.join(cprofile_dir, f"{name}.prof")
+        profiler.dump_stats(metrics['cprofile'])
+    return result, metrics
+
+# ==============================================================================
+# LAUFBERICHT
+# ==============================================================================
+def new_run_report(argv=None):
+    return {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'argv': list(argv if argv is not None else sys.argv),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'stages': {},
+    }
+
+def write_run_report(report, report_dir=RUN_REPORT_DIR):
+    """Schreibt den Bericht mit Zeitstempel (zum Vergleichen) und als 'latest.json'."""
+    os.makedirs(report_dir, exist_ok=True)
+    filename = os.path.join(report_dir, f"run_{report['started'].replace(':', '')}.json")
+    for target in [filename, os.path.join(report_dir, 'latest.json')]:
+        with open(target + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(target + '.tmp', target)
+    return filename
+
+def print_stage_table(report):
+    print(f"\n{'Stage':<28}{'Status':>8}{'Wall s':>9}{'CPU s':>9}{'Kind s':>9}{'RSS MB':>9}{'Py MB':>8}{'Zeilen':>16}")
+    for name, stage in report['stages'].items():
+        rows = f"{stage.get('rows_in')} -> {stage.get('rows_out')}"
+        print(f"{name:<28}{stage['status']:>8}{stage.get('wall_s', ''):>9}{stage.get('cpu_s', ''):>9}"
+              f"{'' if stage.get('cpu_children_s') is None else stage['cpu_children_s']:>9}{stage.get('peak_rss_mb') or '':>9}{stage.get('tracemalloc_peak_mb', ''):>8}{rows:>16}")
+
+def diff_reports(old, new):
+    """Vergleicht zwei Laufberichte pro Stage (Zeit und Speicher), z.B. vor/nach einer Änderung."""
+    print(f"{'Stage':<28}{'Wall alt':>10}{'Wall neu':>10}{'Δ %':>8}{'RSS alt':>10}{'RSS neu':>10}")
+    for name in dict.fromkeys(list(old['stages']) + list(new['stages'])):
+        a, b = old['stages'].get(name, {}), new['stages'].get(name, {})
+        wall_a, wall_b = a.get('wall_s'), b.get('wall_s')
+        change = f"{100 * (wall_b - wall_a) / wall_a:+.0f}" if wall_a and wall_b is not None else ''
+        print(f"{name:<28}{str(wall_a or '-'):>10}{str(wall_b or '-'):>10}{change:>8}"
+              f"{str(a.get('peak_rss_mb') or '-'):>10}{str(b.get('peak_rss_mb') or '-'):>10}")
+
+# ==============================================================================
+# HAUPTSKRIPT: python stage_profiler.py alt.json [neu.json]  (Standard für neu: latest.json)
+# ==============================================================================
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Aufruf: python stage_profiler.py <alter_bericht.json> [<neuer_bericht.json>]")
+        sys.exit(1)
+    reports = []
+    for filename in [sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else os.path.join(RUN_REPORT_DIR, 'latest.json')]:
+        with open(filename, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+    diff_reports(*reports)
@@ -0,0 +1,242 @@
+# streaming_analysis.py
+#
+# Out-of-Core-Modus des Analyzers für Review-Korpora, die nicht in den RAM passen.
+# Reviews werden in Chunks gelesen, bereinigt, kodiert und an den Embedding-Store
+# auf der Platte angehängt. Die Reduktionen werden gestreamt gefittet:
+#   - IncrementalPCA (partial_fit pro Chunk) vor UMAP, UMAP auf einer Stichprobe + transform
+#   - LDA aus akkumulierten Klassenmitteln und Streumatrizen
+# Der Speicherbedarf hängt nur von CHUNK_SIZE, der Embedding-Dimension und UMAP_FIT_SAMPLE ab.
+
+import os
+import sys
+import glob
+import hashlib
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from dataset_store import iter_table_batches, read_table
+from embedding_store import EmbeddingStore
+from sbert_encoder import make_encoder
+from entity_scrubber import load_entities, scrub_entities
+from umap_cache import fit_umap, load_pickle, reducer_filename, import_umap
+from map_export import export_semantic_map
+from book_registry import load_registry
+from final_analyzer_sbert_umap_cpca import (
+    join_metadata, stage_prepare,
+    REVIEWS_TABLE, SUMMARY_TABLE, REVIEWS_FILENAME, SUMMARY_FILENAME, SPLIT_DATE, ENTITIES_FILENAME,
+    SBERT_MODEL_NAME, SBERT_BACKEND, SBERT_PROCESSES, SBERT_BATCH_SIZE, EMBEDDING_STORE_DIR,
+    EMBEDDING_STORE_DTYPE, UMAP_CACHE_DIR
+)
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+CHUNK_SIZE = 20000
+PCA_COMPONENTS = 50
+UMAP_FIT_SAMPLE = 100000
+LDA_SHRINKAGE = 1e-3
+OUTPUT_DIR = 'streaming_output'
+CONTRASTS = {'author': ('is_kafka_author', 'Franz Kafka'), 'period': ('period', 'Pre-2021')}
+META_COLUMNS = ['book_name', 'author', 'is_kafka_author', 'period', 'stars', 'store_row']
+
+# ==============================================================================
+# GESTREAMTE LDA
+# ==============================================================================
+class StreamingLDA:
+    """
+    Zwei-Klassen-LDA aus akkumulierten Statistiken: pro Klasse Anzahl, Summe und
+    Streumatrix X'X. Danach S_W = sum_k (S_k - n_k m_k m_k') und w = S_W^-1 (m1 - m0).
+    """
+
+    def __init__(self, dim):
+        self.n = np.zeros(2)
+        self.sums = np.zeros((2, dim))
+        self.scatter = np.zeros((2, dim, dim))
+        self.coef = self.offset = None
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        for label in (0, 1):
+            members = X[y == bool(label)]
+            self.n[label] += len(members)
+            self.sums[label] += members.sum(axis=0)
+            self.scatter[label] += members.T @ members
+
+    def finalize(self):
+        """Löst die LDA. Ist eine Klasse leer, bleibt coef None (Kontrast nicht schätzbar)."""
+        if self.n.min() == 0:
+            return self
+        means = self.sums / self.n[:, None]
+        within = sum(self.scatter[k] - self.n[k] * np.outer(means[k], means[k]) for k in (0, 1))
+        within += LDA_SHRINKAGE * np.trace(within) / len(within) * np.eye(len(within))
+        coef = np.linalg.solve(within, means[1] - means[0])
+        # Skalierung wie sklearn: Einheits-Varianz innerhalb der Klassen
+        self.coef = coef / np.sqrt(coef @ within @ coef / max(self.n.sum() - 2, 1))
+        self.offset = self.coef @ (self.sums.sum(axis=0) / self.n.sum())
+        return self
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef - self.offset
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def peak_rss_mb():
+    """Maximaler Resident Set Size des Prozesses in MB (ru_maxrss: macOS Bytes, sonst KB; Windows über psutil)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1e6
+    except (ImportError, AttributeError):
+        return float('nan')
+
+def pca_basis_key(ipca):
+    """Hash der PCA-Basis: ein UMAP-Reducer passt nur zu Daten, die in derselben Basis reduziert wurden."""
+    digest = hashlib.sha1(np.ascontiguousarray(ipca.components_, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(ipca.mean_, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:12]
+
+def meta_parts():
+    return sorted(glob.glob(os.path.join(OUTPUT_DIR, 'meta', 'part-*.parquet')))
+
+# ==============================================================================
+# PASS 1: EINLESEN, BEREINIGEN, KODIEREN, FITS AKKUMULIEREN
+# ==============================================================================
+def ingest(store, chunk_size):
+    from sklearn.decomposition import IncrementalPCA
+    os.makedirs(os.path.join(OUTPUT_DIR, 'meta'), exist_ok=True)
+    for old_part in meta_parts():
+        os.remove(old_part)
+    summary_df = read_table(SUMMARY_TABLE, columns=['book_id', 'book_name', 'author'], csv_fallback=SUMMARY_FILENAME)
+    registry = load_registry()
+    entities = load_entities(ENTITIES_FILENAME)
+    encode = make_encoder(SBERT_MODEL_NAME, backend=SBERT_BACKEND, processes=SBERT_PROCESSES, batch_size=SBERT_BATCH_SIZE)
+    ipca = IncrementalPCA(n_components=PCA_COMPONENTS)
+    ldas = {}
+    carry = None # IncrementalPCA braucht mindestens n_components Zeilen pro partial_fit
+    total = 0
+    columns = ['book_id', 'book_name', 'stars', 'date', 'context']
+    for i, batch in enumerate(iter_table_batches(REVIEWS_TABLE, columns=columns, batch_size=chunk_size,
+                                                 csv_fallback=REVIEWS_FILENAME)):
+        df = stage_prepare(join_metadata(batch, summary_df, registry), SPLIT_DATE)
+        if df.empty:
+            continue
+        # Ohne Bereinigungs-Cache: er läge komplett im RAM und würde pro Chunk neu geschrieben.
+        # Bereits kodierte Texte kosten hier nur die Regex, die Embeddings kommen aus dem Store.
+        df['context_cleaned'] = scrub_entities(df['context'], entities, cache_filename=None)
+        df['store_row'] = store.ensure(df['context_cleaned'].tolist(), encode)
+        X = store.take(df['store_row'].values)
+        for name, (column, positive_label) in CONTRASTS.items():
+            ldas.setdefault(name, StreamingLDA(X.shape[1])).partial_fit(X, (df[column] == positive_label).values)
+        X = X if carry is None else np.concatenate([carry, X])
+        if len(X) >= PCA_COMPONENTS:
+            ipca.partial_fit(X)
+            carry = None
+        else:
+            carry = X
+        df[META_COLUMNS].to_parquet(os.path.join(OUTPUT_DIR, 'meta', f'part-{i:05d}.parquet'), index=False)
+        total += len(df)
+        print(f"Chunk {i + 1}: {len(df)} Reviews (gesamt {total}), Peak-RSS {peak_rss_mb():.0f} MB")
+    # Ein Rest < n_components Zeilen bleibt für die PCA unberücksichtigt (in der LDA ist er enthalten)
+    if carry is not None and not hasattr(ipca, 'components_'):
+        # Weniger als n_components Reviews insgesamt: PCA mit so vielen Komponenten wie Zeilen
+        ipca = IncrementalPCA(n_components=min(PCA_COMPONENTS, len(carry))).fit(carry)
+    ldas = {name: lda.finalize() for name, lda in ldas.items()}
+    for name, lda in ldas.items():
+        if lda.coef is None:
+            print(f"WARNUNG: LDA '{name}' übersprungen - eine der beiden Klassen hat keine Reviews.")
+    return ipca, {name: lda for name, lda in ldas.items() if lda.coef is not None}, total
+
+# ==============================================================================
+# PASS 2: PROJEKTIONEN SCHREIBEN
+# ==============================================================================
+def project(store, ipca, ldas, total):
+    reduced = np.lib.format.open_memmap(os.path.join(OUTPUT_DIR, 'pca_reduced.npy'), mode='w+',
+                                        dtype=np.float32, shape=(total, ipca.n_components_))
+    position = 0
+    for part in meta_parts():
+        meta = pd.read_parquet(part)
+        X = store.take(meta['store_row'].values)
+        reduced[position:position + len(meta)] = ipca.transform(X)
+        for name, lda in ldas.items():
+            meta[f'lda_score_{name}'] = lda.transform(X).astype(np.float32)
+        meta.to_parquet(part, index=False)
+        position += len(meta)
+    reduced.flush()
+    return reduced
+
+def umap_project(store, ipca, reduced, random_state=42):
+    """
+    UMAP auf einer Stichprobe der PCA-Daten fitten, alle Zeilen blockweise per transform projizieren.
+    Die Stichprobe wird über die Inhalts-Hashes der Reviews (Store-Schlüssel) an den UMAP-Cache
+    übergeben, nicht über Positionen - die verschieben sich, sobald Reviews hinzukommen.
+    Die IncrementalPCA wird bei jedem Lauf neu gefittet; der Cache ist deshalb pro PCA-Basis
+    getrennt, sonst würde ein Reducer aus einer alten Basis per transform weiterverwendet.
+    """
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(len(reduced), size=min(UMAP_FIT_SAMPLE, len(reduced)), replace=False))
+    store_rows = np.concatenate([pd.read_parquet(part, columns=['store_row'])['store_row'].values for part in meta_parts()])
+    keys = [store.keys[row] for row in store_rows[sample]]
+    cache_dir = os.path.join(UMAP_CACHE_DIR, 'streaming', pca_basis_key(ipca))
+    fit_umap(np.asarray(reduced[sample]), keys, random_state=random_state, cache_dir=cache_dir)
+    import_umap() # numba-Cache setzen, bevor der Reducer (und damit umap) geladen wird
+    reducer = load_pickle(reducer_filename(cache_dir, random_state=random_state))['reducer']
+    position = 0
+    for part in meta_parts():
+        meta = pd.read_parquet(part)
+        coords = reducer.transform(np.asarray(reduced[position:position + len(meta)]))
+        meta['umap_x'], meta['umap_y'] = coords[:, 0], coords[:, 1]
+        meta.to_parquet(part, index=False)
+        position += len(meta)
+
+# ==============================================================================
+# HAUPTPROGRAMM
+# ==============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-Core-Analyse großer Review-Korpora")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--skip-umap', action='store_true')
+    args = parser.parse_args()
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    start = time.time()
+
+    print(f"--- Out-of-Core-Analyse (Chunks à {args.chunk_size} Reviews) ---")
+    store = EmbeddingStore(SBERT_MODEL_NAME, EMBEDDING_STORE_DIR, dtype=EMBEDDING_STORE_DTYPE, mmap_mode='r',
+                           backend=SBERT_BACKEND)
+    print("\n[Pass 1/3] Einlesen, Bereinigen, Kodieren, IncrementalPCA und LDA-Statistiken...")
+    ipca, ldas, total = ingest(store, args.chunk_size)
+    if total == 0:
+        print("Keine Reviews gefunden.")
+        return
+    print(f"\n[Pass 2/3] PCA- und LDA-Projektionen für {total} Reviews...")
+    reduced = project(store, ipca, ldas, total)
+    if not args.skip_umap:
+        print("\n[Pass 3/3] UMAP (Fit auf Stichprobe, transform für alle)...")
+        umap_project(store, ipca, reduced)
+
+    columns = ['is_kafka_author', 'period'] + [f'lda_score_{name}' for name in ldas]
+    summary = pd.concat([pd.read_parquet(part, columns=columns) for part in meta_parts()])
+    for name in ldas:
+        column = CONTRASTS[name][0]
+        print(f"\nLDA '{name}': mittlerer Score pro Gruppe")
+        print(summary.groupby(column)[f'lda_score_{name}'].agg(['count', 'mean', 'std']))
+    if not args.skip_umap:
+        # Karte aus einer Stichprobe je Teil-Datei (begrenzter Speicher)
+        sample = pd.concat([pd.read_parquet(part).sample(frac=min(1.0, 50000 / total), random_state=42)
+                            for part in meta_parts()])
+        export_semantic_map(sample, 'umap_x', 'umap_y', 'is_kafka_author',
+                            'Semantische Karte (Out-of-Core, Stichprobe): Kafka vs. Andere Autoren', 'Autoren-Typ',
+                            {'Franz Kafka': '#ff7f0e', 'Other': '#1f77b4'},
+                            os.path.join(OUTPUT_DIR, 'map_kafka_vs_other.html'),
+                            hover_columns=['book_name', 'author', 'stars', 'period'], mode='decimated')
+    print(f"\n--- Fertig in {time.time() - start:.0f} s. Peak-RSS: {peak_rss_mb():.0f} MB. Ergebnisse in '{OUTPUT_DIR}/'. ---")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# umap_cache.py
+
+import os
+import pickle
+import hashlib
+import numpy as np
+
+# ==============================================================================
+# KONFIGURATION
+# ==============================================================================
+UMAP_CACHE_DIR = 'umap_cache'
+HASH_BLOCK_ROWS = 8192
+# Ab diesem Anteil neuer Reviews wird neu gefittet statt per transform projiziert.
+MAX_TRANSFORM_FRACTION = 0.2
+# Persistenter Cache für die numba-kompilierten UMAP-Funktionen (spart das JIT-Warm-up ab dem 2. Lauf)
+NUMBA_CACHE_DIR = os.path.join(UMAP_CACHE_DIR, 'numba')
+
+# ==============================================================================
+# HELPER-FUNKTIONEN
+# ==============================================================================
+def embeddings_fingerprint(embeddings):
+    """Hash über Shape und Inhalt der Matrix (blockweise, funktioniert auch mit Memory-Maps)."""
+    digest = hashlib.sha1(str(embeddings.shape).encode('utf-8'))
+    for start in range(0, len(embeddings), HASH_BLOCK_ROWS):
+        digest.update(np.ascontiguousarray(embeddings[start:start + HASH_BLOCK_ROWS], dtype=np.float32).tobytes())
+    return digest.hexdigest()[:20]
+
+def params_key(**params):
+    return hashlib.sha1(repr(sorted(params.items())).encode('utf-8')).hexdigest()[:12]
+
+def atomic_pickle(obj, filename):
+    with open(filename + '.tmp', 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(filename + '.tmp', filename)
+
+def load_pickle(filename):
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
+
+def import_umap(numba_cache_dir=NUMBA_CACHE_DIR):
+    """
+    Importiert umap erst bei Bedarf (zieht numba nach sich). Vorher wird NUMBA_CACHE_DIR gesetzt,
+    damit die mit cache=True kompilierten Funktionen auch bei schreibgeschützten site-packages
+    zwischen den Läufen erhalten bleiben.
+    """
+    if numba_cache_dir:
+        os.makedirs(numba_cache_dir, exist_ok=True)
+        os.environ.setdefault('NUMBA_CACHE_DIR', os.path.abspath(numba_cache_dir))
+    import umap
+    import umap.umap_
+    return umap
+
+def coords_filename(reducer_file):
+    """Kleine Begleitdatei (Fingerprint, Schlüssel, Koordinaten), die sich ohne umap/numba laden lässt."""
+    return reducer_file[:-len('.pkl')] + '_coords.pkl'
+
+def reducer_filename(cache_dir=UMAP_CACHE_DIR, n_neighbors=15, min_dist=0.1, n_components=2, metric='euclidean', random_state=42):
+    """Datei des gespeicherten Reducers für eine Parameterkombination."""
+    return os.path.join(cache_dir, "reducer_" + params_key(n_neighbors=n_neighbors, min_dist=min_dist,
+                        n_components=n_components, metric=metric, random_state=random_state) + ".pkl")
+
+def get_knn_graph(embeddings, n_neighbors=15, metric='euclidean', random_state=42, cache_dir=UMAP_CACHE_DIR, fingerprint=None):
+    """
+    Berechnet den kNN-Graphen (der teuerste Teil von UMAP) einmal und speichert ihn,
+    verschlüsselt über den Embedding-Hash. Unabhängig von min_dist/n_components.
+    Liefert (knn_indices, knn_dists, knn_search_index) für UMAP(precomputed_knn=...).
+    """
+    fingerprint = fingerprint or embeddings_fingerprint(embeddings)
+    filename = os.path.join(cache_dir, f"knn_{fingerprint}_{metric}_k{n_neighbors}.pkl")
+    if os.path.exists(filename):
+        print(f"Lade kNN-Graph aus '{filename}'...")
+        return load_pickle(filename)
+    nearest_neighbors = import_umap().umap_.nearest_neighbors
+    print(f"Berechne kNN-Graph (k={n_neighbors}, {metric})...")
+    knn = nearest_neighbors(np.asarray(embeddings), n_neighbors, metric, {}, False,
+                            np.random.RandomState(random_state), low_memory=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    atomic_pickle(knn, filename)
+    return knn
+
+def fit_umap(embeddings, keys, n_neighbors=15, min_dist=0.1, n_components=2, metric='euclidean',
+             random_state=42, cache_dir=UMAP_CACHE_DIR, refit=False):
+    """
+    Liefert die UMAP-Koordinaten für 'embeddings' (Zeilen-Schlüssel in 'keys').
+    - Gleiche Embeddings + Parameter: gespeichertes Ergebnis, kein Fit.
+    - Nur wenige neue Reviews: bekannte Zeilen behalten ihre Koordinaten, neue werden
+      mit dem gespeicherten Reducer per transform projiziert.
+    - Sonst: Fit mit dem (gecachten) kNN-Graphen; der Reducer wird gespeichert.
+    """
+    fingerprint = embeddings_fingerprint(embeddings)
+    filename = reducer_filename(cache_dir, n_neighbors, min_dist, n_components, metric, random_state)
+    saved = None
+    if not refit and os.path.exists(coords_filename(filename)):
+        saved = load_pickle(coords_filename(filename))
+    elif not refit and os.path.exists(filename):
+        # Alt-Format ohne Begleitdatei: einmalig den Reducer laden und die Begleitdatei nachziehen
+        import_umap()
+        reducer = load_pickle(filename)
+        saved = {'fingerprint': reducer['fingerprint'], 'keys': reducer['keys'], 'embedding': reducer['reducer'].embedding_}
+        atomic_pickle(saved, coords_filename(filename))
+
+    if saved and saved['fingerprint'] == fingerprint:
+        print(f"UMAP-Projektion unverändert, lade aus '{coords_filename(filename)}'.")
+        return saved['embedding']
+    if saved:
+        row_of = {key: row for row, key in enumerate(saved['keys'])}
+        known = np.array([key in row_of for key in keys])
+        # Auch die in früheren Läufen projizierten Reviews zählen: sie stecken nicht im Fit des Reducers
+        n_transformed = saved.get('n_transformed', 0) + int((~known).sum())
+        if n_transformed <= MAX_TRANSFORM_FRACTION * len(keys):
+            print(f"Projiziere {int((~known).sum())} neue Reviews per transform (kein Refit).")
+            coords = np.empty((len(keys), n_components), dtype=np.float32)
+            coords[known] = saved['embedding'][[row_of[key] for key, k in zip(keys, known) if k]]
+            if (~known).any():
+                import_umap()
+                coords[~known] = load_pickle(filename)['reducer'].transform(np.asarray(embeddings[~known]))
+            # Der nächste Lauf mit denselben Embeddings lädt die Koordinaten, statt erneut zu projizieren
+            atomic_pickle({'fingerprint': fingerprint, 'keys': list(keys), 'embedding': coords,
+                           'n_transformed': n_transformed}, coords_filename(filename))
+            return coords
+        print(f"{int((~known).sum())} neue Reviews - zu viele für transform, fitte UMAP neu.")
+
+    umap = import_umap()
+    knn = get_knn_graph(embeddings, n_neighbors, metric, random_state, cache_dir, fingerprint)
+    reducer = umap.UMAP(n_neighbors=n_neighbors, min_dist=min_dist, n_components=n_components,
+                        metric=metric, random_state=random_state, precomputed_knn=knn)
+    reducer.fit(embeddings)
+    os.makedirs(cache_dir, exist_ok=True)
+    atomic_pickle({'fingerprint': fingerprint, 'keys': list(keys), 'reducer': reducer}, filename)
+    atomic_pickle({'fingerprint': fingerprint, 'keys': list(keys), 'embedding': reducer.embedding_}, coords_filename(filename))
+    return reducer.embedding_